@@ -0,0 +1,119 @@
+# benchmarks/arrangement.py
+"""
+Micro-benchmark of the panel arrangement (paginate_to_matrix + process_2d_array
++ split_front_back): time and Python peak allocation of the indexed fold in
+core.geometry against the nested-list fold it replaced (kept below as the
+reference), plus the DEBUG panel maps over a whole plan.
+
+    python -m benchmarks.arrangement
+    python -m benchmarks.arrangement --pages 512,4096,16384 --levels 3,4 --report arrangement.json
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from core.geometry import paginate_to_matrix, process_2d_array, rotate_cw, split_front_back
+from core.imposition import compute_signature_panel_maps
+from core.signature_logic import choose_best_plan
+
+DEFAULT_PAGES = (512, 4096, 16384)
+DEFAULT_LEVELS = (1, 2, 3, 4)
+
+
+def reference_process_2d_array(matrix: List[List[Any]], level: int) -> List[List[Any]]:
+    """The nested-list fold: copies every row, then new halves and lists per step."""
+    if not matrix or not matrix[0]:
+        return []
+    current = [row[:] for row in matrix]
+    rotations_left = 1 if level == 3 else (2 if level == 4 else 0)
+    for _ in range(level):
+        if len(current[0]) <= 2:
+            break
+        lefts, rights = [], []
+        rotate_now = rotations_left > 0
+        for arr in current:
+            mid = len(arr) // 2
+            L, R = arr[:mid], arr[mid:]
+            if rotate_now:
+                L = rotate_cw(L)
+                R = rotate_cw(R)
+            lefts.append(L)
+            rights.append(R)
+        current = lefts + rights
+        if rotate_now:
+            rotations_left -= 1
+    return current
+
+
+def reference_split_front_back(arr: List[Any]):
+    front = [x for i, x in enumerate(arr, start=1) if i % 2 == 1]
+    back = [x for i, x in enumerate(arr, start=1) if i % 2 == 0]
+    return front, back
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()  # warm caches the way a long-running job would
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    seconds = (time.perf_counter() - t) / repeat
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": seconds, "py_peak_kb": peak / 1024}
+
+
+def bench(pages: int, level: int, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    matrix = paginate_to_matrix(pages, level)
+
+    def indexed():
+        return split_front_back(process_2d_array(matrix, level))
+
+    def reference():
+        return reference_split_front_back(reference_process_2d_array(matrix, level))
+
+    if indexed() != reference():
+        raise AssertionError(f"indexed fold differs from the reference ({pages} pages, level {level})")
+    plan, _ = choose_best_plan(pages)
+    return {
+        "reference": _measure(reference, repeat),
+        "indexed": _measure(indexed, repeat),
+        "panel_maps": _measure(lambda: compute_signature_panel_maps(plan.sequence, level), repeat),
+    }
+
+
+def run(pages: List[int], levels: List[int], repeat: int = 5) -> Dict[str, Any]:
+    return {f"{n}-L{level}": bench(n, level, repeat) for n in pages for level in levels}
+
+
+def _format(name: str, case: Dict[str, Dict[str, float]]) -> str:
+    ref, new = case["reference"], case["indexed"]
+    return (f"{name:>10}  reference {ref['seconds'] * 1e3:8.2f} ms {ref['py_peak_kb']:9.1f} KiB   "
+            f"indexed {new['seconds'] * 1e3:8.2f} ms {new['py_peak_kb']:9.1f} KiB   "
+            f"panel maps {case['panel_maps']['seconds'] * 1e3:.2f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Panel arrangement micro-benchmark")
+    p.add_argument("--pages", type=lambda v: [int(x) for x in v.split(",")], default=list(DEFAULT_PAGES))
+    p.add_argument("--levels", type=lambda v: [int(x) for x in v.split(",")], default=list(DEFAULT_LEVELS))
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--report", help="Write results as JSON")
+    args = p.parse_args(argv)
+
+    results = run(args.pages, args.levels, args.repeat)
+    for name, case in results.items():
+        print(_format(name, case))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
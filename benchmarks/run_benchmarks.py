@@ -0,0 +1,273 @@
+# benchmarks/run_benchmarks.py
+"""
+Stage timings for the imposition pipeline on synthetic sources.
+
+    python -m benchmarks.run_benchmarks                      # quick matrix
+    python -m benchmarks.run_benchmarks --profile full       # 8 … 20,000 pages
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --threshold 0.25
+
+Every case runs in a fresh process, so its peak RSS (which, unlike
+tracemalloc, includes MuPDF's native allocations) belongs to that case alone.
+With --baseline the run exits non-zero when a stage got slower than the stored
+value by more than the threshold (and by more than --min-delta seconds, so
+sub-millisecond stages do not flap), or when a case's peak RSS grew by more
+than --memory-threshold (and by more than --min-rss-delta MiB).
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fitz
+
+from benchmarks.synthetic import KINDS, make_source
+from core.imposition import compute_signature_panel_maps, draw_booklet_signatures_by_global_panels
+from core.layout import ENGINES, build_placement_table, signature_layout
+from core.output import DEFAULT_SAVE_PROFILE, SAVE_PROFILES, save_document
+from core.signature_logic import choose_best_plan
+
+PROFILES = {
+    "quick": [8, 200, 2000],
+    "full": [8, 200, 2000, 8000, 20000],
+}
+LEVELS = (1, 2, 3, 4)
+BINDINGS = ("LTR", "RTL")
+STAGES = ("plan", "panel_maps", "placements", "draw", "save")
+# "save" is the default profile; every profile is also timed as save_<name>
+
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA = 0.005
+DEFAULT_MEMORY_THRESHOLD = 0.25
+DEFAULT_MIN_RSS_DELTA = 16.0  # MiB
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _measure(fn: Callable[[], Any], memory: bool) -> Tuple[Any, Dict[str, float]]:
+    if memory:
+        tracemalloc.start()
+    t = time.perf_counter()
+    value = fn()
+    seconds = time.perf_counter() - t
+    # process peak so far: MuPDF allocations included, earlier stages too
+    stats = {"seconds": seconds, "rss_peak_mb": _peak_rss_mb()}
+    if memory:
+        stats["py_peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return value, stats
+
+
+def bench_case(src: fitz.Document, level: int, binding: str, *, memory: bool = False,
+               engine: str = "list") -> Dict[str, Any]:
+    """
+    Run every stage once for one source/level/binding. With `memory`, a second
+    pass under tracemalloc adds Python peak memory per stage; timings always
+    come from the untraced pass.
+    """
+    signature_layout.cache_clear()  # time the arrangement, not a warm template cache
+    result = _run_stages(src, level, binding, memory=False, engine=engine)
+    if memory:
+        signature_layout.cache_clear()
+        traced = _run_stages(src, level, binding, memory=True, engine=engine)
+        for stage, stats in traced["stages"].items():
+            result["stages"][stage]["py_peak_kb"] = stats["py_peak_kb"]
+    return result
+
+
+def _run_stages(src: fitz.Document, level: int, binding: str, *, memory: bool, engine: str) -> Dict[str, Any]:
+    stages: Dict[str, Dict[str, float]] = {}
+    (plan, _), stages["plan"] = _measure(lambda: choose_best_plan(len(src)), memory)
+    _, stages["panel_maps"] = _measure(lambda: compute_signature_panel_maps(plan.sequence, level), memory)
+    table, stages["placements"] = _measure(lambda: build_placement_table(plan.sequence, level, binding, engine), memory)
+    out, stages["draw"] = _measure(lambda: draw_booklet_signatures_by_global_panels(src, table), memory)
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    output_bytes: Dict[str, int] = {}
+    try:
+        for profile in SAVE_PROFILES:
+            _, stages[f"save_{profile}"] = _measure(lambda: save_document(out, path, profile), memory)
+            output_bytes[profile] = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    stages["save"] = stages[f"save_{DEFAULT_SAVE_PROFILE}"]
+    out_pages = len(out)
+    out.close()
+
+    draw_s = stages["draw"]["seconds"]
+    return {
+        "source_pages": len(src),
+        "output_pages": out_pages,
+        "output_bytes": output_bytes[DEFAULT_SAVE_PROFILE],
+        "output_bytes_by_profile": output_bytes,
+        "plan": plan.expression,
+        "stages": stages,
+        "pages_per_second": len(src) / draw_s if draw_s else None,
+    }
+
+
+def bench_file(path: str, level: int, binding: str, *, memory: bool = False,
+               engine: str = "list") -> Dict[str, Any]:
+    """bench_case on the source saved at `path`, with the process peak RSS before and after."""
+    src = fitz.open(path)
+    try:
+        source_rss = _peak_rss_mb()
+        result = bench_case(src, level, binding, memory=memory, engine=engine)
+    finally:
+        src.close()
+    result["source_rss_mb"] = source_rss
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _run_case(path: str, level: int, binding: str, *, memory: bool, engine: str,
+              isolate: bool) -> Dict[str, Any]:
+    if not isolate:
+        return bench_file(path, level, binding, memory=memory, engine=engine)
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(bench_file, path, level, binding, memory=memory, engine=engine).result()
+
+
+def run(sizes: List[int], kinds: List[str], levels: List[int], bindings: List[str],
+        *, memory: bool = False, engine: str = "list", isolate: bool = True,
+        progress: Callable[[str], None] = lambda _: None) -> Dict[str, Any]:
+    """
+    Benchmark every kind/size/level/binding. Sources are generated once and
+    saved; with `isolate` each case then runs in a fresh process, so its RSS
+    figures are its own. Without it they accumulate across cases.
+    """
+    cases: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="pdfengine-bench-") as tmp:
+        for kind in kinds:
+            for pages in sizes:
+                path = os.path.join(tmp, f"{kind}-{pages}.pdf")
+                make_source(pages, kind, path=path).close()
+                for level in levels:
+                    for binding in bindings:
+                        name = f"{kind}-{pages}-L{level}-{binding}"
+                        cases[name] = _run_case(path, level, binding, memory=memory, engine=engine,
+                                                isolate=isolate)
+                        progress(name)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "machine": platform.machine(),
+            "memory": memory,
+            "engine": engine,
+            "isolated": isolate,
+        },
+        "cases": cases,
+    }
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], *,
+                        threshold: float = DEFAULT_THRESHOLD,
+                        min_delta: float = DEFAULT_MIN_DELTA,
+                        memory_threshold: float = DEFAULT_MEMORY_THRESHOLD,
+                        min_rss_delta: float = DEFAULT_MIN_RSS_DELTA) -> List[str]:
+    """
+    Describe every stage that got slower and every case whose peak RSS grew;
+    cases missing from either side, and RSS figures missing from an older
+    baseline, are ignored.
+    """
+    regressions: List[str] = []
+    for name, case in results["cases"].items():
+        base_case = baseline.get("cases", {}).get(name)
+        if not base_case:
+            continue
+        now, before = case.get("peak_rss_mb"), base_case.get("peak_rss_mb")
+        if now is not None and before and now - before > min_rss_delta and now > before * (1 + memory_threshold):
+            regressions.append(f"{name} peak RSS: {before:.0f} MiB -> {now:.0f} MiB "
+                               f"(+{(now / before - 1) * 100:.0f}%)")
+        for stage, stats in case["stages"].items():
+            base = base_case["stages"].get(stage)
+            if not base:
+                continue
+            now, before = stats["seconds"], base["seconds"]
+            if now - before > min_delta and now > before * (1 + threshold):
+                regressions.append(f"{name} {stage}: {before:.4f}s -> {now:.4f}s "
+                                   f"(+{(now / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def _format_row(name: str, case: Dict[str, Any]) -> str:
+    stages = "  ".join(f"{s}={case['stages'][s]['seconds'] * 1000:8.2f}ms" for s in STAGES)
+    pps = case["pages_per_second"]
+    sizes = "  ".join(f"{p}={nbytes / 1024:.0f}KiB/{case['stages'][f'save_{p}']['seconds'] * 1000:.1f}ms"
+                      for p, nbytes in case["output_bytes_by_profile"].items())
+    return f"{name:<24} {stages}  {pps or 0:9.0f} p/s  {case['peak_rss_mb']:6.0f} MiB  {sizes}"
+
+
+def _csv(value: str, cast=str) -> List[Any]:
+    return [cast(v) for v in value.split(",") if v]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Imposition pipeline benchmarks")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    p.add_argument("--sizes", type=lambda v: _csv(v, int), help="Page counts, overrides --profile")
+    p.add_argument("--kinds", type=_csv, default=list(KINDS))
+    p.add_argument("--levels", type=lambda v: _csv(v, int), default=list(LEVELS))
+    p.add_argument("--bindings", type=lambda v: _csv(v, str.upper), default=list(BINDINGS))
+    p.add_argument("--memory", action="store_true", help="Also track Python peak memory per stage (second pass)")
+    p.add_argument("--in-process", action="store_true",
+                   help="Run every case in this process (faster; RSS then accumulates across cases)")
+    p.add_argument("--engine", choices=list(ENGINES), default="list", help="Panel arrangement engine")
+    p.add_argument("--report", help="Write results as JSON")
+    p.add_argument("--baseline", help="Fail on regressions against this stored result")
+    p.add_argument("--save-baseline", help="Store this run as a baseline")
+    p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown (0.25 = 25%%)")
+    p.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA, help="Ignore slowdowns below this many seconds")
+    p.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                   help="Allowed peak RSS growth per case (0.25 = 25%%)")
+    p.add_argument("--min-rss-delta", type=float, default=DEFAULT_MIN_RSS_DELTA,
+                   help="Ignore peak RSS growth below this many MiB")
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    sizes = args.sizes or PROFILES[args.profile]
+
+    results = run(sizes, args.kinds, args.levels, args.bindings, memory=args.memory, engine=args.engine,
+                  isolate=not args.in_process, progress=lambda name: print(".", end="", flush=True, file=sys.stderr))
+    print(file=sys.stderr)
+    for name, case in results["cases"].items():
+        print(_format_row(name, case))
+    print(f"peak RSS: {max(case['peak_rss_mb'] for case in results['cases'].values()):.0f} MiB (largest case)")
+
+    for path in (args.report, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, threshold=args.threshold, min_delta=args.min_delta,
+                                          memory_threshold=args.memory_threshold,
+                                          min_rss_delta=args.min_rss_delta)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+# benchmarks/synthetic.py
+
+import os
+import random
+from typing import Optional
+
+import fitz
+
+KINDS = ("text", "image")
+# Small random (incompressible) images keep 20k-page sources generatable
+IMAGE_SIDE = 64
+
+
+def make_source(pages: int, kind: str = "text", *, seed: int = 0, path: Optional[str] = None) -> fitz.Document:
+    """
+    Synthetic A4 source: every page carries its number (text) or, for "image",
+    a distinct random RGB image under the number. Saved to `path` if given.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown kind {kind!r}, expected one of {KINDS}")
+    rng = random.Random(seed)
+    doc = fitz.open()
+    rect = fitz.paper_rect("a4")
+    for i in range(pages):
+        page = doc.new_page(width=rect.width, height=rect.height)
+        if kind == "image":
+            samples = rng.randbytes(IMAGE_SIDE * IMAGE_SIDE * 3)
+            pix = fitz.Pixmap(fitz.csRGB, IMAGE_SIDE, IMAGE_SIDE, samples, False)
+            page.insert_image(page.rect + (72, 144, -72, -72), pixmap=pix)
+        page.insert_text((72, 96), f"Page {i + 1}", fontsize=36)
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        doc.save(path, garbage=1, deflate=True)
+    return doc
@@ -0,0 +1,9 @@
+# Headless entry point: `python -m cli scans/ --level 3 ...` (same options as
+# cli.cli_runner). Never imports PyQt6; PyMuPDF loads when the first source opens.
+
+import sys
+
+from cli.cli_runner import run_cli
+
+if __name__ == '__main__':
+    sys.exit(run_cli())
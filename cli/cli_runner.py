@@ -1,30 +1,469 @@
 import argparse
-import fitz
-from core.signature_logic import choose_best_plan
-from core.imposition import impose_A5_booklet, impose_A6_nup, impose_A7_nup
-
-def run_cli():
-    p = argparse.ArgumentParser(description='PDF imposition CLI')
-    p.add_argument('src', help='Source PDF path')
-    p.add_argument('--target', choices=['a5','a6','a7'], default='a5')
-    args = p.parse_args()
-
-    src = fitz.open(args.src)
-    best, _ = choose_best_plan(len(src))
-    if args.target == 'a5':
-        out = impose_A5_booklet(src, best, None)
-        suffix = '_A5_booklet_spreads.pdf'
-    elif args.target == 'a6':
-        out = impose_A6_nup(src, best, None)
-        suffix = '_A6_4up.pdf'
+import io
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Union
+
+# MuPDF prints its warnings to stdout, which would corrupt a PDF written
+# there (-o -); send them to stderr with the logs, before fitz is imported.
+os.environ.setdefault('PYMUPDF_MESSAGE', 'fd:2')
+
+from config import LEVEL_SUFFIXES
+from core.signature_logic import PlanWeights, choose_best_plan, plan_signatures
+from core.imposition import impose_cut_stack
+from core.incremental import DEFAULT_CACHE_BYTES, ImpositionCache
+from core.instrument import Recorder, record_to, stage, write_profile
+from core.layout import ENGINES, build_placement_table
+from core.lazy import lazy_import
+from core.partial import impose_partial, parse_ranges, parse_sides
+from core.progress import CancelFn, ImpositionCancelled
+from core.raster import COLOR_MODES, DEFAULT_DPI, RASTER_FORMATS, RasterSpec, impose_to_raster
+from core.shards import MANIFEST_NAME, PER_SIGNATURE, impose_to_shards
+from core.pdfio import STDIO, Source, Target, describe, is_path, open_source, stream_position, written_bytes
+from core.output import (
+    DEFAULT_CHUNK_SHEETS, DEFAULT_SAVE_PROFILE, SAVE_PROFILES, impose_to_file, save_document,
+)
+from core.verify import verify_output
+from utils.logger import LOGGER_NAME, setup_logging
+
+fitz = lazy_import('fitz')
+
+TARGET_LEVELS = {'a5': 1, 'a6': 2, 'a7': 3, 'a8': 4}
+
+log = logging.getLogger(__name__)
+
+
+def configure_logging(verbose: bool = False) -> None:
+    """CLI progress at INFO; per-signature imposition detail only with --verbose."""
+    setup_logging(__name__, logging.DEBUG if verbose else logging.INFO)
+    if not verbose:
+        logging.getLogger(LOGGER_NAME).setLevel(logging.WARNING)
+
+
+def collect_sources(inputs: List[str]) -> List[str]:
+    """Expand directories to the PDFs they contain (sorted, non-recursive)."""
+    sources: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            sources.extend(sorted(
+                os.path.join(item, name) for name in os.listdir(item)
+                if name.lower().endswith('.pdf')
+            ))
+        else:
+            sources.append(item)
+    return sources
+
+
+def output_path_for(src: str, level: int, out_dir: Optional[str] = None, partial: bool = False) -> str:
+    base = os.path.splitext(os.path.basename(src))[0] + LEVEL_SUFFIXES[level]
+    if partial:
+        base = base[:-len('.pdf')] + '_partial.pdf'
+    return os.path.join(out_dir or os.path.dirname(src), base)
+
+
+def impose_file(src: Source, out_path: Target, *, level: int, binding: str,
+                stream: bool = False, chunk_sheets: int = DEFAULT_CHUNK_SHEETS,
+                engine: str = 'list', sizes: Optional[List[int]] = None,
+                weights: Optional[Dict[str, float]] = None,
+                save_profile: str = DEFAULT_SAVE_PROFILE, dedup: bool = False,
+                profile: bool = False, profile_memory: bool = False,
+                selection: Optional[Dict[str, list]] = None,
+                cache_dir: Optional[str] = None, cache_bytes: Optional[int] = None,
+                name: Optional[str] = None, cancelled: Optional[CancelFn] = None,
+                verify: bool = False, raster: Optional[RasterSpec] = None,
+                shards: Optional[Union[str, int]] = None, workers: Optional[int] = 1) -> Dict[str, Any]:
+    """
+    Impose one file; never raises, failures are reported in the result.
+    `src` is a path, '-' (stdin), the PDF bytes or a binary stream; `out_path`
+    is a path, '-' (stdout) or a writable binary stream. Streams are only
+    supported by the default and partial modes, which save in one go.
+    `name` labels an in-memory source in the result and profile. `cancelled` is
+    polled between signatures of a full or streamed imposition (status 'cancelled').
+    With `profile`, the result carries per-stage spans and counters under 'trace'.
+    `selection` ({'signatures': [...], 'sheets': [...], 'sides': [(sheet, side), ...]})
+    writes only those sheet sides (see core.partial). `cache_dir` (or
+    `cache_bytes`) enables incremental re-imposition (see core.incremental).
+    `verify` reads the finished output back and checks every placement
+    (core.verify); a mismatch fails the job, with the findings under 'verify'.
+    `raster` writes one image per sheet side instead of a PDF, into the
+    directory named like `out_path` without its extension (see core.raster).
+    `shards` ('signature' or a number of sheets) writes one PDF per signature
+    or per run of about that many sheets into such a directory, with a manifest (see core.shards).
+    `workers` renders the file in that many processes (None = all cores) in
+    the default, stream, raster and shard modes.
+    """
+    name = name or ('<stdin>' if src == STDIO else describe(src))
+    result: Dict[str, Any] = {'source': name, 'output': '<stdout>' if out_path == STDIO else describe(out_path),
+                              'level': level, 'binding': binding}
+    recorder = Recorder(os.path.basename(name), memory=profile_memory) if profile else None
+    with record_to(recorder), stage('job', source=name):
+        _impose_file(result, src, out_path, level=level, binding=binding, stream=stream,
+                     chunk_sheets=chunk_sheets, engine=engine, sizes=sizes, weights=weights,
+                     save_profile=save_profile, dedup=dedup, selection=selection,
+                     cache_dir=cache_dir, cache_bytes=cache_bytes, cancelled=cancelled, verify=verify,
+                     raster=raster, shards=shards, workers=workers)
+    if recorder is not None:
+        result['trace'] = recorder.to_dict()
+    return result
+
+
+def _impose_file(result: Dict[str, Any], src: Source, out_path: Target, *, level: int, binding: str,
+                 stream: bool, chunk_sheets: int, engine: str, sizes: Optional[List[int]],
+                 weights: Optional[Dict[str, float]], save_profile: str, dedup: bool,
+                 selection: Optional[Dict[str, list]], cache_dir: Optional[str],
+                 cache_bytes: Optional[int], cancelled: Optional[CancelFn], verify: bool,
+                 raster: Optional[RasterSpec], shards: Optional[Union[str, int]], workers: Optional[int]) -> None:
+    timings: Dict[str, float] = {}
+    t_start = time.perf_counter()
+    src_doc = None
+    try:
+        t = time.perf_counter()
+        with stage('open'):
+            src_doc = open_source(sys.stdin.buffer if src == STDIO else src)
+        timings['open'] = time.perf_counter() - t
+        if len(src_doc) == 0:
+            raise ValueError('source has no pages')
+
+        t = time.perf_counter()
+        with stage('plan'):
+            best = choose_plan(len(src_doc), level, sizes, weights)
+        timings['plan'] = time.perf_counter() - t
+
+        if out_path == STDIO:
+            out_path = sys.stdout.buffer
+        if not is_path(out_path) and (stream or cache_dir is not None or cache_bytes is not None):
+            raise ValueError('--stream and --cache-dir need a file path as output')
+        if verify and selection:
+            raise ValueError('--verify checks full impositions, not a selection')
+        if raster is not None and (not is_path(out_path) or selection or stream or verify or shards is not None
+                                   or cache_dir is not None or cache_bytes is not None):
+            raise ValueError('--raster writes image files next to a path and combines with no other output mode')
+        if shards is not None and (not is_path(out_path) or selection or stream or verify
+                                   or cache_dir is not None or cache_bytes is not None):
+            raise ValueError('--shards writes PDF files next to a path and combines with no other output mode')
+        start = stream_position(out_path)
+
+        sheets = None
+        paths = None
+        if raster is not None:
+            out_dir = os.path.splitext(out_path)[0]
+            t = time.perf_counter()
+            paths = impose_to_raster(src_doc, best, out_dir, level=level, binding=binding, spec=raster,
+                                     workers=workers, engine=engine, dedup=dedup, cancelled=cancelled)
+            timings['impose_raster'] = time.perf_counter() - t
+            pages = len(paths)
+            result['output'] = out_dir
+            result['raster'] = {'format': raster.format, 'dpi': raster.dpi, 'color': raster.color,
+                                'files': [os.path.basename(path) for path in paths]}
+        elif shards is not None:
+            out_dir = os.path.splitext(out_path)[0]
+            t = time.perf_counter()
+            done = impose_to_shards(src_doc, best, out_dir, level=level, binding=binding,
+                                    shard_size=shards, workers=workers, engine=engine,
+                                    save_profile=save_profile, dedup=dedup, cancelled=cancelled,
+                                    on_shard=lambda shard: log.info('%s: shard %d ready (sheets %d-%d)',
+                                                                    result['source'], shard.index, *shard.sheets))
+            timings['impose_shards'] = time.perf_counter() - t
+            paths = [shard.path for shard in done]
+            pages = sum(shard.pages for shard in done)
+            result['output'] = out_dir
+            result['shards'] = {'manifest': os.path.join(out_dir, MANIFEST_NAME),
+                                'files': [os.path.basename(path) for path in paths]}
+        elif selection:
+            t = time.perf_counter()
+            out, refs = impose_partial(src_doc, best, level=level, binding=binding, engine=engine, **selection)
+            timings['impose'] = time.perf_counter() - t
+
+            timings['save'] = save_document(out, out_path, save_profile)
+            pages = len(out)
+            out.close()
+            sheets = len({sheet for sheet, _ in refs})
+            result['selection'] = [f'{sheet}:{side}' for sheet, side in refs]
+        elif cache_dir is not None or cache_bytes is not None:
+            t = time.perf_counter()
+            cache = ImpositionCache(cache_dir, cache_bytes or DEFAULT_CACHE_BYTES)
+            inc = cache.impose(src_doc, best, out_path, level=level, binding=binding, save_profile=save_profile,
+                               engine=engine, dedup=dedup, workers=workers)
+            timings['impose_save'] = time.perf_counter() - t
+            pages = inc.output_pages
+            result['incremental'] = {
+                'status': inc.status,
+                'changed_pages': inc.changed_pages,
+                'redrawn_sides': [f'{sheet}:{side}' for sheet, side in inc.redrawn_sides],
+            }
+        elif stream:
+            t = time.perf_counter()
+            pages = impose_to_file(src_doc, best, out_path, level=level, binding=binding,
+                                   chunk_sheets=chunk_sheets, engine=engine, save_profile=save_profile,
+                                   dedup=dedup, workers=workers, cancelled=cancelled)
+            timings['impose_save'] = time.perf_counter() - t
+        else:
+            t = time.perf_counter()
+            out = impose_cut_stack(src_doc, best, level=level, binding=binding, engine=engine, dedup=dedup,
+                                   workers=workers, cancelled=cancelled)
+            timings['impose'] = time.perf_counter() - t
+
+            if verify and not is_path(out_path):
+                # check what is written: save to memory, verify that, then copy it out
+                buf = io.BytesIO()
+                timings['save'] = save_document(out, buf, save_profile)
+                with fitz.open('pdf', buf.getbuffer()) as saved:
+                    _verify(result, timings, saved, src_doc, best, level, binding)
+                out_path.write(buf.getbuffer())
+                out_path.flush()
+            else:
+                timings['save'] = save_document(out, out_path, save_profile)
+            pages = len(out)
+            out.close()
+        if verify and 'verify' not in result:
+            # read back the file as saved, so the save profile's rewriting is checked too
+            with fitz.open(out_path) as out:
+                _verify(result, timings, out, src_doc, best, level, binding)
+
+        result.update({
+            'status': 'ok',
+            'source_pages': len(src_doc),
+            'plan': {
+                'expression': best.expression,
+                'sequence': best.sequence,
+                'total_pages': best.total_pages,
+            },
+            'blanks': best.blanks,
+            'output_pages': pages,
+            'sheets': pages // 2 if sheets is None else sheets,
+            'save_profile': save_profile,
+            'output_bytes': (sum(os.path.getsize(path) for path in paths) if paths is not None
+                             else written_bytes(out_path, start)),
+        })
+    except ImpositionCancelled as e:
+        result.update({'status': 'cancelled', 'error': str(e)})
+    except Exception as e:
+        result.update({'status': 'error', 'error': f'{type(e).__name__}: {e}'})
+    finally:
+        # also on errors and cancellation: pool workers live on between jobs
+        if src_doc is not None:
+            src_doc.close()
+    timings['total'] = time.perf_counter() - t_start
+    result['timings'] = {k: round(v, 6) for k, v in timings.items()}
+
+
+def _verify(result: Dict[str, Any], timings: Dict[str, float], out, src_doc, plan,
+            level: int, binding: str) -> None:
+    t = time.perf_counter()
+    with stage('verify_output'):
+        report = verify_output(out, src_doc, build_placement_table(plan.sequence, level, binding))
+    timings['verify'] = time.perf_counter() - t
+    result['verify'] = report.to_dict()
+    report.raise_for_errors()
+
+
+def choose_plan(n_pages: int, level: int, sizes: Optional[List[int]] = None,
+                weights: Optional[Dict[str, float]] = None):
+    """The fixed-pair planner by default; the DP planner when sizes or weights are given."""
+    if sizes is None and weights is None:
+        best, _ = choose_best_plan(n_pages)
+        return best
+    return plan_signatures(n_pages, sizes, level=level,
+                           weights=PlanWeights(**(weights or {})))
+
+
+def parse_shards(value: str) -> Union[str, int]:
+    """'signature' -> one shard per signature; 'N' -> shards of about N sheets."""
+    if value == PER_SIGNATURE:
+        return value
+    try:
+        sheets = int(value)
+    except ValueError:
+        sheets = 0
+    if sheets < 1:
+        raise argparse.ArgumentTypeError(f"expected {PER_SIGNATURE!r} or at least 1 sheet, got {value!r}")
+    return sheets
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """'blank=1,signature=2' -> {'blank': 1.0, 'signature': 2.0}"""
+    out: Dict[str, float] = {}
+    for item in value.split(','):
+        key, _, num = item.partition('=')
+        if key.strip() not in PlanWeights.__dataclass_fields__:
+            raise argparse.ArgumentTypeError(f'unknown weight {key!r}')
+        out[key.strip()] = float(num)
+    return out
+
+
+def _read_stdin() -> bytes:
+    """Read a PDF piped to stdin up front, so the job can also run in a worker process."""
+    return sys.stdin.buffer.read()
+
+
+def _impose_job(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return impose_file(**kwargs)
+
+
+def run_batch(jobs: List[Dict[str, Any]], workers: int = 1, verbose: bool = False) -> List[Dict[str, Any]]:
+    """Run jobs on a process pool; results come back in input order."""
+    if workers <= 1 or len(jobs) <= 1:
+        results = []
+        for job in jobs:
+            results.append(_impose_job(job))
+            _report_one(results[-1])
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing
+
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                             initializer=configure_logging, initargs=(verbose,)) as pool:
+        for res in pool.map(_impose_job, jobs):
+            results.append(res)
+            _report_one(res)
+    return results
+
+
+def _report_one(res: Dict[str, Any]) -> None:
+    if res['status'] == 'ok':
+        log.info('Saved: %s (%s, %d sheets, %d blanks, %.2fs)', res['output'],
+                 res['plan']['expression'], res['sheets'], res['blanks'], res['timings']['total'])
     else:
-        out = impose_A7_nup(src, best, None)
-        suffix = '_A7_8up.pdf'
+        log.error('Failed: %s: %s', res['source'], res['error'])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description='PDF imposition CLI (batch)')
+    p.add_argument('inputs', nargs='+', help="Source PDF files and/or directories of PDFs ('-' for stdin)")
+    level = p.add_mutually_exclusive_group()
+    level.add_argument('--target', choices=sorted(TARGET_LEVELS), help='Output size (a5=level 1 … a8=level 4)')
+    level.add_argument('--level', type=int, choices=[1, 2, 3, 4], help='Fold level')
+    p.add_argument('--binding', choices=['LTR', 'RTL'], default='LTR', type=str.upper)
+    p.add_argument('--out-dir', help='Directory for outputs (default: next to each source)')
+    p.add_argument('-o', '--output', metavar='PATH',
+                   help="Output of a single input ('-' for stdout, the default for stdin input)")
+    p.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                   help='Files imposed in parallel (default: all cores)')
+    p.add_argument('--stream', action='store_true', help='Write outputs in chunks with bounded memory')
+    p.add_argument('--chunk-sheets', type=int, default=DEFAULT_CHUNK_SHEETS,
+                   help='Sheets per chunk in --stream mode')
+    p.add_argument('--save-profile', choices=sorted(SAVE_PROFILES), default=DEFAULT_SAVE_PROFILE,
+                   help='Output compression / garbage collection (default: %(default)s)')
+    p.add_argument('--signatures', type=parse_ranges, metavar='LIST',
+                   help='Impose only these signatures, e.g. 3 or 2,5-7 (writes *_partial.pdf)')
+    p.add_argument('--sheets', type=parse_ranges, metavar='LIST',
+                   help='Impose only these sheets (both sides), e.g. 37 or 36-38')
+    p.add_argument('--sides', type=parse_sides, metavar='LIST',
+                   help='Impose only these sheet sides, e.g. 37:front,38:back')
+    p.add_argument('--cache-dir', nargs='?', const='',
+                   help='Reuse earlier outputs: redraw only sheets whose source pages changed '
+                        '(default dir: $PDFENGINE_CACHE_DIR or ~/.cache/pdfengine/impositions)')
+    p.add_argument('--cache-size', type=int, metavar='MB',
+                   help='Evict least recently used cache entries above this size (default 2048)')
+    p.add_argument('--dedup', action='store_true',
+                   help='Store repeated source pages and resources once in the output')
+    p.add_argument('--sizes', type=lambda v: [int(x) for x in v.split(',')],
+                   help='Allowed signature sizes for the cost-based planner, e.g. 32,24,16')
+    p.add_argument('--weights', type=parse_weights,
+                   help='Planner cost weights, e.g. blank=1,sheet=0,signature=0.5')
+    p.add_argument('--engine', choices=list(ENGINES), default='list',
+                   help='Panel arrangement implementation (numpy needs numpy installed)')
+    p.add_argument('--raster', choices=list(RASTER_FORMATS),
+                   help='Write one image per sheet side into a directory instead of a PDF')
+    p.add_argument('--dpi', type=int, default=DEFAULT_DPI, help='--raster resolution (default: %(default)s)')
+    p.add_argument('--color', choices=sorted(COLOR_MODES), default='rgb',
+                   help='--raster color mode (cmyk needs tiff; default: %(default)s)')
+    p.add_argument('--shards', type=parse_shards, metavar='signature|N',
+                   help='Write each signature, or runs of whole signatures of about N sheets, to its own PDF '
+                        'in a directory with a manifest.json, as each is finished')
+    p.add_argument('--verify', action='store_true',
+                   help='Read each output back and check that every source page is placed once, '
+                        'on the right side and rotation')
+    p.add_argument('--report', help="Write a JSON summary to this path ('-' for stdout)")
+    p.add_argument('--profile', metavar='PATH',
+                   help='Record per-stage wall/CPU time, memory and operation counts to PATH')
+    p.add_argument('--profile-format', choices=['chrome', 'json'], default='chrome',
+                   help='chrome: trace-event file for chrome://tracing / Perfetto; json: raw spans')
+    p.add_argument('--profile-memory', action='store_true',
+                   help='Also trace Python allocations per stage (slower)')
+    p.add_argument('-v', '--verbose', action='store_true', help='Debug logging')
+    return p
+
+
+def run_cli(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    configure_logging(args.verbose)
+
+    level = args.level or TARGET_LEVELS[args.target or 'a5']
+    sources = collect_sources(args.inputs)
+    if sources.count(STDIO) > 1:
+        parser.error("stdin ('-') can only be read once")
+    if args.output is not None and len(sources) != 1:
+        parser.error('--output needs exactly one input')
+    if args.output is None and sources == [STDIO] and not args.out_dir:
+        args.output = STDIO
+    if args.output == STDIO and args.report == '-':
+        parser.error('--report - and --output - would both write to stdout')
+    if args.verify and (args.signatures or args.sheets or args.sides):
+        parser.error('--verify checks full impositions, not --signatures/--sheets/--sides')
+    raster = None
+    if args.raster:
+        try:
+            raster = RasterSpec(args.raster, args.dpi, args.color)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.output == STDIO:
+            parser.error('--raster writes files; give --out-dir or a --output path')
+    if args.shards is not None and args.output == STDIO:
+        parser.error('--shards writes files; give --out-dir or a --output path')
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    selection = {key: getattr(args, key) for key in ('signatures', 'sheets', 'sides') if getattr(args, key)}
+    jobs = [
+        dict(src=_read_stdin() if src == STDIO else src, name='<stdin>' if src == STDIO else None,
+             out_path=args.output or output_path_for('stdin' if src == STDIO else src, level, args.out_dir,
+                                                     partial=bool(selection)),
+             level=level,
+             binding=args.binding, stream=args.stream, chunk_sheets=args.chunk_sheets,
+             engine=args.engine, sizes=args.sizes, weights=args.weights,
+             save_profile=args.save_profile, dedup=args.dedup,
+             profile=bool(args.profile), profile_memory=args.profile_memory,
+             selection=selection or None,
+             cache_dir=args.cache_dir, cache_bytes=args.cache_size and args.cache_size * 1024 * 1024,
+             verify=args.verify, raster=raster, shards=args.shards,
+             # one file: its signatures are rendered in parallel instead of the files
+             workers=args.jobs if len(sources) == 1 else 1)
+        for src in sources
+    ]
+    t = time.perf_counter()
+    results = run_batch(jobs, args.jobs, args.verbose)
+    elapsed = time.perf_counter() - t
+
+    if args.profile:
+        traces = [r.pop('trace') for r in results]
+        write_profile(traces, args.profile, args.profile_format)
+        for r, trace in zip(results, traces):
+            r['profile'] = {'stages': trace['stages'], 'counters': trace['counters']}
+        log.info('Profile: %s (%s)', args.profile, args.profile_format)
+
+    failed = sum(1 for r in results if r['status'] != 'ok')
+    summary = {
+        'files': len(results),
+        'failed': failed,
+        'workers': args.jobs,
+        'elapsed': round(elapsed, 6),
+        'results': results,
+    }
+    if args.report == '-':
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    elif args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    log.info('Done: %d file(s), %d failed, %.2fs', len(results), failed, elapsed)
+    return 1 if failed else 0
 
-    out_path = args.src.rsplit('.',1)[0] + suffix
-    out.save(out_path)
-    out.close()
-    print('Saved:', out_path)
 
 if __name__ == '__main__':
-    run_cli()
+    sys.exit(run_cli())
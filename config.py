@@ -1,3 +1,7 @@
 # App-wide configuration
 SIG_PAIRS = [(32,28),(28,24),(24,20),(20,16)]
 PAGE_MARGIN = 5
+# Panel grid (rows, cols) per side for each fold level
+LEVEL_GRIDS = {1: (2, 1), 2: (2, 2), 3: (4, 2), 4: (4, 4)}
+# Output file suffix per fold level (GUI and CLI)
+LEVEL_SUFFIXES = {1: '_A5_booklet.pdf', 2: '_A6_booklet.pdf', 3: '_A7_booklet.pdf', 4: '_A8_booklet.pdf'}
@@ -0,0 +1,270 @@
+# core/dedup.py
+
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from core.instrument import count, stage
+from core.lazy import lazy_import
+from utils.logger import get_logger
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("dedup")
+
+# Indirect references of any generation; only applied outside string literals
+_REF = re.compile(r"(?<![\d.])(\d+)\s+\d+\s+R(?![^\s/\[\]<>()%])")
+_PARENT = re.compile(r"/Parent\s*\d+\s+\d+\s+R")
+_DELIMITER = re.compile(r"[(<]")
+_CYCLE = b"\0cycle"
+
+
+def _object_spans(text: str) -> Iterator[Tuple[bool, str]]:
+    """Split an object's text into (is_syntax, chunk); literal and hex strings are not syntax."""
+    start = 0
+    n = len(text)
+    m = _DELIMITER.search(text)
+    while m is not None:
+        i = m.start()
+        c = text[i]
+        if text.startswith("<<", i):
+            m = _DELIMITER.search(text, i + 2)
+        else:
+            yield True, text[start:i]
+            j, depth = i + 1, 1
+            if c == "<":
+                j = text.find(">", j) + 1 or n
+            else:
+                while j < n and depth:
+                    ch = text[j]
+                    if ch == "\\":
+                        j += 1
+                    elif ch == "(":
+                        depth += 1
+                    elif ch == ")":
+                        depth -= 1
+                    j += 1
+            yield False, text[i:j]
+            start = j
+            m = _DELIMITER.search(text, j)
+    yield True, text[start:]
+
+
+@dataclass
+class DedupReport:
+    pages: int = 0
+    unique_pages: int = 0
+    shared_resources: int = 0      # resource objects used by more than one page
+    duplicate_resources: int = 0   # distinct objects with identical content
+    duplicate_page_bytes: int = 0  # content + resources of pages drawn through another page's XObject
+    duplicate_resource_bytes: int = 0
+    placements: int = 0
+    placements_reused: int = 0     # placements that reuse an existing XObject
+
+    @property
+    def duplicate_pages(self) -> int:
+        return self.pages - self.unique_pages
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.duplicate_page_bytes + self.duplicate_resource_bytes
+
+    def summary(self) -> str:
+        return (f"{self.duplicate_pages}/{self.pages} duplicate pages, "
+                f"{self.duplicate_resources} duplicate and {self.shared_resources} shared resources, "
+                f"{self.placements_reused}/{self.placements} placements reuse an XObject, "
+                f"~{self.bytes_saved / 1024:.0f} KiB not copied")
+
+
+class _Hasher:
+    """Content digests of objects with references resolved, memoized per xref."""
+
+    def __init__(self, doc: fitz.Document):
+        self.doc = doc
+        self.digests: Dict[int, bytes] = {}
+        self.sizes: Dict[int, int] = {}      # raw stream / object size per xref
+        self.closure: Dict[int, Set[int]] = {}
+
+    def xref(self, xref: int) -> bytes:
+        digest = self.digests.get(xref)
+        if digest is not None:
+            return digest
+        self.digests[xref] = _CYCLE
+        doc = self.doc
+        obj = doc.xref_object(xref, compressed=True)
+        refs: Set[int] = {xref}
+        h = blake2b(digest_size=16)
+        h.update(self._resolve(obj, refs, drop_parent=True).encode())
+        size = len(obj)
+        if doc.xref_is_stream(xref):
+            raw = doc.xref_stream_raw(xref) or b""
+            h.update(raw)
+            size += len(raw)
+        self.sizes[xref] = size
+        self.closure[xref] = refs
+        digest = self.digests[xref] = h.digest()
+        return digest
+
+    def _resolve(self, text: str, refs: Set[int], drop_parent: bool = False) -> str:
+        """`text` with every indirect reference replaced by the digest of its object."""
+        def sub(m: "re.Match[str]") -> str:
+            ref = int(m.group(1))
+            digest = self.xref(ref)
+            refs.update(self.closure.get(ref, ()))
+            return digest.hex()
+
+        parts = []
+        for syntax, chunk in _object_spans(text):
+            if syntax:
+                if drop_parent:  # the page tree is not part of what a page shows
+                    chunk = _PARENT.sub("", chunk)
+                chunk = _REF.sub(sub, chunk)
+            parts.append(chunk)
+        return "".join(parts)
+
+    def page_resources(self, page_xref: int, refs: Set[int]) -> str:
+        """The (possibly inherited) /Resources of a page, references resolved."""
+        doc, xref = self.doc, page_xref
+        for _ in range(64):  # page tree depth guard
+            kind, value = doc.xref_get_key(xref, "Resources")
+            if kind != "null":
+                return self._resolve(value, refs)
+            kind, value = doc.xref_get_key(xref, "Parent")
+            if kind != "xref":
+                break
+            xref = int(value.split()[0])
+        return ""
+
+    def page(self, pno: int) -> Tuple[bytes, Set[int], int]:
+        """(fingerprint, resource xrefs, content bytes) of one page."""
+        page = self.doc[pno]
+        content = page.read_contents()
+        refs: Set[int] = set()
+        h = blake2b(digest_size=16)
+        h.update(repr((tuple(page.mediabox), tuple(page.cropbox), page.rotation)).encode())
+        h.update(self.page_resources(page.xref, refs).encode())
+        h.update(content)
+        return h.digest(), refs, len(content)
+
+
+def fingerprint_pages(doc: fitz.Document, pages: Optional[Sequence[int]] = None) -> List[bytes]:
+    """Stable digest per page of what show_pdf_page would copy (boxes, content, resources)."""
+    hasher = _Hasher(doc)
+    return [hasher.page(pno)[0] for pno in (range(len(doc)) if pages is None else pages)]
+
+
+def build_dedup_map(doc: fitz.Document) -> Tuple[List[int], DedupReport]:
+    """
+    canonical[i] is the first page whose content and resources are identical to
+    page i. Drawing canonical[i] instead of i lets show_pdf_page reuse a single
+    Form XObject for all copies.
+    """
+    hasher = _Hasher(doc)
+    report = DedupReport(pages=len(doc))
+    first: Dict[bytes, int] = {}
+    canonical: List[int] = []
+    users: Dict[int, int] = {}
+    for pno in range(len(doc)):
+        digest, refs, content_len = hasher.page(pno)
+        canon = first.setdefault(digest, pno)
+        canonical.append(canon)
+        if canon != pno:
+            report.duplicate_page_bytes += content_len + sum(hasher.sizes.get(x, 0) for x in refs)
+            continue
+        for x in refs:
+            users[x] = users.get(x, 0) + 1
+    report.unique_pages = len(first)
+    report.shared_resources = sum(1 for n in users.values() if n > 1)
+
+    by_digest: Dict[bytes, int] = {}
+    for x in users:
+        if by_digest.setdefault(hasher.digests[x], x) != x:
+            report.duplicate_resources += 1
+            report.duplicate_resource_bytes += hasher.sizes.get(x, 0)
+    return canonical, report
+
+
+def count_reuse(report: DedupReport, placed: Sequence[int]) -> DedupReport:
+    """Fill the placement counters from the (canonical) source indices drawn."""
+    report.placements = len(placed)
+    report.placements_reused = len(placed) - len(set(placed))
+    return report
+
+
+def merge_duplicate_resources(doc: fitz.Document, path: str) -> fitz.Document:
+    """
+    Copy of `doc` saved to `path` with byte-identical objects (images, fonts
+    embedded once per page, …) merged, so grafting copies each of them once.
+    garbage=4 is needed: level 3 only merges non-stream objects, which leaves
+    every image and font stream in place. Saving with garbage collection also
+    compacts the document being saved, so `doc` is first written unchanged to
+    a scratch file and that copy is collected instead. The result is opened
+    from the file, where MuPDF loads objects on demand: it costs two saves of
+    the source in time, not a second in-memory copy. The caller closes it and
+    removes `path`.
+    """
+    fd, scratch = tempfile.mkstemp(prefix="pdfengine-dedup-", suffix=".pdf",
+                                   dir=os.path.dirname(path) or None)
+    os.close(fd)
+    try:
+        doc.save(scratch)
+        copy = fitz.open(scratch)
+        try:
+            copy.save(path, garbage=4)
+        finally:
+            copy.close()
+    finally:
+        os.remove(scratch)
+    return fitz.open(path)
+
+
+@contextmanager
+def dedupe_placements(src_doc: fitz.Document, table) -> Iterator[Tuple[fitz.Document, DedupReport]]:
+    """
+    Point `table` at one canonical copy of every repeated source page and, if
+    distinct objects carry identical bytes, swap in a source where they are
+    merged. Yields the source to draw from and what was saved; a merged copy
+    lives in a temporary file that is closed and removed on exit.
+    """
+    from core.layout import BLANK  # layout imports geometry; keep this module light
+
+    with stage("dedup"):
+        canonical, report = build_dedup_map(src_doc)
+    n_src = len(src_doc)
+    if report.duplicate_pages:
+        table.source_map = canonical
+    count_reuse(report, [canonical[s] for _, _, s, _ in table if s != BLANK and s < n_src])
+    count("dedup_duplicate_pages", report.duplicate_pages)
+    count("dedup_placements_reused", report.placements_reused)
+    logger.info("Dedup: %s", report.summary())
+    if not report.duplicate_resources:
+        yield src_doc, report
+        return
+
+    fd, path = tempfile.mkstemp(prefix="pdfengine-dedup-", suffix=".pdf")
+    os.close(fd)
+    try:
+        with stage("dedup_merge"):
+            merged = merge_duplicate_resources(src_doc, path)
+        try:
+            yield merged, report
+        finally:
+            merged.close()
+    finally:
+        os.remove(path)
+
+
+@contextmanager
+def deduplicated(src_doc: fitz.Document, table, dedup: bool) -> Iterator[fitz.Document]:
+    """The source to draw `table` from: dedupe_placements' when `dedup` is set, else `src_doc`."""
+    if not dedup:
+        yield src_doc
+        return
+    with dedupe_placements(src_doc, table) as (source, _):
+        yield source
@@ -1,10 +1,16 @@
 # core/geometry.py
 
-import fitz
+from __future__ import annotations
+
+from functools import lru_cache
+from operator import itemgetter
 from typing import List, Optional, Tuple, Any
+
 from config import PAGE_MARGIN  # (kept if used elsewhere)
+from config import LEVEL_GRIDS
+from core.lazy import lazy_import
 
-LEVEL_GRIDS = {1: (2, 1), 2: (2, 2), 3: (4, 2),4 : (4, 4)}
+fitz = lazy_import("fitz")
 
 
 def rotate_cw(seq: List[Any]) -> List[Any]:
@@ -43,23 +49,27 @@ def paginate_to_matrix(num_pages: int, level: int, counter: int = 1) -> List[Lis
     return matrix
 
 
-def process_2d_array(matrix: List[List[Any]], level: int) -> List[List[Any]]:
-    if not matrix or not matrix[0]:
-        return []
-
-    current = [row[:] for row in matrix]
+@lru_cache(maxsize=None)
+def fold_segments(width: int, level: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    process_2d_array applied to the column indices of a single row. Every row
+    of a matrix folds the same way and the output lists all rows' first
+    segment, then all rows' second segment, and so on, so this small tuple
+    describes the whole arrangement. Cached per (width, level).
+    """
+    segments: List[List[int]] = [list(range(width))]
 
     # rotate once for level 3, twice for level 4, otherwise none
     rotations_left = 1 if level == 3 else (2 if level == 4 else 0)
 
     for _ in range(level):
-        if len(current[0]) <= 2:
+        if len(segments[0]) <= 2:
             break
 
         lefts, rights = [], []
         rotate_now = rotations_left > 0
 
-        for arr in current:
+        for arr in segments:
             mid = len(arr) // 2
             L, R = arr[:mid], arr[mid:]
             if rotate_now:
@@ -68,19 +78,39 @@ def process_2d_array(matrix: List[List[Any]], level: int) -> List[List[Any]]:
             lefts.append(L)
             rights.append(R)
 
-        current = lefts + rights
+        segments = lefts + rights
 
         if rotate_now:
             rotations_left -= 1
 
-    return current
+    return tuple(tuple(seg) for seg in segments)
+
+
+def _segment_getter(seg: Tuple[int, ...]):
+    # itemgetter with one index returns the item itself; a slice keeps a list
+    return itemgetter(*seg) if len(seg) > 1 else itemgetter(slice(seg[0], seg[0] + 1))
+
+
+def process_2d_array(matrix: List[List[Any]], level: int) -> List[List[Any]]:
+    """
+    Fold a rectangular matrix (see paginate_to_matrix): every step splits each
+    row into halves (rotated on levels 3/4) and stacks all left halves above
+    all right halves. The fold is worked out once per row width
+    (fold_segments) and applied by gathering straight from the input rows,
+    so only the result rows are allocated.
+    """
+    if not matrix or not matrix[0]:
+        return []
+    width = len(matrix[0])
+    if any(len(row) != width for row in matrix):
+        raise ValueError("process_2d_array needs rows of equal length")
 
+    return [list(get(row)) for get in map(_segment_getter, fold_segments(width, level)) for row in matrix]
 
 
 def split_front_back(arr: List[Any]) -> (List[Any], List[Any]):
-    front = [x for i, x in enumerate(arr, start=1) if i % 2 == 1]
-    back  = [x for i, x in enumerate(arr, start=1) if i % 2 == 0]
-    return front, back
+    """Odd rows (1st, 3rd, …) are fronts, even rows backs."""
+    return arr[0::2], arr[1::2]
 
 
 def front_pairs(fronts: List[List[Any]], level: int, signature_pages: int) -> List[Tuple[int, int]]:
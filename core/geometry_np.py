@@ -0,0 +1,121 @@
+# core/geometry_np.py
+#
+# NumPy engine for the panel arrangement: the same fold as paginate_to_matrix /
+# process_2d_array / split_front_back in geometry.py, expressed as index
+# permutations over whole arrays. Signatures of the same size are folded
+# together as one (signatures, rows, width) block. numpy is optional; the list
+# implementation in geometry.py stays the reference.
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from core.geometry import paginate_to_matrix, process_2d_array, split_front_back
+
+# Stand-in for None (padding) inside integer arrays
+PAD = -1
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("The numpy arrangement engine needs numpy (pip install numpy)")
+
+
+def _rotate_cw_last_axis(a: "np.ndarray") -> "np.ndarray":
+    """rotate_cw applied to every row of the last axis: [b0,t0,b1,t1,...]."""
+    c = a.shape[-1] // 2
+    return np.stack((a[..., c:], a[..., :c]), axis=-1).reshape(a.shape)
+
+
+def fold_blocks(blocks: "np.ndarray", level: int) -> "np.ndarray":
+    """
+    process_2d_array over a stack of matrices, shape (signatures, rows, width).
+    Returns shape (signatures, arranged_rows, arranged_width).
+    """
+    require_numpy()
+    current = blocks
+    rotations_left = 1 if level == 3 else (2 if level == 4 else 0)
+    for _ in range(level):
+        if current.shape[-1] <= 2:
+            break
+        mid = current.shape[-1] // 2
+        left, right = current[..., :mid], current[..., mid:]
+        if rotations_left > 0:
+            left = _rotate_cw_last_axis(left)
+            right = _rotate_cw_last_axis(right)
+            rotations_left -= 1
+        current = np.concatenate((left, right), axis=1)
+    return current
+
+
+def process_2d_array_np(matrix: List[List[Any]], level: int) -> List[List[Any]]:
+    """Drop-in counterpart of geometry.process_2d_array (None padding supported)."""
+    require_numpy()
+    if not matrix or not matrix[0]:
+        return []
+    block = np.array([[PAD if x is None else x for x in row] for row in matrix], dtype=np.int64)
+    arranged = fold_blocks(block[np.newaxis], level)[0]
+    return [[None if x == PAD else int(x) for x in row] for row in arranged.tolist()]
+
+
+def arrange_document_np(padded_sizes: Sequence[int], level: int) -> List[Tuple["np.ndarray", "np.ndarray"]]:
+    """
+    Fronts/backs for every signature of a document at once, with GLOBAL panel
+    numbers (signature i starts after the padded panels of 0..i-1). Signatures
+    sharing a size are folded in a single vectorized pass.
+    """
+    require_numpy()
+    width = 1 << level
+    starts = np.concatenate(([0], np.cumsum(padded_sizes, dtype=np.int64)[:-1])) + 1
+
+    by_size: Dict[int, List[int]] = {}
+    for i, size in enumerate(padded_sizes):
+        by_size.setdefault(size, []).append(i)
+
+    result: List[Tuple["np.ndarray", "np.ndarray"]] = [None] * len(padded_sizes)  # type: ignore[list-item]
+    for size, indices in by_size.items():
+        if size % width:
+            raise ValueError(f"padded signature size {size} is not a multiple of {width}")
+        local = np.arange(size, dtype=np.int64).reshape(1, size // width, width)
+        blocks = local + starts[indices].reshape(-1, 1, 1)
+        arranged = fold_blocks(blocks, level)
+        for j, i in enumerate(indices):
+            result[i] = (arranged[j, 0::2], arranged[j, 1::2])
+    return result
+
+
+def cross_check(padded_sizes: Sequence[int], level: int) -> bool:
+    """True when the NumPy engine reproduces the list implementation for this document."""
+    arranged = arrange_document_np(padded_sizes, level)
+    counter = 1
+    for size, (fronts, backs) in zip(padded_sizes, arranged):
+        ref_fronts, ref_backs = split_front_back(
+            process_2d_array(paginate_to_matrix(size, level, counter=counter), level))
+        if fronts.tolist() != ref_fronts or backs.tolist() != ref_backs:
+            return False
+        counter += size
+    return True
+
+
+def local_panel_pages_np(orig_sig_pages: int, padded_sig_pages: int, level: int, blanks: Sequence[int]) -> List[int]:
+    """
+    NumPy counterpart of layout._local_panel_pages: local panel (1-based index)
+    -> local page (1-based), PAD for padding blanks. Index 0 is unused.
+    """
+    fronts, backs = arrange_document_np([padded_sig_pages], level)[0]
+    panel_pages = np.full(padded_sig_pages + 1, PAD, dtype=np.int64)
+
+    k = np.arange(len(fronts), dtype=np.int64)
+    panel_pages[fronts[:, 0]] = 1 + 2 * k
+    panel_pages[fronts[:, 1]] = padded_sig_pages - 2 * k
+    k = np.arange(len(backs), dtype=np.int64)
+    panel_pages[backs[:, 0]] = 2 + 2 * k
+    panel_pages[backs[:, 1]] = padded_sig_pages - (2 * k + 1)
+
+    if len(blanks):
+        panel_pages[np.isin(panel_pages, np.fromiter(blanks, dtype=np.int64))] = PAD
+    panel_pages[0] = PAD
+    return panel_pages.tolist()
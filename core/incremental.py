@@ -0,0 +1,250 @@
+# core/incremental.py
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from hashlib import blake2b
+from typing import Iterator, List, Optional, Tuple
+
+from core.dedup import fingerprint_pages
+from core.imposition import impose_cut_stack
+from core.instrument import count, stage
+from core.layout import LAYOUT_VERSION
+from core.lazy import lazy_import
+from core.lookup import SIDES, PlacementIndex
+from core.output import DEFAULT_SAVE_PROFILE, save_document
+from core.partial import draw_sides
+from utils.logger import get_logger
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("incremental")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pdfengine", "impositions")
+DEFAULT_CACHE_BYTES = 2 * 1024 ** 3
+# Above this share of redrawn sides a full imposition is as cheap and leaves no dead objects
+MAX_REDRAW_RATIO = 0.5
+
+
+@dataclass
+class IncrementalResult:
+    status: str                     # "hit" (cached output reused), "incremental" or "full"
+    output_pages: int
+    changed_pages: List[int] = field(default_factory=list)   # 1-based source pages
+    redrawn_sides: List[Tuple[int, str]] = field(default_factory=list)
+    base: Optional[str] = None      # cache entry the output was derived from
+
+
+class ImpositionCache:
+    """
+    On-disk cache of finished impositions, one directory per (plan, level,
+    binding, page count, save profile, dedup) holding an output PDF and the page
+    fingerprints of its source per entry. A new source reuses the entry sharing the most
+    fingerprints: unchanged pages are kept and only the sheet sides that
+    show a changed page are redrawn. Entries are evicted least recently used
+    first once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.root = root or os.environ.get("PDFENGINE_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def layout_key(plan, level: int, binding: str, n_pages: int, save_profile: str = DEFAULT_SAVE_PROFILE,
+                   dedup: bool = False) -> str:
+        spec = [LAYOUT_VERSION, list(plan.sequence), level, binding.upper(), n_pages, save_profile]
+        if dedup:
+            spec.append("dedup")  # appended only when set, so existing entries keep their keys
+        spec = json.dumps(spec)
+        return blake2b(spec.encode(), digest_size=10).hexdigest()
+
+    @staticmethod
+    def source_key(fingerprints: List[bytes]) -> str:
+        h = blake2b(digest_size=16)
+        for fp in fingerprints:
+            h.update(fp)
+        return h.hexdigest()
+
+    def _entries(self, layout: str) -> List[str]:
+        folder = os.path.join(self.root, layout)
+        if not os.path.isdir(folder):
+            return []
+        return [os.path.join(folder, name[:-5]) for name in os.listdir(folder) if name.endswith(".json")]
+
+    @staticmethod
+    def _manifest(entry: str) -> Optional[dict]:
+        try:
+            with open(entry + ".json", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_fingerprints(self, entry: str) -> Optional[List[bytes]]:
+        manifest = self._manifest(entry)
+        try:
+            return [bytes.fromhex(h) for h in manifest["fingerprints"]]
+        except (TypeError, ValueError, KeyError):
+            return None
+
+    def _closest(self, layout: str, fingerprints: List[bytes]) -> Tuple[Optional[str], List[int]]:
+        """Entry sharing the most pages with `fingerprints` and the 0-based pages that differ."""
+        best, best_changed = None, None
+        for entry in self._entries(layout):
+            cached = self._load_fingerprints(entry)
+            if cached is None or len(cached) != len(fingerprints) or not os.path.exists(entry + ".pdf"):
+                continue
+            changed = [i for i, (a, b) in enumerate(zip(cached, fingerprints)) if a != b]
+            if best_changed is None or len(changed) < len(best_changed):
+                best, best_changed = entry, changed
+        return best, best_changed or []
+
+    def impose(self, src_doc: fitz.Document, plan, path: str, *,
+               level: int = 1,
+               binding: str = "LTR",
+               save_profile: str = DEFAULT_SAVE_PROFILE,
+               engine: str = "list",
+               dedup: bool = False,
+               workers: Optional[int] = 1,
+               max_redraw_ratio: float = MAX_REDRAW_RATIO) -> IncrementalResult:
+        """
+        Write the imposition of `src_doc` to `path`, reusing the cache where
+        possible. `engine`, `dedup` and `workers` apply to full impositions as
+        in impose_cut_stack. Deduplicated outputs are cached separately and
+        only reused whole: sides redrawn into them could not share the merged
+        objects, so a changed source is imposed in full.
+        """
+        with stage("fingerprint"):
+            fingerprints = fingerprint_pages(src_doc)
+        layout = self.layout_key(plan, level, binding, len(src_doc), save_profile, dedup)
+        key = self.source_key(fingerprints)
+        entry = os.path.join(self.root, layout, key)
+
+        manifest = self._manifest(entry)
+        if manifest is not None and os.path.exists(entry + ".pdf"):
+            shutil.copyfile(entry + ".pdf", path)
+            self._touch(entry)
+            count("cache_hit")
+            logger.info("Imposition cache hit: %s", key)
+            return IncrementalResult("hit", manifest["pages"], base=key)
+
+        base, changed = (None, []) if dedup else self._closest(layout, fingerprints)
+        index = PlacementIndex.from_plan(plan, level, binding, source_pages=len(src_doc))
+        result = None
+        if base is not None:
+            sides = sorted({(slot.sheet, slot.side) for slot in map(index.locate, (i + 1 for i in changed)) if slot},
+                           key=lambda ref: (ref[0], SIDES.index(ref[1])))
+            if len(sides) <= max_redraw_ratio * 2 * index.sheet_count:
+                result = self._patch(src_doc, index, base, sides, path, save_profile)
+                result.changed_pages = [i + 1 for i in changed]
+            else:
+                logger.info("%d of %d sides changed, imposing in full", len(sides), 2 * index.sheet_count)
+
+        if result is None:
+            out = impose_cut_stack(src_doc, plan, level=level, binding=binding, engine=engine, dedup=dedup,
+                                   workers=workers)
+            save_document(out, path, save_profile)
+            result = IncrementalResult("full", len(out))
+            out.close()
+
+        self._store(entry, path, fingerprints, result.output_pages)
+        self.evict()
+        return result
+
+    def _patch(self, src_doc: fitz.Document, index: PlacementIndex, base: str,
+               sides: List[Tuple[int, str]], path: str, save_profile: str) -> IncrementalResult:
+        with stage("patch", sides=len(sides)):
+            out = fitz.open(base + ".pdf")
+            try:
+                fresh = draw_sides(fitz.open(), src_doc, index, sides)
+                for k, (sheet, side) in enumerate(sides):
+                    pno = 2 * (sheet - 1) + SIDES.index(side)
+                    out.delete_page(pno)
+                    out.insert_pdf(fresh, from_page=k, to_page=k, start_at=pno)
+                fresh.close()
+                # dropped pages leave unreferenced objects; profiles without garbage collection keep them
+                save_document(out, path, save_profile)
+                pages = len(out)
+            finally:
+                out.close()
+        self._touch(base)
+        count("sides_redrawn", len(sides))
+        logger.info("Incremental imposition from %s: redrew %d of %d sides",
+                    os.path.basename(base), len(sides), pages)
+        return IncrementalResult("incremental", pages, redrawn_sides=sides, base=os.path.basename(base))
+
+    def _store(self, entry: str, path: str, fingerprints: List[bytes], pages: int) -> None:
+        # every writer gets its own temporary file, so concurrent jobs storing
+        # the same entry each replace it whole
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        with self._temporary(entry) as tmp:
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, entry + ".pdf")
+        with self._temporary(entry) as tmp:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"fingerprints": [fp.hex() for fp in fingerprints], "pages": pages,
+                           "created": time.time()}, f)
+            os.replace(tmp, entry + ".json")
+
+    @staticmethod
+    @contextmanager
+    def _temporary(entry: str) -> Iterator[str]:
+        """A new temporary file next to `entry`, removed unless it was moved into place."""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(entry), prefix=os.path.basename(entry) + ".",
+                                   suffix=".tmp")
+        os.close(fd)
+        try:
+            yield tmp
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    @staticmethod
+    def _touch(entry: str) -> None:
+        try:
+            os.utime(entry + ".json")
+        except OSError:
+            pass
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._all_entries())
+
+    def _all_entries(self) -> List[Tuple[str, int, float]]:
+        """(entry, bytes, last use) for every entry."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for layout in os.listdir(self.root):
+            for entry in self._entries(layout):
+                try:
+                    size = os.path.getsize(entry + ".json") + os.path.getsize(entry + ".pdf")
+                    used = os.path.getmtime(entry + ".json")
+                except OSError:
+                    continue
+                out.append((entry, size, used))
+        return out
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits; returns bytes freed."""
+        entries = sorted(self._all_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for entry, size, _ in entries:
+            if total - freed <= self.max_bytes:
+                break
+            for ext in (".json", ".pdf"):
+                try:
+                    os.remove(entry + ext)
+                except OSError:
+                    pass
+            freed += size
+            logger.debug("Evicted %s (%d bytes)", entry, size)
+        return freed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,209 @@
+# core/instrument.py
+#
+# Opt-in instrumentation of the imposition pipeline. Code marks its stages
+# with `stage("name")` and counts operations with `count("name", n)`; both are
+# no-ops unless a Recorder was installed with `record_to(recorder)`, the same
+# way `log_to` routes logs for the duration of a call.
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+_active: ContextVar[Optional["Recorder"]] = ContextVar("pdfengine_recorder", default=None)
+
+
+def _process_rss_peak_kb() -> Optional[float]:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+
+@dataclass
+class Span:
+    name: str
+    start: float          # epoch seconds
+    wall: float = 0.0     # seconds
+    cpu: float = 0.0      # process CPU seconds
+    depth: int = 0
+    py_peak_kb: Optional[float] = None  # Python allocation peak above the span's start (memory=True)
+    # Process-wide lifetime peak RSS when the span ended, and how far the span
+    # raised it: 0 when it stayed below an earlier peak (neither on Windows)
+    process_rss_peak_kb: Optional[float] = None
+    rss_peak_growth_kb: Optional[float] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class Recorder:
+    """
+    Collects spans (wall time, CPU time, peak memory) and counters for one job.
+    With `memory`, Python allocations are traced as well; that slows the job
+    down noticeably, so it is off by default.
+    """
+
+    def __init__(self, name: str = "job", *, memory: bool = False):
+        self.name = name
+        self.memory = memory
+        self.spans: List[Span] = []
+        self.counters: Dict[str, int] = {}
+        self.pid = os.getpid()
+        self._epoch = time.time() - time.perf_counter()
+        self._depth = 0
+        self._memory_stack: List[List[int]] = []
+        self._owns_tracing = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[Span]:
+        if self.memory:
+            self._push_memory()
+        span = Span(name, 0.0, depth=self._depth, args=args)
+        self._depth += 1
+        rss_before = _process_rss_peak_kb()
+        cpu = time.process_time()
+        t = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.wall = time.perf_counter() - t
+            span.cpu = time.process_time() - cpu
+            span.start = self._epoch + t
+            span.process_rss_peak_kb = _process_rss_peak_kb()
+            if rss_before is not None:
+                span.rss_peak_growth_kb = span.process_rss_peak_kb - rss_before
+            self._depth -= 1
+            if self.memory:
+                span.py_peak_kb = self._pop_memory()
+            with self._lock:
+                self.spans.append(span)
+
+    # tracemalloc keeps a single peak; every span resets it, so each open span
+    # carries the highest peak seen by its finished children ([base, carried])
+    def _push_memory(self) -> None:
+        if not self._memory_stack:
+            self._owns_tracing = not tracemalloc.is_tracing()
+            if self._owns_tracing:
+                tracemalloc.start()
+        else:
+            parent = self._memory_stack[-1]
+            parent[1] = max(parent[1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._memory_stack.append([tracemalloc.get_traced_memory()[0], 0])
+
+    def _pop_memory(self) -> float:
+        base, carried = self._memory_stack.pop()
+        peak = max(carried, tracemalloc.get_traced_memory()[1])
+        if self._memory_stack:
+            parent = self._memory_stack[-1]
+            parent[1] = max(parent[1], peak)
+        elif self._owns_tracing:
+            tracemalloc.stop()
+        return (peak - base) / 1024
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def stage_totals(self) -> Dict[str, Dict[str, float]]:
+        """Wall/CPU seconds and call count per span name."""
+        totals: Dict[str, Dict[str, float]] = {}
+        for s in self.spans:
+            t = totals.setdefault(s.name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            t["wall"] += s.wall
+            t["cpu"] += s.cpu
+            t["calls"] += 1
+            if s.py_peak_kb is not None:
+                t["py_peak_kb"] = max(t.get("py_peak_kb", 0.0), s.py_peak_kb)
+        for t in totals.values():
+            t["wall"] = round(t["wall"], 6)
+            t["cpu"] = round(t["cpu"], 6)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "pid": self.pid,
+            "spans": [asdict(s) for s in sorted(self.spans, key=lambda s: s.start)],
+            "stages": self.stage_totals(),
+            "counters": dict(self.counters),
+        }
+
+
+@contextmanager
+def record_to(recorder: Optional[Recorder]) -> Iterator[Optional[Recorder]]:
+    """Make `recorder` the target of stage()/count() inside the block (None: no-op)."""
+    if recorder is None:
+        yield None
+        return
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
+
+
+def active() -> Optional[Recorder]:
+    return _active.get()
+
+
+@contextmanager
+def _no_span() -> Iterator[None]:
+    yield None
+
+
+def stage(name: str, **args: Any):
+    """Span `name` on the active recorder, or a no-op context."""
+    rec = _active.get()
+    if rec is None:
+        return _no_span()
+    return rec.span(name, **args)
+
+
+def count(name: str, n: int = 1) -> None:
+    rec = _active.get()
+    if rec is not None:
+        rec.count(name, n)
+
+
+def to_chrome_trace(jobs: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Chrome trace-event JSON (chrome://tracing, Perfetto) for Recorder.to_dict()
+    results, one track per job. Counters become "C" events at the job's end.
+    """
+    starts = [s["start"] for job in jobs for s in job["spans"]]
+    t0 = min(starts) if starts else 0.0
+    events: List[Dict[str, Any]] = []
+    for tid, job in enumerate(jobs, start=1):
+        events.append({"name": "thread_name", "ph": "M", "pid": job["pid"], "tid": tid,
+                       "args": {"name": job["name"]}})
+        end = t0
+        for s in job["spans"]:
+            args = dict(s["args"], cpu_ms=round(s["cpu"] * 1000, 3),
+                        process_rss_peak_kb=s["process_rss_peak_kb"], rss_peak_growth_kb=s["rss_peak_growth_kb"])
+            if s["py_peak_kb"] is not None:
+                args["py_peak_kb"] = round(s["py_peak_kb"], 1)
+            events.append({"name": s["name"], "ph": "X", "pid": job["pid"], "tid": tid,
+                           "ts": round((s["start"] - t0) * 1e6, 1), "dur": round(s["wall"] * 1e6, 1),
+                           "args": args})
+            end = max(end, s["start"] + s["wall"])
+        if job["counters"]:
+            events.append({"name": f"{job['name']} counters", "ph": "C", "pid": job["pid"], "tid": tid,
+                           "ts": round((end - t0) * 1e6, 1), "args": job["counters"]})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_profile(jobs: Sequence[Dict[str, Any]], path: str, fmt: str = "chrome") -> None:
+    """Write recorder dicts as plain JSON ("json") or as a Chrome trace ("chrome")."""
+    data = to_chrome_trace(jobs) if fmt == "chrome" else {"jobs": list(jobs)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=None if fmt == "chrome" else 2)
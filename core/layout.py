@@ -0,0 +1,278 @@
+# core/layout.py
+
+from array import array
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Tuple
+
+from core.geometry import (
+    fold_segments,
+    panels_per_side,
+    LEVEL_GRIDS,
+)
+
+if TYPE_CHECKING:
+    from core.prescan import SourceScan
+
+# A signature's arrangement only depends on its page count, the level and the
+# binding; the position inside the document is a pure offset. Templates are
+# therefore computed once (panels and pages numbered from 1) and shared by
+# every signature of the same size.
+TEMPLATE_CACHE_SIZE = 64
+
+# Bumped whenever the same plan, level and binding start placing pages
+# differently, so stored outputs (core.incremental) are not reused.
+LAYOUT_VERSION = 2
+
+# Source index stored for padding blanks
+BLANK = -1
+
+# Arrangement engines: "list" (geometry.py, the reference) or "numpy" (geometry_np.py)
+ENGINES = ("list", "numpy")
+
+
+def padded_signature_pages(orig_sig_pages: int, level: int) -> int:
+    """Round a signature up to whole sheets (front+back panels)."""
+    per_sheet = panels_per_side(level) * 2
+    rem = orig_sig_pages % per_sheet
+    return orig_sig_pages if rem == 0 else orig_sig_pages + (per_sheet - rem)
+
+
+def interleaved_blank_locals(orig_sig_pages: int, padded_sig_pages: int) -> set[int]:
+    """Return local-page numbers that should be blank, in order: N,1,N-1,2,..."""
+    k = padded_sig_pages - orig_sig_pages
+    if k <= 0:
+        return set()
+    out = []
+    lo, hi = 1, padded_sig_pages
+    while len(out) < k:
+        out.append(hi); hi -= 1
+        if len(out) < k:
+            out.append(lo); lo += 1
+    return set(out)
+
+
+def _rtl_order_indices(rows: int, cols: int) -> List[int]:
+    out: List[int] = []
+    for r in range(rows):
+        base = r * cols
+        for c in range(cols - 1, -1, -1):
+            out.append(base + c)
+    return out
+
+
+def side_angles(level: int, binding: str = "LTR") -> Tuple[int, int]:
+    """Rotation (front, back) applied to source pages on portrait output."""
+    if level == 4:
+        front_angle = 0
+        back_angle  = 0
+    else:
+        delta = 0 if binding.upper() == "LTR" else 180
+        front_angle = ((((level - 1) * 90) + 90) + delta) % 360
+        if binding.upper() == "RTL" and level in (1, 2):
+            front_angle = (front_angle - 180) % 360
+        back_angle  = (front_angle + 180) % 360
+
+    if level == 2:
+        back_angle = (back_angle - 180) % 360
+    return front_angle, back_angle
+
+
+def side_box_orders(level: int, binding: str = "LTR") -> Tuple[List[int], List[int]]:
+    """Box index used for the k-th panel of a side, (front, back)."""
+    rows, cols = LEVEL_GRIDS[level]
+    ltr_order = list(range(rows * cols))        # row-major L→R
+    rtl_order = _rtl_order_indices(rows, cols)  # row-major R→L
+    if binding.upper() == "RTL":
+        return rtl_order, ltr_order
+    return ltr_order, rtl_order
+
+
+def _local_panel_pages(orig_sig_pages: int, padded_sig_pages: int, level: int, engine: str = "list") -> List[int]:
+    """
+    local panel (1-based index) -> local page (1-based), BLANK for padding.
+    Index 0 is unused.
+    """
+    blanks_set = interleaved_blank_locals(orig_sig_pages, padded_sig_pages)
+    if engine == "numpy":
+        from core.geometry_np import local_panel_pages_np  # numpy is optional
+        return local_panel_pages_np(orig_sig_pages, padded_sig_pages, level, sorted(blanks_set))
+
+    # Arranged rows come straight from the fold of one row: row t is segment
+    # t // rows of matrix row t % rows, i.e. panels r*width + seg[j] + 1.
+    # Even rows are fronts, odd rows backs; their k-th row shows the k-th
+    # page pair (front_pairs / back_pairs).
+    width = 1 << level
+    rows = padded_sig_pages // width
+    panel_pages = [BLANK] * (padded_sig_pages + 1)
+    t = 0
+    for seg in fold_segments(width, level):
+        for r in range(rows):
+            k = t >> 1
+            if t & 1:
+                pair = (2 + 2 * k, padded_sig_pages - (2 * k + 1))
+            else:
+                pair = (1 + 2 * k, padded_sig_pages - 2 * k)
+            base = r * width + 1
+            for col, local_page in zip(seg[:2], pair):
+                if local_page not in blanks_set:
+                    panel_pages[base + col] = local_page
+            t += 1
+    return panel_pages
+
+
+class SignatureLayout:
+    """
+    Relative placement table of one signature, in drawing order.
+    Parallel arrays, one entry per panel:
+      page : output page inside the signature (0-based; front = 2*sheet, back = 2*sheet + 1)
+      box  : grid box index on that page
+      src  : source page inside the signature (0-based), BLANK for padding
+      rot  : rotation passed to show_pdf_page
+    """
+    __slots__ = ("orig_pages", "padded_pages", "sheets", "page", "box", "src", "rot")
+
+    def __init__(self, orig_pages: int, padded_pages: int, sheets: int,
+                 page: array, box: array, src: array, rot: array):
+        self.orig_pages = orig_pages
+        self.padded_pages = padded_pages
+        self.sheets = sheets
+        self.page = page
+        self.box = box
+        self.src = src
+        self.rot = rot
+
+    def __len__(self) -> int:
+        return len(self.page)
+
+    def __repr__(self) -> str:
+        return (f"SignatureLayout(pages={self.orig_pages}, padded={self.padded_pages}, "
+                f"sheets={self.sheets})")
+
+
+def _check_engine(engine: str) -> None:
+    if engine not in ENGINES:
+        raise ValueError(f"unknown arrangement engine {engine!r}, expected one of {ENGINES}")
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def signature_layout(orig_sig_pages: int, level: int, binding: str = "LTR", engine: str = "list") -> SignatureLayout:
+    """
+    Placement template for one signature, as if it were the first one in the
+    document. Cached (bounded LRU) per (signature size, level, binding, engine).
+    """
+    _check_engine(engine)
+    binding = binding.upper()
+    per_side = panels_per_side(level)
+    per_sheet = per_side * 2
+    padded = padded_signature_pages(orig_sig_pages, level)
+    sheets = padded // per_sheet
+
+    panel_pages = _local_panel_pages(orig_sig_pages, padded, level, engine)
+    front_angle, back_angle = side_angles(level, binding)
+    front_order, back_order = side_box_orders(level, binding)
+
+    # for A5 (cols==1), RTL requires vertical flip (top↔bottom)
+    cols = LEVEL_GRIDS[level][1]
+    vertical_flip = (cols == 1 and binding == "RTL")
+
+    # Blanks take the outermost local pages (N, 1, N-1, 2, ...): locals
+    # 1..lead are blank, so source page 0 of the signature is local lead+1.
+    lead = (padded - orig_sig_pages) // 2
+
+    page, box, src, rot = array("i"), array("b"), array("i"), array("h")
+    for s in range(sheets):
+        for side, order, angle in ((0, front_order, front_angle), (1, back_order, back_angle)):
+            panel_start = s * per_sheet + side * per_side + 1
+            for k in range(per_side):
+                panel = panel_start + (per_side - 1 - k) if vertical_flip else panel_start + k
+                local_page = panel_pages[panel]
+                page.append(2 * s + side)
+                box.append(order[k])
+                src.append(BLANK if local_page == BLANK else local_page - 1 - lead)
+                rot.append(angle)
+
+    return SignatureLayout(orig_sig_pages, padded, sheets, page, box, src, rot)
+
+
+class SignaturePlacement:
+    """A signature inside a document: a shared layout plus its offsets."""
+    __slots__ = ("layout", "page_offset", "src_offset")
+
+    def __init__(self, layout: SignatureLayout, page_offset: int, src_offset: int):
+        self.layout = layout
+        self.page_offset = page_offset  # first output page of the signature
+        self.src_offset = src_offset    # ORIGINAL pages before this signature
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int, int]]:
+        lay = self.layout
+        p_off, s_off = self.page_offset, self.src_offset
+        for p, b, s, r in zip(lay.page, lay.box, lay.src, lay.rot):
+            yield p + p_off, b, (BLANK if s == BLANK else s + s_off), r
+
+    def __len__(self) -> int:
+        return len(self.layout)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class PlacementTable:
+    """
+    Compact placement table of a whole imposition. Iterating yields
+    (output page, box index, source index, rotation); source index is BLANK
+    for padding panels. `source_map`, when set, redirects a source index to the
+    page actually drawn (e.g. the first of several identical pages); `scan` is
+    the size-class pre-scan of the source (core.prescan), reused when drawing.
+    """
+    __slots__ = ("level", "binding", "signatures", "page_count", "source_map", "scan")
+
+    def __init__(self, level: int, binding: str, signatures: List[SignaturePlacement], page_count: int,
+                 source_map: Optional[Sequence[int]] = None, scan: Optional["SourceScan"] = None):
+        self.level = level
+        self.binding = binding
+        self.signatures = signatures
+        self.page_count = page_count
+        self.source_map = source_map
+        self.scan = scan
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int, int]]:
+        for sig in self.signatures:
+            yield from sig
+
+    def __len__(self) -> int:
+        return sum(len(sig) for sig in self.signatures)
+
+    @property
+    def sheet_count(self) -> int:
+        return self.page_count // 2
+
+
+def build_placement_table(sequence: Sequence[int], level: int, binding: str = "LTR",
+                          engine: str = "list") -> PlacementTable:
+    _check_engine(engine)
+    binding = binding.upper()
+    signatures: List[SignaturePlacement] = []
+    page_offset = 0
+    src_offset = 0
+    for orig_sig_pages in sequence:
+        layout = signature_layout(orig_sig_pages, level, binding, engine)
+        signatures.append(SignaturePlacement(layout, page_offset, src_offset))
+        page_offset += layout.sheets * 2
+        src_offset += orig_sig_pages
+    return PlacementTable(level, binding, signatures, page_offset)
+
+
+def group_signatures(signatures: Sequence[SignaturePlacement], max_sheets: int) -> List[List[SignaturePlacement]]:
+    """Contiguous runs of whole signatures holding about `max_sheets` sheets each."""
+    groups: List[List[SignaturePlacement]] = []
+    current: List[SignaturePlacement] = []
+    sheets = 0
+    for sig in signatures:
+        current.append(sig)
+        sheets += sig.layout.sheets
+        if sheets >= max_sheets:
+            groups.append(current)
+            current, sheets = [], 0
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,48 @@
+# core/lazy.py
+#
+# Deferred imports for the heavy dependencies of the core (PyMuPDF above all),
+# so that planning, layout tables and the CLI's argument handling start
+# without loading them. Modules that use these bind the name at import time
+# and annotate with `from __future__ import annotations`, so nothing touches
+# the module until a function actually needs it.
+
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+_lock = threading.Lock()
+
+
+class _MissingModule(ModuleType):
+    """Stands in for a module that is not installed; any attribute access raises."""
+
+    def __getattr__(self, attr: str):
+        raise ModuleNotFoundError(f"No module named {self.__name__!r}", name=self.__name__)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    The module `name`, imported on first attribute access. Already imported
+    modules are returned as they are. A missing module fails on first
+    attribute access too, so code that never touches it imports fine.
+    """
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            return _MissingModule(name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
+
+
+def is_loaded(name: str) -> bool:
+    """True once `name` has really been imported (not just registered lazily)."""
+    module = sys.modules.get(name)
+    return module is not None and not isinstance(module, importlib.util._LazyModule)
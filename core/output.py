@@ -0,0 +1,149 @@
+# core/output.py
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from core.dedup import deduplicated
+from core.imposition import draw_signatures, plan_placements
+from core.instrument import count, stage
+from core.layout import PlacementTable, group_signatures
+from core.lazy import lazy_import
+from core.parallel import merge_part, render_parts, use_parallel
+from core.pdfio import Target, describe, is_path, writable_target
+from core.progress import CancelFn, ProgressFn, SignatureProgress, tracker_for
+from utils.logger import get_logger, log_to
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("output")
+
+# Sheets rendered between two flushes to disk in streaming mode
+DEFAULT_CHUNK_SHEETS = 32
+
+# Named fitz save options. "fast" is a plain save; "balanced" drops unused
+# objects, packs the many small form/page objects of show_pdf_page placements
+# into compressed object streams and deflates uncompressed streams; "smallest"
+# also merges duplicate objects and cleans content streams (slowest to write).
+SAVE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {},
+    "balanced": {"garbage": 1, "use_objstms": 1, "deflate": True},
+    "smallest": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True,
+                 "clean": True, "use_objstms": 1},
+}
+DEFAULT_SAVE_PROFILE = "balanced"
+# Options an incremental save accepts (no garbage collection or rewriting)
+_INCREMENTAL_OPTIONS = ("deflate", "deflate_images", "deflate_fonts")
+
+
+def save_options(profile: str = DEFAULT_SAVE_PROFILE, *, incremental: bool = False) -> Dict[str, Any]:
+    try:
+        options = dict(SAVE_PROFILES[profile])
+    except KeyError:
+        raise ValueError(f"unknown save profile {profile!r}, expected one of {sorted(SAVE_PROFILES)}") from None
+    if incremental:
+        options = {k: v for k, v in options.items() if k in _INCREMENTAL_OPTIONS}
+    return options
+
+
+def save_document(doc: fitz.Document, target: Target, profile: str = DEFAULT_SAVE_PROFILE) -> float:
+    """Save `doc` to a path or binary stream with a named profile; returns the time spent."""
+    options = save_options(profile)
+    t = time.perf_counter()
+    with stage("save", profile=profile):
+        doc.save(writable_target(target), **options)
+        if not is_path(target) and hasattr(target, "flush"):
+            target.flush()
+    elapsed = time.perf_counter() - t
+    logger.debug("Saved %s with profile %s in %.3fs", describe(target), profile, elapsed)
+    return elapsed
+
+
+def document_bytes(doc: fitz.Document, profile: str = DEFAULT_SAVE_PROFILE) -> bytes:
+    """`doc` serialized in memory with a named profile."""
+    with stage("save", profile=profile):
+        return doc.tobytes(**save_options(profile))
+
+
+def stream_placements(src_doc: fitz.Document,
+                      table: PlacementTable,
+                      path: str,
+                      *,
+                      chunk_sheets: int = DEFAULT_CHUNK_SHEETS,
+                      save_profile: str = DEFAULT_SAVE_PROFILE,
+                      workers: Optional[int] = 1,
+                      tracker: Optional[SignatureProgress] = None) -> int:
+    """
+    Write the imposition of `table` to `path` a chunk of whole signatures at a
+    time. The first chunk is a full save, each later chunk is appended as an
+    incremental update, and the document is closed in between so MuPDF drops
+    the finished pages. Peak memory follows `chunk_sheets`, not the job size.
+    Resources shared by pages of different chunks (fonts, images) are copied
+    once per chunk, and only the compression options of `save_profile` apply to
+    the incremental updates. Returns the number of output pages written.
+    A cancelled `tracker` leaves the chunks flushed so far in `path`.
+    Chunks are appended by reopening the file, so `path` must be a file path.
+    With workers != 1 (None = all cores) large jobs draw the chunks in a
+    process pool, at most two per worker ahead of the one being appended.
+    """
+    if not is_path(path):
+        raise TypeError("streaming output needs a file path, not a stream")
+    first_options = save_options(save_profile)
+    incr_options = save_options(save_profile, incremental=True)
+    chunks = group_signatures(table.signatures, max(1, chunk_sheets))
+    if not chunks:
+        chunks = [[]]  # still produce a valid (empty) file
+
+    rendered = render_parts(src_doc, table, chunks, workers=workers) if use_parallel(table, workers) else None
+    written = 0
+    try:
+        for i, chunk in enumerate(chunks):
+            out = fitz.open() if i == 0 else fitz.open(path)
+            try:
+                if rendered is None:
+                    draw_signatures(out, src_doc, chunk, table.level, table.source_map, tracker, table.scan)
+                else:
+                    merge_part(out, next(rendered), len(chunk), tracker)
+                written = len(out)
+                with stage("save", profile=save_profile, chunk=i + 1, incremental=i > 0):
+                    if i == 0:
+                        out.save(path, **first_options)
+                    else:
+                        out.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, **incr_options)
+            finally:
+                out.close()
+            logger.debug("Flushed chunk %d/%d (%d pages so far)", i + 1, len(chunks), written)
+    finally:
+        if rendered is not None:
+            rendered.close()
+    return written
+
+
+def impose_to_file(src_doc: fitz.Document,
+                   plan,
+                   path: str,
+                   log=None,
+                   *,
+                   level: int = 1,
+                   binding: str = "LTR",
+                   chunk_sheets: int = DEFAULT_CHUNK_SHEETS,
+                   log_level: int = logging.INFO,
+                   engine: str = "list",
+                   save_profile: str = DEFAULT_SAVE_PROFILE,
+                   dedup: bool = False,
+                   workers: Optional[int] = 1,
+                   progress: Optional[ProgressFn] = None,
+                   cancelled: Optional[CancelFn] = None) -> int:
+    """Streaming counterpart of impose_cut_stack: the output goes straight to `path`."""
+    with log_to(log, log_level):
+        table = plan_placements(src_doc, plan, level=level, binding=binding, engine=engine)
+        with deduplicated(src_doc, table, dedup) as source, \
+                stage("draw_and_save", signatures=len(table.signatures)):
+            written = stream_placements(source, table, path, chunk_sheets=chunk_sheets,
+                                        save_profile=save_profile, workers=workers,
+                                        tracker=tracker_for(len(table.signatures), progress, cancelled))
+        count("output_pages", written)
+        logger.info("Streamed %d pages to %s", written, path)
+        return written
@@ -0,0 +1,173 @@
+# core/parallel.py
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from core.instrument import count, stage
+from core.layout import BLANK, PlacementTable, SignaturePlacement, group_signatures
+from core.lazy import lazy_import
+from core.progress import ImpositionCancelled, SignatureProgress
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+fitz = lazy_import("fitz")
+
+# Below this many output pages, process start-up and merging cost more than they save
+MIN_PARALLEL_PAGES = 200
+# Chunks per worker: small enough to balance uneven signatures, large enough to amortize IPC
+CHUNKS_PER_WORKER = 4
+
+# Per-process source document and source map, set once by the pool initializer
+_worker_src: Optional[fitz.Document] = None
+_worker_source_map: Optional[Sequence[int]] = None
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """None or 0 means one worker per core."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def use_parallel(table: PlacementTable, workers: Optional[int], min_parallel_pages: int = MIN_PARALLEL_PAGES) -> bool:
+    return (resolve_workers(workers) > 1
+            and len(table.signatures) > 1
+            and table.page_count >= min_parallel_pages)
+
+
+def source_handle(src_doc: fitz.Document) -> Union[str, bytes]:
+    """What a worker needs to re-open the source: its path, or its bytes if it only lives in memory."""
+    name = src_doc.name
+    if name and os.path.isfile(name) and not src_doc.is_dirty:
+        return name
+    return src_doc.tobytes()
+
+
+def open_source(handle: Union[str, bytes]) -> fitz.Document:
+    if isinstance(handle, str):
+        return fitz.open(handle)
+    return fitz.open("pdf", handle)
+
+
+def split_signatures(signatures: Sequence[SignaturePlacement], chunks: int) -> List[List[SignaturePlacement]]:
+    """Contiguous runs of signatures with roughly equal output page counts."""
+    total = sum(sig.layout.sheets for sig in signatures)
+    return group_signatures(signatures, max(1, -(-total // max(1, chunks))))
+
+
+def _init_worker(handle: Union[str, bytes], source_map: Optional[Sequence[int]] = None) -> None:
+    global _worker_src, _worker_source_map
+    _worker_src = open_source(handle)
+    _worker_source_map = source_map
+
+
+def worker_source() -> Tuple[fitz.Document, Optional[Sequence[int]]]:
+    """Inside a worker_pool process: the source document and source map it was started with."""
+    return _worker_src, _worker_source_map
+
+
+def render_part(signatures: List[SignaturePlacement], level: int) -> bytes:
+    """Worker side of render_parts: draw `signatures` and return them as PDF bytes."""
+    from core.imposition import draw_signatures  # imposition imports this module
+
+    part = draw_signatures(fitz.open(), _worker_src, signatures, level, _worker_source_map)
+    try:
+        return part.tobytes()
+    finally:
+        part.close()
+
+
+def save_part(signatures: List[SignaturePlacement], level: int, path: str, options: Dict[str, Any]) -> int:
+    """Worker side of sharded output: draw `signatures` and save them to `path`; returns the page count."""
+    from core.imposition import draw_signatures
+
+    part = draw_signatures(fitz.open(), _worker_src, signatures, level, _worker_source_map)
+    try:
+        part.save(path, **options)
+        return len(part)
+    finally:
+        part.close()
+
+
+def worker_pool(src_doc: fitz.Document, workers: int,
+                source_map: Optional[Sequence[int]] = None) -> ProcessPoolExecutor:
+    """Process pool whose workers each open their own copy of `src_doc` once, at start-up."""
+    from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing
+
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(source_handle(src_doc), source_map))
+
+
+def render_parts(src_doc: fitz.Document, table: PlacementTable, parts: Sequence[List[SignaturePlacement]], *,
+                 workers: Optional[int] = None, lookahead: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Render `parts` (runs of signatures of `table`) in worker processes and
+    yield each part's PDF bytes in order. At most `lookahead` parts (default
+    two per worker) are in flight ahead of the consumer, which bounds the
+    memory held by finished parts. Closing the generator early drops the
+    parts not yet started.
+    """
+    n_workers = min(resolve_workers(workers), max(1, len(parts)))
+    lookahead = max(1, lookahead or 2 * n_workers)
+    pool = worker_pool(src_doc, n_workers, table.source_map)
+    # Workers draw outside the recorder's process; count their placements here
+    count("show_pdf_page", sum(1 for part in parts for sig in part
+                               for _, _, s, _ in sig if s != BLANK and s < len(src_doc)))
+    pending: deque = deque()
+    queued = iter(parts)
+
+    def submit_next() -> None:
+        signatures = next(queued, None)
+        if signatures is not None:
+            pending.append(pool.submit(render_part, signatures, table.level))
+
+    try:
+        for _ in range(lookahead):
+            submit_next()
+        while pending:
+            data = pending.popleft().result()
+            submit_next()
+            yield data
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def merge_part(out: fitz.Document, data: bytes, signatures: int, tracker: Optional[SignatureProgress]) -> None:
+    """Append a part rendered by a worker to `out`, checking `tracker` before and advancing it after."""
+    if tracker is not None:
+        tracker.check()
+    with stage("merge_part", signatures=signatures):
+        part = fitz.open("pdf", data)
+        out.insert_pdf(part)
+        part.close()
+    if tracker is not None:
+        tracker.step(signatures)
+
+
+def render_parallel(src_doc: fitz.Document, table: PlacementTable, *, workers: Optional[int] = None,
+                    tracker: Optional[SignatureProgress] = None) -> fitz.Document:
+    """
+    Render signature ranges in worker processes, each with its own copy of the
+    source, and merge the partial documents in plan order; parts finished
+    ahead of the merge are bounded by render_parts' default lookahead.
+    `tracker` advances per merged part; on cancellation, parts not yet
+    started are dropped.
+    """
+    n_workers = resolve_workers(workers)
+    parts = split_signatures(table.signatures, n_workers * CHUNKS_PER_WORKER)
+
+    out = fitz.open()
+    rendered = render_parts(src_doc, table, parts, workers=n_workers)
+    try:
+        for signatures, data in zip(parts, rendered):
+            merge_part(out, data, len(signatures), tracker)
+    except ImpositionCancelled:
+        out.close()
+        raise
+    finally:
+        rendered.close()
+    return out
@@ -0,0 +1,109 @@
+# core/partial.py
+
+from __future__ import annotations
+
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from config import LEVEL_GRIDS
+from core.geometry import a4_rect_portrait, grid_boxes
+from core.instrument import count, stage
+from core.lazy import lazy_import
+from core.lookup import SIDES, PlacementIndex
+from core.prescan import PagePlacer
+from utils.logger import get_logger
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("partial")
+
+SideRef = Tuple[int, str]  # (1-based sheet, "front"/"back")
+
+
+def parse_ranges(spec: str) -> List[int]:
+    """'3,7-9' -> [3, 7, 8, 9]"""
+    out: List[int] = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        lo, sep, hi = item.partition("-")
+        if sep:
+            out.extend(range(int(lo), int(hi) + 1))
+        else:
+            out.append(int(item))
+    return out
+
+
+def parse_sides(spec: str) -> List[SideRef]:
+    """'37:front,38:b' -> [(37, 'front'), (38, 'back')]"""
+    out: List[SideRef] = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        sheet, _, side = item.partition(":")
+        matches = [s for s in SIDES if side and s.startswith(side.lower())]
+        if len(matches) != 1:
+            raise ValueError(f"bad side {item!r}, expected SHEET:front or SHEET:back")
+        out.append((int(sheet), matches[0]))
+    return out
+
+
+def select_sides(index: PlacementIndex, *,
+                 signatures: Iterable[int] = (),
+                 sheets: Iterable[int] = (),
+                 sides: Iterable[SideRef] = ()) -> List[SideRef]:
+    """Union of the selections as (sheet, side) pairs, in output order."""
+    chosen = set(sides)
+    whole = set(sheets)
+    for sig in signatures:
+        whole.update(index.signature_sheets(sig))
+    for sheet in whole:
+        chosen.update((sheet, side) for side in SIDES)
+    for sheet, _ in chosen:
+        if not 1 <= sheet <= index.sheet_count:
+            raise IndexError(f"sheet {sheet} out of range 1..{index.sheet_count}")
+    return sorted(chosen, key=lambda ref: (ref[0], SIDES.index(ref[1])))
+
+
+def draw_sides(out: fitz.Document, src_doc: fitz.Document, index: PlacementIndex,
+               sides: Sequence[SideRef]) -> fitz.Document:
+    """Append one page per selected side, drawn exactly as the full imposition draws it."""
+    rect = a4_rect_portrait()
+    placer = PagePlacer(src_doc, grid_boxes(rect, *LEVEL_GRIDS[index.level]))
+    placed = 0
+    for sheet, side in sides:
+        out.new_page(width=rect.width, height=rect.height)
+        page = out[-1]
+        for box, src_page, rot in index.side_placements(sheet, side):
+            placer.place(page, box, src_page - 1, rot)
+            placed += 1
+    count("show_pdf_page", placed)
+    return out
+
+
+def impose_partial(src_doc: fitz.Document, plan, *,
+                   level: int = 1,
+                   binding: str = "LTR",
+                   signatures: Iterable[int] = (),
+                   sheets: Iterable[int] = (),
+                   sides: Iterable[SideRef] = (),
+                   engine: str = "list",
+                   index: Optional[PlacementIndex] = None) -> Tuple[fitz.Document, List[SideRef]]:
+    """
+    Impose only the chosen signatures, sheets and sides (1-based, as in the
+    full run). Each output page is identical to the matching page of
+    impose_cut_stack; the cost follows the selection, not the document.
+    Returns the document and the (sheet, side) of each of its pages.
+    """
+    if index is None:
+        index = PlacementIndex.from_plan(plan, level, binding, source_pages=len(src_doc), engine=engine)
+    refs = select_sides(index, signatures=signatures, sheets=sheets, sides=sides)
+    t = time.perf_counter()
+    with stage("draw_partial", sides=len(refs)):
+        out = draw_sides(fitz.open(), src_doc, index, refs)
+    count("output_pages", len(out))
+    logger.info("Partial imposition: %d of %d sides in %.3fs",
+                len(refs), 2 * index.sheet_count, time.perf_counter() - t)
+    return out, refs
@@ -0,0 +1,110 @@
+# core/pdfio.py
+#
+# Sources and targets other than file paths: bytes-like objects and binary
+# streams (stdin/stdout, sockets, BytesIO), so imposition can sit inside a
+# pipeline without temporary files.
+
+from __future__ import annotations
+
+import io
+import os
+from typing import BinaryIO, Optional, Union
+
+from core.lazy import lazy_import
+
+fitz = lazy_import("fitz")
+
+# A path, the PDF itself, or a readable binary stream
+Source = Union[str, "os.PathLike[str]", bytes, bytearray, memoryview, BinaryIO]
+# A path or a writable binary stream
+Target = Union[str, "os.PathLike[str]", BinaryIO]
+
+STDIO = "-"
+
+
+def is_path(obj) -> bool:
+    return isinstance(obj, (str, os.PathLike))
+
+
+def open_source(src: Source) -> fitz.Document:
+    """
+    Open a source PDF. Bytes-like objects are handed to MuPDF as they are;
+    a BytesIO is opened through its buffer (no copy), any other stream is read
+    once to its end.
+    """
+    if is_path(src):
+        return fitz.open(src)
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        data = src
+    elif isinstance(src, io.BytesIO):
+        data = src.getbuffer()[src.tell():]
+    elif hasattr(src, "read"):
+        data = src.read()
+    else:
+        raise TypeError(f"cannot open a PDF from {type(src).__name__}")
+    if not len(data):
+        raise ValueError("empty PDF input")
+    return fitz.open("pdf", data)
+
+
+class PositionWriter(io.RawIOBase):
+    """
+    Write-only view of a binary stream for Document.save. PyMuPDF saves a
+    file object that has a `name` to that name instead of writing to it
+    (stdout would become a file called "<stdout>"), and MuPDF needs tell() to
+    record object offsets, which pipes and sockets cannot answer. The writer
+    counts its own position; MuPDF never seeks back.
+    """
+
+    def __init__(self, raw: BinaryIO):
+        super().__init__()
+        self.raw = raw
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.raw.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        self.raw.flush()
+
+
+def writable_target(target: Target) -> Target:
+    """What to pass to Document.save: a path as is, a stream wrapped."""
+    return target if is_path(target) else PositionWriter(target)
+
+
+def describe(obj, default: str = "<stream>") -> str:
+    """Name of a source or target for logs and reports."""
+    if is_path(obj):
+        return os.fspath(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return f"<{len(obj)} bytes>"
+    name = getattr(obj, "name", None)
+    return name if isinstance(name, str) else default
+
+
+def written_bytes(target: Target, start: Optional[int] = None) -> Optional[int]:
+    """Size of what was written to `target` (None for unseekable streams such as pipes)."""
+    if is_path(target):
+        return os.path.getsize(target)
+    try:
+        return target.tell() - (start or 0)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def stream_position(target: Target) -> Optional[int]:
+    if is_path(target):
+        return None
+    try:
+        return target.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -0,0 +1,254 @@
+# core/prescan.py
+
+from __future__ import annotations
+
+import inspect
+import re
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from core.lazy import lazy_import
+from utils.logger import get_logger
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("prescan")
+
+Box = Tuple[float, float, float, float]
+
+# Page box / rotation entries as written in the page dictionary (no content parsing)
+_REF = r"\d+ \d+ R"
+_KEYS = {
+    "MediaBox": re.compile(rf"/MediaBox\s*(\[[^\]]*\]|{_REF})"),
+    "CropBox": re.compile(rf"/CropBox\s*(\[[^\]]*\]|{_REF})"),
+    "Rotate": re.compile(rf"/Rotate\s*({_REF}|-?\d+(?:\.\d+)?)"),
+}
+_PARENT = re.compile(r"/Parent\s*(\d+) \d+ R")
+_INHERITED = ("MediaBox", "CropBox", "Rotate")
+_DEFAULT_MEDIABOX: Box = (0.0, 0.0, 612.0, 792.0)  # PDF default (Letter)
+
+
+@dataclass(frozen=True)
+class SizeClass:
+    """Pages that share media box, crop box and /Rotate place identically."""
+    mediabox: Box
+    cropbox: Box
+    rotation: int
+
+    @property
+    def size(self) -> Tuple[float, float]:
+        """Displayed width x height (crop box, after /Rotate)."""
+        x0, y0, x1, y1 = self.cropbox
+        w, h = abs(x1 - x0), abs(y1 - y0)
+        return (h, w) if self.rotation % 180 else (w, h)
+
+    def label(self) -> str:
+        w, h = self.size
+        rot = f" /Rotate {self.rotation}" if self.rotation else ""
+        return f"{w:g}x{h:g}pt{rot}"
+
+
+class SourceScan:
+    """
+    Size class of every source page, read from the page dictionaries only:
+    /MediaBox, /CropBox and /Rotate (inherited through /Parent). Pages are
+    classified on first use, so drawing a few pages of a large source does not
+    pay for the rest; scan_all() classifies everything for reporting.
+    """
+
+    def __init__(self, doc: fitz.Document):
+        self.doc = doc
+        self.classes: List[SizeClass] = []
+        self._class_ids: Dict[SizeClass, int] = {}
+        self._page_class = array("i", [-1]) * len(doc)
+        self._inherited: Dict[int, Dict[str, Optional[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._page_class)
+
+    def class_of(self, pno: int) -> int:
+        cid = self._page_class[pno]
+        if cid < 0:
+            cid = self._page_class[pno] = self._classify(pno)
+        return cid
+
+    def scan_all(self) -> "SourceScan":
+        for pno in range(len(self._page_class)):
+            self.class_of(pno)
+        return self
+
+    def counts(self) -> Counter:
+        """Pages per class id (classified pages only)."""
+        return Counter(cid for cid in self._page_class if cid >= 0)
+
+    def summary(self) -> str:
+        counts = self.counts()
+        return ", ".join(f"{self.classes[cid].label()} x{n}" for cid, n in counts.most_common())
+
+    # -- page dictionary parsing --------------------------------------------
+
+    def _entries(self, xref: int) -> Dict[str, Optional[str]]:
+        obj = self.doc.xref_object(xref, compressed=True)
+        values: Dict[str, Optional[str]] = {}
+        for key, rx in _KEYS.items():
+            m = rx.search(obj)
+            values[key] = m.group(1) if m else None
+        m = _PARENT.search(obj)
+        values["Parent"] = m.group(1) if m else None
+        return values
+
+    def _inherited_from(self, parent: Optional[str]) -> Dict[str, Optional[str]]:
+        """Inheritable entries of a page tree node, memoized per node."""
+        if parent is None:
+            return dict.fromkeys(_INHERITED)
+        xref = int(parent)
+        cached = self._inherited.get(xref)
+        if cached is None:
+            self._inherited[xref] = dict.fromkeys(_INHERITED)  # cycle guard
+            own = self._entries(xref)
+            up = self._inherited_from(own["Parent"])
+            cached = {k: own[k] if own[k] is not None else up[k] for k in _INHERITED}
+            self._inherited[xref] = cached
+        return cached
+
+    def _resolve(self, value: str) -> str:
+        if value.endswith(" R"):
+            return self.doc.xref_object(int(value.split()[0]), compressed=True)
+        return value
+
+    def _box(self, value: Optional[str]) -> Optional[Box]:
+        if value is None:
+            return None
+        nums = [float(v) for v in self._resolve(value).strip("[] \n").split()]
+        if len(nums) != 4:
+            return None
+        x0, y0, x1, y1 = nums
+        return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+    def _classify(self, pno: int) -> int:
+        own = self._entries(self.doc.page_xref(pno))
+        up = self._inherited_from(own["Parent"])
+        get = lambda k: own[k] if own[k] is not None else up[k]  # noqa: E731
+        mediabox = self._box(get("MediaBox")) or _DEFAULT_MEDIABOX
+        cropbox = self._box(get("CropBox")) or mediabox
+        # MuPDF clips the crop box to the media box
+        cropbox = (max(cropbox[0], mediabox[0]), max(cropbox[1], mediabox[1]),
+                   min(cropbox[2], mediabox[2]), min(cropbox[3], mediabox[3]))
+        rotate = get("Rotate")
+        rotation = int(float(self._resolve(rotate))) % 360 if rotate is not None else 0
+        cls = SizeClass(mediabox, cropbox, rotation - rotation % 90)
+        cid = self._class_ids.get(cls)
+        if cid is None:
+            cid = self._class_ids[cls] = len(self.classes)
+            self.classes.append(cls)
+        return cid
+
+
+# PyMuPDF releases whose show_pdf_page internals PagePlacer reproduces; any
+# other version, or a different _show_pdf_page signature, uses show_pdf_page
+FAST_PATH_VERSIONS = ((1, 24, 0), (1, 29, 0))  # [first, end)
+_SHOW_PDF_PAGE_PARAMS = ("self", "fz_srcpage", "overlay", "matrix", "xref", "oc", "clip", "graftmap",
+                         "_imgname")
+
+
+@lru_cache(maxsize=None)
+def fast_path_supported() -> bool:
+    """True if this PyMuPDF matches the show_pdf_page internals PagePlacer calls directly."""
+    version = getattr(fitz, "pymupdf_version_tuple", None)
+    first, end = FAST_PATH_VERSIONS
+    if version is None or not first <= tuple(version) < end:
+        return False
+    internal = getattr(fitz.Page, "_show_pdf_page", None)
+    if internal is None or not hasattr(fitz, "Graftmap"):
+        return False
+    try:
+        params = tuple(inspect.signature(internal).parameters)
+    except (TypeError, ValueError):
+        return False
+    if params != _SHOW_PDF_PAGE_PARAMS:
+        return False
+    probe = fitz.open()
+    try:
+        return all(hasattr(probe, name) for name in ("_graft_id", "Graftmaps", "ShownPages"))
+    finally:
+        probe.close()
+
+
+class PagePlacer:
+    """
+    Draws source pages into grid boxes like Page.show_pdf_page, with the fit
+    matrix computed once per (size class, box, rotation) from a representative
+    page instead of once per placement, and with the target page's XObject
+    names listed once per page instead of once per placement. Uses
+    show_pdf_page unless fast_path_supported() confirms the PyMuPDF internals
+    this relies on.
+    """
+
+    def __init__(self, src_doc: fitz.Document, boxes: Sequence[fitz.Rect], scan: Optional[SourceScan] = None):
+        self.src_doc = src_doc
+        self.boxes = boxes
+        self.scan = scan if scan is not None else SourceScan(src_doc)
+        self._transforms: Dict[Tuple[int, int, int], Tuple[fitz.Rect, Tuple[float, ...]]] = {}
+        self._fast = fast_path_supported()
+        self._names: Dict[int, Set[str]] = {}  # target page xref -> resource names in use
+
+    def transform(self, src_page: fitz.Page, cid: int, box: int, rotate: int, target: fitz.Page):
+        key = (cid, box, rotate)
+        t = self._transforms.get(key)
+        if t is None:
+            t = self._transforms[key] = _fit(src_page, self.boxes[box], rotate, target)
+        return t
+
+    def _new_name(self, page: fitz.Page) -> str:
+        """An unused 'fzFrmN' name on `page`, as show_pdf_page would choose."""
+        names = self._names.get(page.xref)
+        if names is None:
+            # First placement on this page: list what it already holds and
+            # balance its existing content, as show_pdf_page does every time
+            doc = page.parent
+            names = self._names[page.xref] = (
+                {x[1] for x in doc.get_page_xobjects(page.number)}
+                | {x[7] for x in doc.get_page_images(page.number)}
+                | {x[4] for x in doc.get_page_fonts(page.number)})
+            page.wrap_contents()
+        i = 0
+        while f"fzFrm{i}" in names:
+            i += 1
+        names.add(f"fzFrm{i}")
+        return f"fzFrm{i}"
+
+    def place(self, page: fitz.Page, box: int, pno: int, rotate: int = 0) -> None:
+        """Show source page `pno` in `boxes[box]` of `page` (a page this placer fills)."""
+        if not self._fast:
+            page.show_pdf_page(self.boxes[box], self.src_doc, pno, rotate=rotate)
+            return
+        doc = page.parent
+        src_page = self.src_doc[pno]
+        clip, matrix = self.transform(src_page, self.scan.class_of(pno), box, rotate, page)
+
+        isrc = self.src_doc._graft_id
+        gmap = doc.Graftmaps.get(isrc)
+        if gmap is None:
+            gmap = doc.Graftmaps[isrc] = fitz.Graftmap(doc)
+        pno_id = (isrc, pno)
+        doc.ShownPages[pno_id] = page._show_pdf_page(
+            src_page, overlay=True, matrix=matrix, xref=doc.ShownPages.get(pno_id, 0),
+            clip=clip, graftmap=gmap, _imgname=self._new_name(page),
+        )
+
+
+def _fit(src_page: fitz.Page, rect: fitz.Rect, rotate: int, target: fitz.Page):
+    """show_pdf_page's source clip and matrix for `src_page` in `rect` (aspect kept, centred)."""
+    tar_rect = rect * ~target.transformation_matrix
+    src_rect = src_page.rect * ~src_page.transformation_matrix
+    smp = (src_rect.tl + src_rect.br) / 2.0
+    tmp = (tar_rect.tl + tar_rect.br) / 2.0
+    m = fitz.Matrix(1, 0, 0, 1, -smp.x, -smp.y) * fitz.Matrix(rotate)
+    sr1 = src_rect * m
+    f = min(tar_rect.width / sr1.width, tar_rect.height / sr1.height)
+    m *= fitz.Matrix(f, f)
+    m *= fitz.Matrix(1, 0, 0, 1, tmp.x, tmp.y)
+    return src_rect, tuple(round(x, 5) if abs(x) >= 1e-4 else 0 for x in m)  # as show_pdf_page rounds
@@ -0,0 +1,316 @@
+# core/preview.py
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Hashable, List, NamedTuple, Optional, Tuple
+
+from config import LEVEL_GRIDS
+from core.geometry import a4_rect_portrait, grid_boxes
+from core.lazy import lazy_import
+from core.lookup import SIDES, PlacementIndex
+from core.prescan import PagePlacer, SourceScan
+from core.signature_logic import choose_best_plan
+from utils.logger import get_logger
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("preview")
+
+DEFAULT_PREVIEW_DPI = 48
+# About 100 A4 sides at 48 dpi (RGB, ~650 KiB each)
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class PixmapCache:
+    """Thread-safe LRU of pixmaps bounded by the total size of their samples."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, fitz.Pixmap]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable) -> Optional[fitz.Pixmap]:
+        with self._lock:
+            pix = self._items.get(key)
+            if pix is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return pix
+
+    def put(self, key: Hashable, pix: fitz.Pixmap) -> None:
+        size = len(pix.samples_mv)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old.samples_mv)
+            if size > self.max_bytes:
+                return  # would evict everything and still not fit
+            self._items[key] = pix
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= len(evicted.samples_mv)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+def source_key(src_doc: fitz.Document) -> Tuple[str, int]:
+    """Cache identity of a source: its file name (or object id) and page count."""
+    return (src_doc.name or f"<memory {id(src_doc)}>", len(src_doc))
+
+
+class SheetPreviewer:
+    """
+    Renders single sheet sides of an imposition on demand, without building
+    the imposed document: only the panels of the requested side are placed on
+    a scratch page and rasterized. Results are cached by
+    (source, plan, level, binding, sheet, side, dpi).
+
+    PyMuPDF is not thread-safe, so renders hold a lock; the pool keeps callers
+    responsive and lets neighbouring sheets render ahead of time. The lock
+    only orders this previewer's own renders: a process that also uses
+    PyMuPDF on other threads should use PreviewProcess instead.
+    """
+
+    def __init__(self, src_doc: fitz.Document, plan, level: int, binding: str = "LTR", *,
+                 cache: Optional[PixmapCache] = None, workers: int = 1, engine: str = "list"):
+        self.src_doc = src_doc
+        self.level = level
+        self.binding = binding
+        self.cache = cache if cache is not None else PixmapCache()
+        self.index = PlacementIndex.from_plan(plan, level, binding, source_pages=len(src_doc), engine=engine)
+        self._key = (source_key(src_doc), tuple(plan.sequence), level, binding)
+        self._boxes = grid_boxes(a4_rect_portrait(), *LEVEL_GRIDS[level])
+        self._scan = SourceScan(src_doc)  # size classes survive across renders
+        self._render_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="preview")
+        self._pending: dict = {}
+
+    @property
+    def sheet_count(self) -> int:
+        return self.index.sheet_count
+
+    def key(self, sheet: int, side: str, dpi: int) -> Tuple:
+        return self._key + (sheet, side.lower(), dpi)
+
+    def render(self, sheet: int, side: str = "front", dpi: int = DEFAULT_PREVIEW_DPI) -> fitz.Pixmap:
+        """Pixmap of one sheet side (blocking, cached)."""
+        key = self.key(sheet, side, dpi)
+        pix = self.cache.get(key)
+        if pix is None:
+            pix = self._render(sheet, side, dpi)
+            self.cache.put(key, pix)
+        return pix
+
+    def _render(self, sheet: int, side: str, dpi: int) -> fitz.Pixmap:
+        placements = self.index.side_placements(sheet, side)
+        rect = a4_rect_portrait()
+        with self._render_lock:
+            scratch = fitz.open()
+            try:
+                page = scratch.new_page(width=rect.width, height=rect.height)
+                placer = PagePlacer(self.src_doc, self._boxes, self._scan)
+                for box, src_page, rot in placements:
+                    placer.place(page, box, src_page - 1, rot)
+                pix = page.get_pixmap(dpi=dpi)
+            finally:
+                scratch.close()
+        logger.debug("Rendered sheet %d %s at %d dpi (%d panels)", sheet, side, dpi, len(placements))
+        return pix
+
+    def submit(self, sheet: int, side: str = "front", dpi: int = DEFAULT_PREVIEW_DPI) -> "Future[fitz.Pixmap]":
+        """Render in the background; a cached side resolves immediately."""
+        key = self.key(sheet, side, dpi)
+        pix = self.cache.get(key)
+        if pix is not None:
+            done: "Future[fitz.Pixmap]" = Future()
+            done.set_result(pix)
+            return done
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pool.submit(self.render, sheet, side, dpi)
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return future
+
+    def prefetch(self, sheet: int, dpi: int = DEFAULT_PREVIEW_DPI, radius: int = 2) -> List["Future[fitz.Pixmap]"]:
+        """Queue both sides of the sheets around `sheet`, nearest first."""
+        futures = []
+        for d in sorted(range(-radius, radius + 1), key=abs):
+            n = sheet + d
+            if 1 <= n <= self.sheet_count:
+                futures.extend(self.submit(n, side, dpi) for side in SIDES)
+        return futures
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ------------------------
+# Out-of-process previews
+# ------------------------
+class RenderedSide(NamedTuple):
+    """Raw RGB samples of a rendered sheet side, as sent back by PreviewProcess."""
+    samples: bytes
+    width: int
+    height: int
+    stride: int
+
+
+# Per-process state of the PreviewProcess child
+_child_doc: Optional[fitz.Document] = None
+_child_previewer: Optional[SheetPreviewer] = None
+_child_cache: Optional[PixmapCache] = None
+_child_latest = None  # shared number of the newest render request
+
+
+def _child_init(latest) -> None:
+    global _child_latest
+    _child_latest = latest
+
+
+def _child_load(path: str, level: int, binding: str, reopen: bool) -> Tuple[int, str]:
+    global _child_doc, _child_previewer, _child_cache
+    if _child_previewer is not None:
+        _child_previewer.close()
+        _child_previewer = None
+    if _child_cache is None:
+        _child_cache = PixmapCache()
+    if reopen or _child_doc is None or _child_doc.name != path:
+        if _child_doc is not None:
+            _child_doc.close()
+            _child_doc = None
+        # source_key() is only name and page count: a file edited in place
+        # (or reopened after another one) must not be served old pixmaps
+        _child_cache.clear()
+        _child_doc = fitz.open(path)
+    if len(_child_doc) == 0:
+        return 0, ""
+    plan, _ = choose_best_plan(len(_child_doc))
+    _child_previewer = SheetPreviewer(_child_doc, plan, level, binding, cache=_child_cache)
+    return _child_previewer.sheet_count, plan.expression
+
+
+def _child_render(request: int, sheet: int, side: str, dpi: int) -> Optional[RenderedSide]:
+    if request < _child_latest.value:
+        return None  # superseded while queued
+    pix = _child_previewer.render(sheet, side, dpi)
+    return RenderedSide(bytes(pix.samples_mv), pix.width, pix.height, pix.stride)
+
+
+def _child_prefetch(request: int, sheet: int, dpi: int, radius: int) -> None:
+    for d in sorted(range(-radius, radius + 1), key=abs):
+        n = sheet + d
+        if 1 <= n <= _child_previewer.sheet_count:
+            for side in SIDES:
+                if request < _child_latest.value:
+                    return  # a newer render is waiting behind this one
+                _child_previewer.render(n, side, dpi)
+
+
+def _unless_superseded(inner: Future) -> Future:
+    """Future of `inner`'s result that is cancelled instead when the child returned None."""
+    outer: Future = Future()
+
+    def done(f: Future) -> None:
+        if f.cancelled() or (f.exception() is None and f.result() is None):
+            outer.cancel()
+        elif f.exception() is not None:
+            outer.set_exception(f.exception())
+        else:
+            outer.set_result(f.result())
+
+    inner.add_done_callback(done)
+    return outer
+
+
+class PreviewProcess:
+    """
+    SheetPreviewer in a child process, for callers that must keep PyMuPDF out
+    of their own threads: the GUI runs imposition jobs on a worker thread, and
+    PyMuPDF is not thread-safe. Calls run in submission order in one spawned
+    process, which opens the source itself; each returns a future. Load a
+    source before rendering from it.
+
+    Only the newest render is served: a render request (or a load) cancels
+    the renders and the prefetch still queued before it, and those the child
+    has already picked up are skipped, so scrubbing through sheets never
+    builds a backlog. Superseded renders resolve as cancelled.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._latest = None
+        self._request = 0
+        self._render: Optional[Future] = None
+        self._prefetch: Optional[Tuple[int, Future]] = None  # (request, future)
+
+    def _submit(self, fn, *args) -> Future:
+        if self._pool is None:
+            import multiprocessing  # only once previews are used
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn, not fork: the parent has threads (Qt, the job worker) that may hold locks
+            ctx = multiprocessing.get_context("spawn")
+            self._latest = ctx.Value("q", self._request)
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=ctx,
+                                             initializer=_child_init, initargs=(self._latest,))
+        return self._pool.submit(fn, *args)
+
+    def _supersede(self) -> int:
+        """Start a new request: cancel the queued render and prefetch, tell the child to skip them."""
+        self._request += 1
+        if self._latest is not None:
+            self._latest.value = self._request
+        if self._render is not None:
+            self._render.cancel()
+        if self._prefetch is not None:
+            self._prefetch[1].cancel()
+        return self._request
+
+    def load(self, path: str, level: int, binding: str = "LTR", *,
+             reopen: bool = False) -> "Future[Tuple[int, str]]":
+        """Preview `path` at `level`/`binding`; resolves to (sheet count, plan expression)."""
+        self._supersede()
+        return self._submit(_child_load, path, level, binding, reopen)
+
+    def render(self, sheet: int, side: str = "front", dpi: int = DEFAULT_PREVIEW_DPI) -> "Future[RenderedSide]":
+        request = self._supersede()
+        self._render = self._submit(_child_render, request, sheet, side, dpi)
+        return _unless_superseded(self._render)
+
+    def prefetch(self, sheet: int, dpi: int = DEFAULT_PREVIEW_DPI, radius: int = 2) -> "Future[None]":
+        """
+        Render both sides of the sheets around `sheet` into the child's cache,
+        until the next render request. A prefetch queued since the last render
+        is returned instead of queueing another.
+        """
+        if self._prefetch is not None:
+            request, future = self._prefetch
+            if request == self._request and not future.done():
+                return future
+        future = self._submit(_child_prefetch, self._request, sheet, dpi, radius)
+        self._prefetch = (self._request, future)
+        return future
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
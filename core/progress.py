@@ -0,0 +1,44 @@
+# core/progress.py
+
+from typing import Callable, Optional
+
+# (signatures done, signatures total)
+ProgressFn = Callable[[int, int], None]
+# Polled between signatures; True stops the job
+CancelFn = Callable[[], bool]
+
+
+class ImpositionCancelled(Exception):
+    """The caller's cancel check returned True; the partial output was discarded."""
+
+
+class SignatureProgress:
+    """
+    Per-signature progress and cancellation for one imposition job, shared by
+    the serial, parallel and streaming draw paths. Both callbacks are optional
+    and run on the thread doing the drawing.
+    """
+
+    __slots__ = ("total", "done", "progress", "cancelled")
+
+    def __init__(self, total: int, progress: Optional[ProgressFn] = None, cancelled: Optional[CancelFn] = None):
+        self.total = total
+        self.done = 0
+        self.progress = progress
+        self.cancelled = cancelled
+
+    def check(self) -> None:
+        if self.cancelled is not None and self.cancelled():
+            raise ImpositionCancelled(f"cancelled after {self.done}/{self.total} signatures")
+
+    def step(self, n: int = 1) -> None:
+        self.done += n
+        if self.progress is not None:
+            self.progress(self.done, self.total)
+
+
+def tracker_for(total: int, progress: Optional[ProgressFn], cancelled: Optional[CancelFn]) -> Optional[SignatureProgress]:
+    """A tracker only when someone listens, so the hot loop stays branch-cheap otherwise."""
+    if progress is None and cancelled is None:
+        return None
+    return SignatureProgress(total, progress, cancelled)
@@ -0,0 +1,374 @@
+# core/raster.py
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple, Union
+
+from core.dedup import deduplicated
+from core.imposition import draw_signatures, plan_placements
+from core.instrument import count, stage
+from core.layout import PlacementTable, SignaturePlacement
+from core.lazy import lazy_import
+from core.lookup import SIDES
+from core.parallel import CHUNKS_PER_WORKER, resolve_workers, split_signatures, worker_pool, worker_source
+from core.progress import CancelFn, ImpositionCancelled, ProgressFn, SignatureProgress, tracker_for
+from utils.logger import get_logger, log_to
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("raster")
+
+RASTER_FORMATS = ("png", "tiff")
+# Color mode -> (fitz colorspace name, channels); PNG has no CMYK
+COLOR_MODES = {"rgb": ("csRGB", 3), "gray": ("csGRAY", 1), "cmyk": ("csCMYK", 4)}
+DEFAULT_DPI = 300
+# Pixel rows rendered at once are capped by this many bytes of samples: an
+# A4 side at 600 dpi is ~100 MiB in RGB, a 16 MiB band about 1/6 of it.
+DEFAULT_BAND_BYTES = 16 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class RasterSpec:
+    """How sheet sides are rasterized: file format, resolution, color mode and band size."""
+    format: str = "png"
+    dpi: int = DEFAULT_DPI
+    color: str = "rgb"
+    band_bytes: int = DEFAULT_BAND_BYTES
+
+    def __post_init__(self):
+        if self.format not in RASTER_FORMATS:
+            raise ValueError(f"unknown raster format {self.format!r}, expected one of {RASTER_FORMATS}")
+        if self.color not in COLOR_MODES:
+            raise ValueError(f"unknown color mode {self.color!r}, expected one of {sorted(COLOR_MODES)}")
+        if self.format == "png" and self.color == "cmyk":
+            raise ValueError("PNG has no CMYK mode; use --raster tiff")
+        if not 1 <= self.dpi <= 4800:
+            raise ValueError(f"dpi {self.dpi} out of range 1..4800")
+
+    @property
+    def extension(self) -> str:
+        return "tif" if self.format == "tiff" else "png"
+
+    @property
+    def channels(self) -> int:
+        return COLOR_MODES[self.color][1]
+
+    @property
+    def colorspace(self) -> fitz.Colorspace:
+        return getattr(fitz, COLOR_MODES[self.color][0])
+
+    def band_rows(self, width: int) -> int:
+        return max(1, self.band_bytes // (width * self.channels))
+
+
+def side_file_name(sheet: int, side: str, spec: RasterSpec, stem: str = "sheet") -> str:
+    """File name of one sheet side, e.g. sheet-0007-back.png (sorts in print order)."""
+    return f"{stem}-{sheet:04d}-{side}.{spec.extension}"
+
+
+# ------------------------
+# Band encoders
+# ------------------------
+class _PngWriter:
+    """PNG written band by band: rows are deflated into IDAT chunks as they arrive."""
+
+    _COLOR_TYPES = {1: 0, 3: 2}  # channels -> PNG color type (gray, truecolor)
+
+    def __init__(self, f: BinaryIO, width: int, height: int, channels: int, dpi: int):
+        self.f = f
+        self.stride = width * channels
+        self.z = zlib.compressobj()
+        f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, self._COLOR_TYPES[channels], 0, 0, 0))
+        ppm = round(dpi / 0.0254)
+        self._chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self.f.write(struct.pack(">I", len(data)) + kind + data)
+        self.f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, samples: memoryview, rows: int) -> None:
+        stride = self.stride
+        # filter type 0 (None) in front of every row
+        data = b"".join(b"\x00" + samples[r * stride:(r + 1) * stride] for r in range(rows))
+        compressed = self.z.compress(data)
+        if compressed:
+            self._chunk(b"IDAT", compressed)
+
+    def close(self) -> None:
+        self._chunk(b"IDAT", self.z.flush())
+        self._chunk(b"IEND", b"")
+
+
+class _TiffWriter:
+    """
+    Baseline little-endian TIFF with deflated strips of `rows_per_strip` rows
+    (the last may be shorter). Bands are cut into strips as they arrive; the
+    strips are written first and the IFD describing them last, so nothing but
+    the current band and one partial strip is ever held in memory.
+    """
+
+    _PHOTOMETRIC = {1: 1, 3: 2, 4: 5}  # channels -> BlackIsZero, RGB, Separated (CMYK)
+
+    def __init__(self, f: BinaryIO, width: int, height: int, channels: int, dpi: int,
+                 rows_per_strip: Optional[int] = None):
+        self.f = f
+        self.width, self.height, self.channels, self.dpi = width, height, channels, dpi
+        self.rows_per_strip = min(height, rows_per_strip or height)
+        self.pending = bytearray()
+        self.offsets: List[int] = []
+        self.counts: List[int] = []
+        self.start = f.tell()
+        f.write(b"II*\x00\x00\x00\x00\x00")  # IFD offset patched in close()
+
+    def _strip(self, data) -> None:
+        data = zlib.compress(data)
+        self.offsets.append(self.f.tell() - self.start)
+        self.counts.append(len(data))
+        self.f.write(data)
+
+    def write(self, samples: memoryview, rows: int) -> None:
+        strip = self.rows_per_strip * self.width * self.channels
+        data = samples[:rows * self.width * self.channels]
+        if self.pending:
+            need = strip - len(self.pending)
+            self.pending += data[:need]
+            data = data[need:]
+            if len(self.pending) < strip:
+                return
+            self._strip(self.pending)
+            self.pending = bytearray()
+        while len(data) >= strip:
+            self._strip(data[:strip])
+            data = data[strip:]
+        self.pending += data
+
+    def close(self) -> None:
+        if self.pending:
+            self._strip(self.pending)
+            self.pending = bytearray()
+        f, start = self.f, self.start
+        if (f.tell() - start) & 1:
+            f.write(b"\x00")  # the IFD starts on a word boundary
+        n = self.channels
+        extra = bytearray()
+        base = f.tell() - start
+
+        # entries: (tag, type, count, values); types 3 = SHORT, 4 = LONG, 5 = RATIONAL
+        entries = [
+            (256, 4, 1, [self.width]),
+            (257, 4, 1, [self.height]),
+            (258, 3, n, [8] * n),
+            (259, 3, 1, [8]),                          # Adobe deflate
+            (262, 3, 1, [self._PHOTOMETRIC[n]]),
+            (273, 4, len(self.offsets), self.offsets),
+            (277, 3, 1, [n]),
+            (278, 4, 1, [self.rows_per_strip]),
+            (279, 4, len(self.counts), self.counts),
+            (282, 5, 1, [self.dpi, 1]),
+            (283, 5, 1, [self.dpi, 1]),
+            (284, 3, 1, [1]),                          # chunky
+            (296, 3, 1, [2]),                          # inch
+        ]
+        ifd_size = 2 + 12 * len(entries) + 4
+        ifd = bytearray(struct.pack("<H", len(entries)))
+        for tag, kind, cnt, values in entries:
+            fmt = "<" + {3: "H", 4: "I", 5: "I"}[kind] * len(values)
+            payload = struct.pack(fmt, *values)
+            if len(payload) <= 4:
+                ifd += struct.pack("<HHI", tag, kind, cnt) + payload.ljust(4, b"\x00")
+            else:
+                ifd += struct.pack("<HHII", tag, kind, cnt, base + ifd_size + len(extra))
+                extra += payload
+                if len(extra) & 1:
+                    extra += b"\x00"
+        ifd += struct.pack("<I", 0)
+        f.write(bytes(ifd) + bytes(extra))
+        end = f.tell()
+        f.seek(start + 4)
+        f.write(struct.pack("<I", base))
+        f.seek(end)
+
+
+def _image_rows(page: fitz.Page, zoom: float, height: int) -> List[Tuple[int, int]]:
+    """Device rows [top, bottom) covered by images on `page`, overlapping spans merged."""
+    spans = sorted((max(0, math.floor(info["bbox"][1] * zoom)), min(height, math.ceil(info["bbox"][3] * zoom)))
+                   for info in page.get_image_info())
+    merged: List[Tuple[int, int]] = []
+    for top, bottom in spans:
+        if top >= bottom:
+            continue
+        if merged and top < merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], bottom))
+        else:
+            merged.append((top, bottom))
+    return merged
+
+
+def _bands(height: int, rows: int, images: Sequence[Tuple[int, int]] = ()) -> Iterator[Tuple[int, int]]:
+    """
+    Row ranges of at most `rows` rows covering `height`. A break that would
+    fall inside one of the merged `images` spans moves up to its top when
+    the span fits in a range of its own; taller spans are split.
+    """
+    y0 = 0
+    while y0 < height:
+        y1 = min(height, y0 + rows)
+        for top, bottom in images:
+            if y0 < top < y1 < bottom and bottom - top <= rows:
+                y1 = top
+                break
+        yield y0, y1
+        y0 = y1
+
+
+def write_side(page: fitz.Page, target: Union[str, BinaryIO], spec: RasterSpec) -> Tuple[int, int]:
+    """
+    Rasterize `page` into `target` (a path or a seekable binary stream) in
+    horizontal bands of at most spec.band_bytes samples. The page is parsed
+    once into a display list; each band renders only its clip, so a band
+    matches the same rows of a full-page render except for anti-aliasing of
+    hairlines crossing the band edges. Images are different: MuPDF decodes
+    only the part of an image a clip needs and samples it from that part's
+    own origin, which can move sample edges by a device row. Bands therefore
+    break above images that fit in one band; taller images are split, and
+    below the split their sample edges may sit one row off a full render.
+    Returns the image size in pixels.
+    """
+    zoom = spec.dpi / 72
+    matrix = fitz.Matrix(zoom, zoom)
+    dlist = page.get_displaylist()
+    size = dlist.rect * matrix
+    # MuPDF's own rounding for a full render (fz_round_rect)
+    width, height = math.ceil(size.x1 - 0.001), math.ceil(size.y1 - 0.001)
+    rows = spec.band_rows(width)
+    page_width = dlist.rect.width
+
+    f = open(target, "wb") if isinstance(target, str) else target
+    try:
+        if spec.format == "tiff":
+            writer = _TiffWriter(f, width, height, spec.channels, spec.dpi, rows)
+        else:
+            writer = _PngWriter(f, width, height, spec.channels, spec.dpi)
+        for y0, y1 in _bands(height, rows, _image_rows(page, zoom, height)):
+            clip = fitz.Rect(0, y0 / zoom, page_width, y1 / zoom)
+            pix = dlist.get_pixmap(matrix=matrix, colorspace=spec.colorspace, alpha=False, clip=clip)
+            if pix.width != width or pix.height != y1 - y0:
+                raise RuntimeError(f"band {y0}-{y1} rendered as {pix.irect}, expected {width} x {y1 - y0}")
+            writer.write(pix.samples_mv, y1 - y0)
+            pix = None
+        writer.close()
+    finally:
+        if isinstance(target, str):
+            f.close()
+    return width, height
+
+
+# ------------------------
+# Sheet sides
+# ------------------------
+def raster_task(src_doc: fitz.Document, signatures: Sequence[SignaturePlacement], level: int, out_dir: str,
+                spec: RasterSpec, source_map: Optional[Sequence[int]] = None, scan=None,
+                stem: str = "sheet") -> List[str]:
+    """Draw each of `signatures` on scratch pages and rasterize all of its sides."""
+    paths = []
+    for sig in signatures:
+        scratch = draw_signatures(fitz.open(), src_doc, [sig], level, source_map, scan=scan)
+        try:
+            for p, page in enumerate(scratch):
+                sheet = (sig.page_offset + p) // 2 + 1
+                path = os.path.join(out_dir, side_file_name(sheet, SIDES[p % 2], spec, stem))
+                with stage("raster_side", sheet=sheet, side=SIDES[p % 2]):
+                    write_side(page, path, spec)
+                paths.append(path)
+        finally:
+            scratch.close()
+    return paths
+
+
+def _raster_part(signatures: List[SignaturePlacement], level: int, out_dir: str, spec: RasterSpec,
+                 stem: str) -> List[str]:
+    src_doc, source_map = worker_source()
+    return raster_task(src_doc, signatures, level, out_dir, spec, source_map, stem=stem)
+
+
+def render_raster(src_doc: fitz.Document, table: PlacementTable, out_dir: str, spec: RasterSpec, *,
+                  workers: Optional[int] = 1, stem: str = "sheet",
+                  tracker: Optional[SignatureProgress] = None) -> List[str]:
+    """
+    Rasterize every sheet side of `table` into `out_dir`, in print order.
+    With workers != 1 (None = all cores) runs of whole signatures are
+    rendered by a process pool (core.parallel.worker_pool), so each
+    signature is drawn once; files appear as they are finished. `tracker`
+    advances per completed signature; on cancellation, the signatures not
+    yet started are dropped and the files written so far stay.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    n_workers = resolve_workers(workers)
+    paths: List[str] = []
+    if n_workers == 1:
+        for sig in table.signatures:
+            if tracker is not None:
+                tracker.check()
+            paths += raster_task(src_doc, [sig], table.level, out_dir, spec, table.source_map, table.scan, stem)
+            if tracker is not None:
+                tracker.step()
+        count("raster_sides", len(paths))
+        return paths
+
+    tasks = split_signatures(table.signatures, n_workers * CHUNKS_PER_WORKER)
+    pool = worker_pool(src_doc, min(n_workers, len(tasks)), table.source_map)
+    try:
+        n = len(tasks)
+        results = pool.map(_raster_part, tasks, [table.level] * n, [out_dir] * n, [spec] * n, [stem] * n)
+        for task, done in zip(tasks, results):
+            if tracker is not None:
+                tracker.check()
+            paths += done
+            if tracker is not None:
+                tracker.step(len(task))
+    except ImpositionCancelled:
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        pool.shutdown(wait=True)
+    count("raster_sides", len(paths))
+    return paths
+
+
+def impose_to_raster(src_doc: fitz.Document,
+                     plan,
+                     out_dir: str,
+                     log=None,
+                     *,
+                     level: int = 1,
+                     binding: str = "LTR",
+                     spec: Optional[RasterSpec] = None,
+                     stem: str = "sheet",
+                     workers: Optional[int] = 1,
+                     log_level: int = logging.INFO,
+                     engine: str = "list",
+                     dedup: bool = False,
+                     progress: Optional[ProgressFn] = None,
+                     cancelled: Optional[CancelFn] = None) -> List[str]:
+    """
+    Raster counterpart of impose_cut_stack: every sheet side goes straight to
+    an image file in `out_dir` (see side_file_name), without an imposed PDF
+    in between. Returns the files in print order (sheet 1 front, back, ...).
+    """
+    spec = spec or RasterSpec()
+    with log_to(log, log_level):
+        table = plan_placements(src_doc, plan, level=level, binding=binding, engine=engine)
+        with deduplicated(src_doc, table, dedup) as source, \
+                stage("raster", signatures=len(table.signatures), dpi=spec.dpi, color=spec.color):
+            paths = render_raster(source, table, out_dir, spec, workers=workers, stem=stem,
+                                  tracker=tracker_for(len(table.signatures), progress, cancelled))
+        logger.info("Rasterized %d sheet sides to %s (%s, %d dpi, %s)",
+                    len(paths), out_dir, spec.format, spec.dpi, spec.color)
+        return paths
@@ -0,0 +1,242 @@
+# core/shards.py
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from core.dedup import deduplicated
+from core.imposition import draw_signatures, plan_placements
+from core.instrument import count, stage
+from core.layout import BLANK, PlacementTable, SignaturePlacement, group_signatures
+from core.lazy import lazy_import
+from core.output import DEFAULT_SAVE_PROFILE, save_options
+from core.parallel import resolve_workers, save_part, worker_pool
+from core.progress import CancelFn, ProgressFn, SignatureProgress, tracker_for
+from utils.logger import get_logger, log_to
+
+fitz = lazy_import("fitz")
+
+logger = get_logger("shards")
+
+MANIFEST_NAME = "manifest.json"
+# Shard size meaning "one shard per signature"; otherwise a number of sheets
+PER_SIGNATURE = "signature"
+# Shards are saved under this suffix and renamed when complete, so that
+# anything watching the directory never picks up a half-written file
+PARTIAL_SUFFIX = ".part"
+
+
+@dataclass
+class Shard:
+    """
+    One output file of a sharded imposition: a contiguous run of whole
+    signatures. Ranges are 1-based and inclusive, numbered as in the full
+    output; `source_pages` is None for a shard holding only padding.
+    """
+    index: int
+    path: str
+    signatures: List[SignaturePlacement]
+    signature_range: Tuple[int, int]
+    sheets: Tuple[int, int]
+    source_pages: Optional[Tuple[int, int]]
+    pages: int = 0
+    bytes: int = 0
+    seconds: float = 0.0  # since the start of rendering
+    done: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "file": os.path.basename(self.path),
+            "signatures": list(self.signature_range),
+            "sheets": list(self.sheets),
+            "source_pages": list(self.source_pages) if self.source_pages else None,
+            "status": "done" if self.done else "pending",
+            "pages": self.pages,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 6),
+        }
+
+
+def shard_file_name(index: int, stem: str = "shard") -> str:
+    """'shard-0001.pdf': zero-padded, so a plain directory listing is in print order."""
+    return f"{stem}-{index:04d}.pdf"
+
+
+def plan_shards(table: PlacementTable, out_dir: str, *, shard_size: Union[str, int] = PER_SIGNATURE,
+                stem: str = "shard", source_pages: Optional[int] = None) -> List[Shard]:
+    """
+    Split `table` into shards: one per signature (`shard_size` PER_SIGNATURE),
+    or runs of whole signatures of about `shard_size` sheets (a signature is never
+    split across files). `source_pages` clips the source ranges to the pages
+    the source actually has.
+    """
+    if shard_size == PER_SIGNATURE:
+        groups = [[sig] for sig in table.signatures]
+    elif isinstance(shard_size, int) and not isinstance(shard_size, bool) and shard_size >= 1:
+        groups = group_signatures(table.signatures, shard_size)
+    else:
+        raise ValueError(f"shard size must be {PER_SIGNATURE!r} or at least 1 sheet, got {shard_size!r}")
+
+    shards: List[Shard] = []
+    first_sig = 1
+    for index, group in enumerate(groups, 1):
+        head, tail = group[0], group[-1]
+        src_first = head.src_offset + 1
+        src_last = tail.src_offset + tail.layout.orig_pages
+        if source_pages is not None:
+            src_last = min(src_last, source_pages)
+        shards.append(Shard(
+            index=index,
+            path=os.path.join(out_dir, shard_file_name(index, stem)),
+            signatures=group,
+            signature_range=(first_sig, first_sig + len(group) - 1),
+            sheets=(head.page_offset // 2 + 1, tail.page_offset // 2 + tail.layout.sheets),
+            source_pages=(src_first, src_last) if src_first <= src_last else None,
+        ))
+        first_sig += len(group)
+    return shards
+
+
+def write_manifest(path: str, info: Dict[str, Any], shards: Sequence[Shard]) -> None:
+    """Rewrite the manifest atomically: readers see the previous or the new version, never a mix."""
+    manifest = dict(info)
+    manifest["shards"] = [shard.to_dict() for shard in shards]
+    manifest["complete"] = all(shard.done for shard in shards)
+    tmp = path + PARTIAL_SUFFIX
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _finish(shard: Shard, pages: int, t0: float) -> Shard:
+    os.replace(shard.path + PARTIAL_SUFFIX, shard.path)
+    shard.pages = pages
+    shard.bytes = os.path.getsize(shard.path)
+    shard.seconds = time.perf_counter() - t0
+    shard.done = True
+    return shard
+
+
+def _discard_partials(shards: Sequence[Shard]) -> None:
+    for shard in shards:
+        if not shard.done and os.path.exists(shard.path + PARTIAL_SUFFIX):
+            os.remove(shard.path + PARTIAL_SUFFIX)
+
+
+def render_shards(src_doc: fitz.Document, table: PlacementTable, shards: Sequence[Shard], *,
+                  workers: Optional[int] = 1, save_profile: str = DEFAULT_SAVE_PROFILE,
+                  manifest: Optional[str] = None, info: Optional[Dict[str, Any]] = None,
+                  tracker: Optional[SignatureProgress] = None) -> Iterator[Shard]:
+    """
+    Draw and save each shard, yielding it as soon as its file is complete.
+    Serially that is in print order; with workers != 1 (None = all cores)
+    shards are rendered by a process pool and yielded in completion order.
+    `manifest` is rewritten after every finished shard, with `info` merged
+    in. `tracker` advances per signature; on cancellation, or when the
+    caller stops iterating, shards not yet started are dropped and the ones
+    finished so far stay.
+    """
+    options = save_options(save_profile)
+    n_workers = min(resolve_workers(workers), len(shards))
+    info = {"level": table.level, "binding": table.binding, "sheets": table.sheet_count,
+            "save_profile": save_profile, **(info or {})}
+    if shards:
+        os.makedirs(os.path.dirname(shards[0].path) or ".", exist_ok=True)
+    if manifest is not None:
+        write_manifest(manifest, info, shards)
+
+    t0 = time.perf_counter()
+    try:
+        if n_workers <= 1:
+            for shard in shards:
+                if tracker is not None:
+                    tracker.check()
+                with stage("shard", index=shard.index, signatures=len(shard.signatures)):
+                    part = draw_signatures(fitz.open(), src_doc, shard.signatures, table.level,
+                                           table.source_map, scan=table.scan)
+                    try:
+                        part.save(shard.path + PARTIAL_SUFFIX, **options)
+                        pages = len(part)
+                    finally:
+                        part.close()
+                yield from _completed(_finish(shard, pages, t0), manifest, info, shards, tracker)
+            return
+
+        from concurrent.futures import as_completed
+
+        pool = worker_pool(src_doc, n_workers, table.source_map)
+        # Workers draw outside the recorder's process; count their placements here
+        count("show_pdf_page", sum(1 for _, _, s, _ in table if s != BLANK and s < len(src_doc)))
+        try:
+            futures = {pool.submit(save_part, shard.signatures, table.level, shard.path + PARTIAL_SUFFIX,
+                                   options): shard
+                       for shard in shards}
+            for future in as_completed(futures):
+                if tracker is not None:
+                    tracker.check()
+                shard = _finish(futures[future], future.result(), t0)
+                yield from _completed(shard, manifest, info, shards, tracker)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        _discard_partials(shards)
+
+
+def _completed(shard: Shard, manifest: Optional[str], info: Dict[str, Any], shards: Sequence[Shard],
+               tracker: Optional[SignatureProgress]) -> Iterator[Shard]:
+    if manifest is not None:
+        write_manifest(manifest, info, shards)
+    if tracker is not None:
+        tracker.step(len(shard.signatures))
+    yield shard
+
+
+def impose_to_shards(src_doc: fitz.Document,
+                     plan,
+                     out_dir: str,
+                     log=None,
+                     *,
+                     level: int = 1,
+                     binding: str = "LTR",
+                     shard_size: Union[str, int] = PER_SIGNATURE,
+                     workers: Optional[int] = 1,
+                     stem: str = "shard",
+                     log_level: int = logging.INFO,
+                     engine: str = "list",
+                     save_profile: str = DEFAULT_SAVE_PROFILE,
+                     dedup: bool = False,
+                     on_shard: Optional[Callable[[Shard], None]] = None,
+                     progress: Optional[ProgressFn] = None,
+                     cancelled: Optional[CancelFn] = None) -> List[Shard]:
+    """
+    Sharded counterpart of impose_cut_stack: each signature (or, with an
+    integer `shard_size`, each run of about that many sheets) goes to its own PDF in `out_dir`, next to a
+    manifest.json listing the shards in print order with their sheet and
+    source page ranges. Together the shards hold exactly the pages of the
+    single-file output. `on_shard` is called as each file is ready; the
+    result lists all shards in print order.
+    """
+    with log_to(log, log_level):
+        table = plan_placements(src_doc, plan, level=level, binding=binding, engine=engine)
+        n_src = len(src_doc)
+        shards = plan_shards(table, out_dir, shard_size=shard_size, stem=stem, source_pages=n_src)
+        info = {"source_pages": n_src, "plan": list(plan.sequence)}
+        with deduplicated(src_doc, table, dedup) as source, \
+                stage("shards", shards=len(shards), signatures=len(table.signatures)):
+            for shard in render_shards(source, table, shards, workers=workers, save_profile=save_profile,
+                                       manifest=os.path.join(out_dir, MANIFEST_NAME), info=info,
+                                       tracker=tracker_for(len(table.signatures), progress, cancelled)):
+                logger.info("Shard %d/%d ready: %s (sheets %d-%d)", shard.index, len(shards),
+                            os.path.basename(shard.path), *shard.sheets)
+                if on_shard is not None:
+                    on_shard(shard)
+        count("shards", len(shards))
+        count("output_pages", sum(shard.pages for shard in shards))
+        logger.info("Wrote %d shards to %s", len(shards), out_dir)
+        return shards
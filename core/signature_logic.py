@@ -1,7 +1,9 @@
 import math
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
-from config import SIG_PAIRS
+from typing import Iterable, List, Tuple, Optional
+from config import SIG_PAIRS, LEVEL_GRIDS
 
 @dataclass
 class Plan:
@@ -71,3 +73,127 @@ def choose_best_plan(n_pages: int):
     plans = [compute_plan_for_pair(n_pages, a, b) for (a, b) in SIG_PAIRS]
     plans.sort(key=lambda p: (p.blanks, p.total_pages))
     return plans[0], plans
+
+
+# ------------------------
+# Generalized planner
+# ------------------------
+@dataclass(frozen=True)
+class PlanWeights:
+    blank: float = 1.0      # per blank page
+    sheet: float = 0.0      # per printed sheet
+    signature: float = 0.5  # per signature (one fold/bind operation each)
+
+
+def pages_per_sheet(level: int) -> int:
+    rows, cols = LEVEL_GRIDS[level]
+    return rows * cols * 2
+
+
+# Sizes the planner picks from when the caller names none (rounded to whole sheets per level)
+DEFAULT_SIZES = (32, 28, 24, 20, 16)
+
+
+def round_to_sheets(sizes: Iterable[int], level: int) -> List[int]:
+    """Signature sizes rounded up to whole sheets of `level`, largest first."""
+    per_sheet = pages_per_sheet(level)
+    out = {-(-s // per_sheet) * per_sheet for s in sizes if s > 0}
+    if not out:
+        raise ValueError("no usable signature size")
+    return sorted(out, reverse=True)
+
+
+def sheet_sizes(sizes: Iterable[int], level: int) -> List[int]:
+    """Allowed signature sizes, largest first; each must fill whole sheets of `level`."""
+    sizes = list(sizes)
+    per_sheet = pages_per_sheet(level)
+    partial = sorted({s for s in sizes if s > 0 and s % per_sheet})
+    if partial:
+        raise ValueError(f"signature sizes {partial} are not whole sheets at level {level} "
+                         f"({per_sheet} pages per sheet)")
+    return round_to_sheets(sizes, level)
+
+
+# units tuple -> (min signatures per total, last signature used), grown on
+# demand; least recently used size sets are dropped beyond _DP_MAX_TABLES.
+# _DP_LOCK serialises lookups and growth, since planners run on GUI and
+# service threads.
+_DP_LOCK = threading.Lock()
+_DP_TABLES: "OrderedDict[Tuple[int, ...], Tuple[List[int], List[int]]]" = OrderedDict()
+_DP_MAX_TABLES = 32
+_INF = float("inf")
+
+
+def _min_signatures(units: Tuple[int, ...], limit: int) -> Tuple[List[int], List[int]]:
+    """
+    Coin-change DP in sheet units: best[t] is the fewest signatures whose sizes
+    sum to exactly t sheets, last[t] the size of one of them. Memoized per size
+    set and extended incrementally, so repeated planning only pays for new totals.
+    """
+    with _DP_LOCK:
+        tables = _DP_TABLES.pop(units, None) or ([0], [0])
+        _DP_TABLES[units] = tables
+        while len(_DP_TABLES) > _DP_MAX_TABLES:
+            _DP_TABLES.popitem(last=False)
+        best, last = tables
+        for t in range(len(best), limit + 1):
+            b, l = _INF, 0
+            for u in units:
+                if u <= t and best[t - u] + 1 < b:
+                    b, l = best[t - u] + 1, u
+            best.append(b)
+            last.append(l)
+        return best, last
+
+
+def plan_signatures(n_pages: int,
+                    sizes: Optional[Iterable[int]] = None,
+                    *,
+                    level: int = 1,
+                    weights: PlanWeights = PlanWeights()) -> Plan:
+    """
+    Cheapest sequence of signatures covering `n_pages` for `level`, minimizing
+    weights.blank * blanks + weights.sheet * sheets + weights.signature * signatures.
+    Every size must fill whole sheets of `level` (ValueError otherwise), so no
+    signature needs inner padding and every blank page sits at the end of the
+    document. Without `sizes`, DEFAULT_SIZES rounded up to whole sheets are used.
+    """
+    if n_pages <= 0:
+        raise ValueError("n_pages must be positive")
+    per_sheet = pages_per_sheet(level)
+    allowed = round_to_sheets(DEFAULT_SIZES, level) if sizes is None else sheet_sizes(sizes, level)
+    units = tuple(s // per_sheet for s in allowed)
+
+    # Covering n with only the largest size costs less than any total at or
+    # beyond n + largest, so totals past that bound never need to be tried.
+    lo = -(-n_pages // per_sheet)
+    hi = (n_pages + allowed[0] - 1) // per_sheet
+    best, last = _min_signatures(units, hi)
+
+    choice = None
+    for t in range(lo, hi + 1):
+        if best[t] == _INF:
+            continue
+        total = t * per_sheet
+        blanks = total - n_pages
+        cost = weights.blank * blanks + weights.sheet * t + weights.signature * best[t]
+        key = (cost, blanks, best[t])
+        if choice is None or key < choice[0]:
+            choice = (key, t)
+    if choice is None:
+        raise ValueError(f"sizes {allowed} cannot cover {n_pages} pages")
+
+    t = choice[1]
+    seq: List[int] = []
+    while t > 0:
+        seq.append(last[t] * per_sheet)
+        t -= last[t]
+    seq.sort(reverse=True)
+
+    total = sum(seq)
+    counts = {s: seq.count(s) for s in sorted(set(seq), reverse=True)}
+    expression = " + ".join(f"{c}*{s}" for s, c in counts.items())
+    large, small = seq[0], seq[-1]
+    return Plan(pair=(large, small), count_hi=counts[large],
+                count_lo=counts[small] if small != large else 0,
+                total_pages=total, blanks=total - n_pages, expression=expression, sequence=seq)
@@ -0,0 +1,349 @@
+# core/verify.py
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from hashlib import blake2b
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from core.geometry import LEVEL_GRIDS, a4_rect_portrait, grid_boxes, panels_per_side
+from core.layout import (
+    BLANK,
+    PlacementTable,
+    SignatureLayout,
+    build_placement_table,
+    interleaved_blank_locals,
+    side_angles,
+)
+from core.lazy import lazy_import
+
+fitz = lazy_import("fitz")
+
+# Only the first few problems are spelled out; the count is always exact
+MAX_ERRORS = 20
+
+
+class VerificationError(RuntimeError):
+    """An imposition broke one of the placement invariants (see Verification.errors)."""
+
+    def __init__(self, report: "Verification"):
+        lines = "; ".join(report.errors[:3])
+        more = f" (+{report.error_count - 3} more)" if report.error_count > 3 else ""
+        super().__init__(f"imposition failed verification: {lines}{more}")
+        self.report = report
+
+
+@dataclass
+class Verification:
+    source_pages: int
+    output_pages: int
+    panels: int
+    errors: List[str] = field(default_factory=list)
+    error_count: int = 0
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error_count == 0
+
+    def add(self, message: str) -> None:
+        if self.error_count < MAX_ERRORS:
+            self.errors.append(message)
+        self.error_count += 1
+
+    def raise_for_errors(self) -> "Verification":
+        if not self.ok:
+            raise VerificationError(self)
+        return self
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "ok": self.ok,
+            "source_pages": self.source_pages,
+            "output_pages": self.output_pages,
+            "panels": self.panels,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "seconds": round(self.seconds, 6),
+        }
+
+
+# ------------------------
+# Placement table
+# ------------------------
+def layout_errors(lay: SignatureLayout, level: int, binding: str = "LTR") -> List[str]:
+    """
+    Invariants of one signature template, derived from the folding rules rather
+    than from the code that built it:
+      - padding rounds the signature up to whole sheets and nothing more;
+      - every (page, box) slot of every sheet side is used exactly once;
+      - every source page of the signature is placed exactly once, at the
+        local page left over once interleaved_blank_locals() took its blanks;
+      - local pages p and N+1-p (one spread) share a sheet side, fronts holding
+        the pairs whose outer page min(p, N+1-p) is odd;
+      - the remaining panels are exactly the intended blanks, on the side of
+        their spread;
+      - every panel is rotated by side_angles() for its side.
+    """
+    errors: List[str] = []
+    per_side = panels_per_side(level)
+    orig, n = lay.orig_pages, lay.padded_pages
+    if n % (2 * per_side) or not orig <= n < orig + 2 * per_side or lay.sheets * 2 * per_side != n:
+        errors.append(f"{lay!r}: padding is not the smallest whole number of sheets")
+        return errors
+    if len(lay) != n:
+        errors.append(f"{lay!r}: {len(lay)} panels for {n} padded pages")
+        return errors
+
+    angles = side_angles(level, binding)
+    blanks = interleaved_blank_locals(orig, n)
+    real_locals = [p for p in range(1, n + 1) if p not in blanks]
+    slots = bytearray(n)
+    placed = bytearray(orig)
+    page_of_local = [-1] * (n + 1)
+    blank_panels = [0] * (2 * lay.sheets)
+
+    for p, b, s, r in zip(lay.page, lay.box, lay.src, lay.rot):
+        if not (0 <= p < 2 * lay.sheets and 0 <= b < per_side):
+            errors.append(f"{lay!r}: slot (page {p}, box {b}) outside the sheets")
+            continue
+        if slots[p * per_side + b]:
+            errors.append(f"{lay!r}: page {p} box {b} used twice")
+        slots[p * per_side + b] = 1
+        if r != angles[p & 1]:
+            errors.append(f"{lay!r}: page {p} box {b} rotated {r}, expected {angles[p & 1]}")
+        if s == BLANK:
+            blank_panels[p] += 1
+            continue
+        if not 0 <= s < orig:
+            errors.append(f"{lay!r}: source {s} outside the signature")
+            continue
+        if placed[s]:
+            errors.append(f"{lay!r}: source {s} placed twice")
+        placed[s] = 1
+        local = real_locals[s]
+        page_of_local[local] = p
+        if (p & 1) != (min(local, n + 1 - local) + 1) & 1:
+            errors.append(f"{lay!r}: source {s} (local page {local}) on the wrong side")
+
+    missing = [s for s in range(orig) if not placed[s]]
+    if missing:
+        errors.append(f"{lay!r}: sources {missing[:5]} never placed")
+
+    # Spreads: both halves on one side; a blank half sits next to its real mate
+    expected_blanks = [0] * (2 * lay.sheets)
+    blank_spreads = [0, 0]  # fully blank spreads, front / back
+    for local in range(1, n // 2 + 1):
+        mate = n + 1 - local
+        p_local, p_mate = page_of_local[local], page_of_local[mate]
+        if p_local >= 0 and p_mate >= 0:
+            if p_local != p_mate:
+                errors.append(f"{lay!r}: local pages {local} and {mate} on pages {p_local} and {p_mate}")
+        elif p_local >= 0 or p_mate >= 0:
+            expected_blanks[max(p_local, p_mate)] += 1
+        else:
+            blank_spreads[(local + 1) & 1] += 1
+    extra = [0, 0]
+    for p, (got, want) in enumerate(zip(blank_panels, expected_blanks)):
+        if got < want:
+            errors.append(f"{lay!r}: page {p} has {got} blanks, its spreads need {want}")
+        extra[p & 1] += got - want
+    if extra != [2 * blank_spreads[0], 2 * blank_spreads[1]]:
+        errors.append(f"{lay!r}: blank panels {extra} (front, back) outside their spreads, "
+                      f"expected {[2 * c for c in blank_spreads]}")
+    return errors
+
+
+def verify_table(table: PlacementTable, source_pages: Optional[int] = None) -> Verification:
+    """
+    Check a placement table against the imposition invariants (see
+    layout_errors) without drawing anything. Templates are checked once per
+    distinct layout; signatures only add offset checks, so this stays in the
+    millisecond range for documents of tens of thousands of pages.
+    `source_pages` (default: everything the plan covers) is the length of the
+    source; pages past it are plan blanks.
+    """
+    t = time.perf_counter()
+    sigs = table.signatures
+    covered = sum(sig.layout.orig_pages for sig in sigs)
+    n_src = covered if source_pages is None else source_pages
+    report = Verification(n_src, table.page_count, len(table))
+
+    if table.level not in LEVEL_GRIDS or table.binding not in ("LTR", "RTL"):
+        report.add(f"unknown level {table.level} / binding {table.binding!r}")
+        report.seconds = time.perf_counter() - t
+        return report
+
+    checked: Dict[int, List[str]] = {}
+    page_offset = src_offset = 0
+    for i, sig in enumerate(sigs, start=1):
+        lay = sig.layout
+        errors = checked.get(id(lay))
+        if errors is None:
+            errors = checked[id(lay)] = layout_errors(lay, table.level, table.binding)
+            for e in errors:
+                report.add(f"signature #{i}: {e}")
+        if sig.page_offset != page_offset or sig.src_offset != src_offset:
+            report.add(f"signature #{i}: starts at page {sig.page_offset} / source {sig.src_offset}, "
+                       f"expected {page_offset} / {src_offset}")
+        page_offset += lay.sheets * 2
+        src_offset += lay.orig_pages
+
+    if table.page_count != page_offset:
+        report.add(f"page count {table.page_count}, signatures hold {page_offset}")
+    if covered < n_src:
+        report.add(f"plan covers {covered} of {n_src} source pages")
+
+    source_map = table.source_map
+    if source_map is not None:
+        if len(source_map) < n_src:
+            report.add(f"source map has {len(source_map)} of {n_src} entries")
+        for s, c in enumerate(source_map[:n_src]):
+            if not 0 <= c <= s or source_map[c] != c:
+                report.add(f"source map sends {s} to {c}, which is not a canonical earlier page")
+
+    report.seconds = time.perf_counter() - t
+    return report
+
+
+def check_table(table: PlacementTable, source_pages: Optional[int] = None) -> Verification:
+    """verify_table() that raises VerificationError on any broken invariant."""
+    return verify_table(table, source_pages).raise_for_errors()
+
+
+# ------------------------
+# Output read-back
+# ------------------------
+def _content_key(data: bytes) -> bytes:
+    return blake2b(data.strip(), digest_size=16).digest()
+
+
+class _SourceKeys:
+    """
+    Source pages by content key. A saved output may hold the contents as
+    written (raw keys) or rewritten by `clean=True` (the "smallest" save
+    profile); the cleaned keys come from a private copy of the source whose
+    pages get the same clean_contents() pass. That copy costs one more
+    in-memory source, so it is only built when a raw key misses.
+    """
+
+    def __init__(self, src_doc: fitz.Document):
+        self.src_doc = src_doc
+        self.raw = self._keys(src_doc)
+        self.cleaned: Optional[Dict[bytes, Set[int]]] = None
+
+    @staticmethod
+    def _keys(doc: fitz.Document, clean: bool = False) -> Dict[bytes, Set[int]]:
+        keys: Dict[bytes, Set[int]] = {}
+        for pno in range(len(doc)):
+            page = doc[pno]
+            if clean:
+                page.clean_contents()
+            keys.setdefault(_content_key(page.read_contents()), set()).add(pno)
+        return keys
+
+    def get(self, data: bytes) -> Set[int]:
+        key = _content_key(data)
+        found = self.raw.get(key)
+        if found is None:
+            if self.cleaned is None:
+                with fitz.open("pdf", self.src_doc.tobytes()) as copy:
+                    self.cleaned = self._keys(copy, clean=True)
+            found = self.cleaned.get(key, set())
+        return found
+
+
+def _matrix_angle(obj: str) -> Optional[int]:
+    head, sep, tail = obj.partition("/Matrix")
+    if not sep:
+        return None
+    a, b = (float(x) for x in tail.strip().lstrip("[").split()[:2])
+    return round(math.degrees(math.atan2(b, a))) % 360
+
+
+def read_placements(out_doc: fitz.Document, src_doc: fitz.Document,
+                    level: int) -> List[Tuple[int, int, Set[int], Optional[int]]]:
+    """
+    Recover what an imposed document shows: (output page, box, candidate source
+    pages, rotation) per drawn panel. Each panel is the form XObject that
+    show_pdf_page wraps around a copy of the source page's contents; the box
+    comes from where it lands, the rotation from its matrix and the source
+    from the contents (pages with identical contents are all candidates),
+    as written or as rewritten by a cleaning save.
+    """
+    by_content = _SourceKeys(src_doc)
+
+    rows, cols = LEVEL_GRIDS[level]
+    boxes = grid_boxes(a4_rect_portrait(), rows, cols)
+    stream_sources: Dict[int, Set[int]] = {}
+    found = []
+    for pno in range(len(out_doc)):
+        page = out_doc[pno]
+        xobjects = page.get_xobjects()
+        flip = page.transformation_matrix  # bboxes are in PDF (bottom-up) coordinates
+        inner = {invoker: xref for xref, name, invoker, _ in xobjects if invoker}
+        for xref, name, invoker, bbox in xobjects:
+            if invoker:
+                continue
+            rect = fitz.Rect(bbox) * flip
+            centre = fitz.Point((rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2)
+            box = next((k for k, r in enumerate(boxes) if centre in r), -1)
+            shown = inner.get(xref)
+            if shown is None:
+                sources: Set[int] = set()
+            else:
+                sources = stream_sources.get(shown)
+                if sources is None:
+                    sources = stream_sources[shown] = by_content.get(out_doc.xref_stream(shown) or b"")
+            found.append((pno, box, sources, _matrix_angle(out_doc.xref_object(xref, compressed=True))))
+    return found
+
+
+def verify_output(out_doc: fitz.Document, src_doc: fitz.Document,
+                  table: PlacementTable) -> Verification:
+    """
+    verify_table() plus a read-back of the imposed document: every non-blank
+    placement of `table` must be drawn on its page and box, showing its
+    source page with its rotation, and nothing else may be drawn.
+    """
+    t = time.perf_counter()
+    n_src = len(src_doc)
+    report = verify_table(table, n_src)
+    if len(out_doc) != table.page_count:
+        report.add(f"output has {len(out_doc)} pages, the table {table.page_count}")
+
+    expected: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    source_map = table.source_map
+    for p, b, s, r in table:
+        if s != BLANK and s < n_src:
+            expected[(p, b)] = (s if source_map is None else source_map[s], r)
+
+    seen: Set[Tuple[int, int]] = set()
+    for p, b, sources, angle in read_placements(out_doc, src_doc, table.level):
+        want = expected.get((p, b))
+        if want is None:
+            report.add(f"page {p} box {b}: drawn, but the table has no source there")
+            continue
+        if (p, b) in seen:
+            report.add(f"page {p} box {b}: drawn twice")
+        seen.add((p, b))
+        s, r = want
+        if s not in sources:
+            report.add(f"page {p} box {b}: expected source page {s + 1}, "
+                       f"shows {sorted(x + 1 for x in sources)[:3] or 'unknown contents'}")
+        if angle is not None and angle != r:
+            report.add(f"page {p} box {b}: rotated {angle}, expected {r}")
+    for (p, b), (s, _) in expected.items():
+        if (p, b) not in seen and src_doc[s].get_contents():
+            report.add(f"page {p} box {b}: source page {s + 1} missing")
+
+    report.seconds = time.perf_counter() - t
+    return report
+
+
+def verify_imposition(out_doc: fitz.Document, src_doc: fitz.Document, sequence: Sequence[int],
+                      level: int, binding: str = "LTR") -> Verification:
+    """verify_output() for an imposition known by its plan sequence."""
+    return verify_output(out_doc, src_doc, build_placement_table(sequence, level, binding))
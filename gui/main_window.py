@@ -1,14 +1,28 @@
+import os
+from collections import deque
+
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QPushButton, QFileDialog,
-    QLabel, QComboBox, QTextEdit, QHBoxLayout, QMessageBox
+    QLabel, QComboBox, QTextEdit, QHBoxLayout, QMessageBox, QProgressBar, QSpinBox
 )
-import fitz
 
-from core.signature_logic import choose_best_plan
-from core.imposition import impose_cut_stack
+from config import LEVEL_SUFFIXES
+from core.output import DEFAULT_SAVE_PROFILE, SAVE_PROFILES
+from core.preview import PreviewProcess, RenderedSide
+from gui.worker import ImposeJob, ImposeWorker
+from utils.logger import BatchedSink
+
+# How often queued log lines are flushed into the log widget
+LOG_FLUSH_MS = 150
 
 
 class App(QWidget):
+    submit = pyqtSignal(object)  # ImposeJob -> worker thread
+    preview_ready = pyqtSignal(object, object)  # (generation, sheet, side), RenderedSide or exception
+    preview_loaded = pyqtSignal(int, object)    # generation, (sheet count, plan expression) or exception
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("A4 → A5/A6/A7/A8 Imposition")
@@ -47,21 +61,91 @@ class App(QWidget):
         ])
         row2.addWidget(self.combo_binding, 1)
 
+        row2.addWidget(QLabel("Output:"))
+        self.combo_profile = QComboBox()
+        self.combo_profile.addItems(list(SAVE_PROFILES))
+        self.combo_profile.setCurrentText(DEFAULT_SAVE_PROFILE)
+        row2.addWidget(self.combo_profile)
+
         self.btn_go = QPushButton("Convert / Impose")
         self.btn_go.clicked.connect(self.run_impose)
         row2.addWidget(self.btn_go)
         lay.addLayout(row2)
 
+        # progress row
+        row3 = QHBoxLayout()
+        self.progress = QProgressBar()
+        self.progress.setFormat("%v/%m signatures")
+        self.label_status = QLabel()
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_current)
+        row3.addWidget(self.progress, 1)
+        row3.addWidget(self.label_status)
+        row3.addWidget(self.btn_cancel)
+        lay.addLayout(row3)
+
+        # preview row: one sheet side at a time, rendered on demand
+        row4 = QHBoxLayout()
+        row4.addWidget(QLabel("Preview sheet:"))
+        self.spin_sheet = QSpinBox()
+        self.spin_sheet.setRange(1, 1)
+        self.spin_sheet.setEnabled(False)
+        row4.addWidget(self.spin_sheet)
+        self.combo_side = QComboBox()
+        self.combo_side.addItems(["front", "back"])
+        row4.addWidget(self.combo_side)
+        self.label_sheets = QLabel()
+        row4.addWidget(self.label_sheets, 1)
+        lay.addLayout(row4)
+
+        body = QHBoxLayout()
+        self.preview = QLabel("No preview")
+        self.preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.preview.setMinimumWidth(300)
+        body.addWidget(self.preview)
+
         # log
         self.log = QTextEdit()
         self.log.setReadOnly(True)
         self.log.setPlaceholderText("Log will appear here…")
-        lay.addWidget(self.log, 1)
+        body.addWidget(self.log, 1)
+        lay.addLayout(body, 1)
 
         self.src_path = None
 
+        # background imposition: one worker thread, jobs run in queue order
+        self.queue = deque()
+        self.current = None
+        self.sink = BatchedSink()
+        self.worker = ImposeWorker(self.sink)
+        self.thread = QThread(self)
+        self.worker.moveToThread(self.thread)
+        self.submit.connect(self.worker.run)
+        self.worker.progress.connect(self._on_progress)
+        self.worker.finished.connect(self._on_finished)
+        self.worker.failed.connect(self._on_failed)
+        self.worker.cancelled.connect(self._on_cancelled)
+        self.thread.start()
+
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self._flush_log)
+        self.log_timer.start(LOG_FLUSH_MS)
+        self._update_status()
+
+        # preview: rendered in a child process that opens the source itself, so
+        # the job worker stays the only thread of this process using PyMuPDF
+        self.previews = PreviewProcess()
+        self.preview_generation = 0  # bumped by every file/settings change
+        self.preview_sheets = 0
+        self.preview_ready.connect(self._on_preview_ready)
+        self.preview_loaded.connect(self._on_preview_loaded)
+        self.combo_target.currentIndexChanged.connect(self._reset_preview)
+        self.combo_binding.currentIndexChanged.connect(self._reset_preview)
+        self.spin_sheet.valueChanged.connect(self._request_preview)
+        self.combo_side.currentIndexChanged.connect(self._request_preview)
+
     def _unique_path(self, path: str) -> str:
-        import os
         base, ext = os.path.splitext(path)
         if not os.path.exists(path):
             return path
@@ -77,80 +161,131 @@ class App(QWidget):
         self.src_path = path
         self.label_file.setText(path)
         self.log.append(f"Selected: {path}")
+        self._reset_preview(reopen=True)
 
-    def run_impose(self):
+    def _reset_preview(self, *_, reopen: bool = False):
+        self.preview_generation += 1
+        self.preview_sheets = 0
+        self.spin_sheet.setEnabled(False)
         if not self.src_path:
-            QMessageBox.warning(self, "No file", "Please upload an A4 PDF first.")
             return
+        level = self.combo_target.currentIndex() + 1
+        binding = "RTL" if "RTL" in self.combo_binding.currentText().upper() else "LTR"
+        generation = self.preview_generation
+        future = self.previews.load(self.src_path, level, binding, reopen=reopen)
+        # callbacks run on an executor thread; the signals hop back to the GUI thread
+        future.add_done_callback(
+            lambda f: f.cancelled() or self.preview_loaded.emit(generation, f.exception() or f.result()))
+
+    def _on_preview_loaded(self, generation: int, result):
+        if generation != self.preview_generation:
+            return  # settings changed again meanwhile
+        if isinstance(result, BaseException):
+            self.log.append(f"Preview unavailable: {result}")
+            return
+        n, expression = result
+        if n == 0:
+            return
+        self.preview_sheets = n
+        self.label_sheets.setText(f"of {n} ({expression})")
+        self.spin_sheet.blockSignals(True)
+        self.spin_sheet.setRange(1, n)
+        self.spin_sheet.blockSignals(False)
+        self.spin_sheet.setEnabled(True)
+        self._request_preview()
 
-        try:
-            src_doc = fitz.open(self.src_path)
-        except Exception as e:
-            QMessageBox.critical(self, "Open failed", f"Could not open PDF:\n{e}")
+    def _request_preview(self):
+        if not self.preview_sheets:
             return
+        where = (self.preview_generation, self.spin_sheet.value(), self.combo_side.currentText())
+        # supersedes the previous render and prefetch, which then resolve as cancelled
+        future = self.previews.render(*where[1:])
+        future.add_done_callback(
+            lambda f: f.cancelled() or self.preview_ready.emit(where, f.exception() or f.result()))
+        self.previews.prefetch(where[1])
 
-        if len(src_doc) == 0:
-            QMessageBox.warning(self, "Empty PDF", "The selected PDF has no pages.")
+    def _on_preview_ready(self, where, result):
+        if where != (self.preview_generation, self.spin_sheet.value(), self.combo_side.currentText()):
+            return  # the user has moved on
+        if isinstance(result, BaseException):
+            self.preview.setText(f"Preview failed: {result}")
             return
+        side: RenderedSide = result
+        img = QImage(side.samples, side.width, side.height, side.stride,
+                     QImage.Format.Format_RGB888).copy()
+        self.preview.setPixmap(QPixmap.fromImage(img))
 
-        target = self.combo_target.currentText()
+    def run_impose(self):
+        if not self.src_path:
+            QMessageBox.warning(self, "No file", "Please upload an A4 PDF first.")
+            return
+
+        level = self.combo_target.currentIndex() + 1
         binding_choice = self.combo_binding.currentText()
         binding = "RTL" if "RTL" in binding_choice.upper() else "LTR"
 
-        self.log.append("\n---- Imposition (Staged Pipeline) ----")
-        best, _ = choose_best_plan(len(src_doc))
-
-        try:
-            if "A5" in target:
-                out_doc = impose_cut_stack(
-                    src_doc, best, self.log,
-                    level=1,
-                    binding=binding,
-                    emit_blank_tail_signature=False
-                )
-                suffix = "_A5_booklet.pdf"
-
-            elif "A6" in target:
-                out_doc = impose_cut_stack(
-                    src_doc, best, self.log,
-                    level=2,
-                    binding=binding,
-                    emit_blank_tail_signature=False
-                )
-                suffix = "_A6_booklet.pdf"
-
-            elif "A7" in target:
-                out_doc = impose_cut_stack(
-                    src_doc, best, self.log,
-                    level=3,
-                    binding=binding,
-                    emit_blank_tail_signature=False
-                )
-                suffix = "_A7_booklet.pdf"
-
-            else:
-                out_doc = impose_cut_stack(
-                    src_doc, best, self.log,
-                    level=4,
-                    binding=binding,
-                    emit_blank_tail_signature=False
-                )
-                suffix = "_A8_booklet.pdf"
-
-
-        except Exception as e:
-            src_doc.close()
-            QMessageBox.critical(self, "Imposition failed", f"An error occurred:\n{e}")
-            return
+        # Output name is picked when the job starts, so queued copies don't collide
+        job = ImposeJob(self.src_path, "", level, binding, self.combo_profile.currentText())
+        self.queue.append(job)
+        self.log.append(f"Queued: {job.src_path} ({LEVEL_SUFFIXES[level][1:3]}, {binding})")
+        self._start_next()
 
-        out_path = self.src_path.rsplit('.', 1)[0] + suffix
-        out_path = self._unique_path(out_path)
-        try:
-            out_doc.save(out_path)
-            out_doc.close()
-        except Exception as e:
-            QMessageBox.critical(self, "Save failed", f"Could not save output:\n{e}")
+    def _start_next(self):
+        self._update_status()
+        if self.current is not None or not self.queue:
             return
+        job = self.queue.popleft()
+        job.out_path = self._unique_path(job.src_path.rsplit('.', 1)[0] + LEVEL_SUFFIXES[job.level])
+        self.current = job
+        self.progress.setValue(0)
+        self.btn_cancel.setEnabled(True)
+        self._update_status()
+        self.submit.emit(job)
+
+    def cancel_current(self):
+        if self.current is not None:
+            self.current.cancel.set()
+            self.log.append(f"Cancelling: {self.current.src_path}")
+
+    def _update_status(self):
+        running = f"Running: {os.path.basename(self.current.src_path)}" if self.current else "Idle"
+        self.label_status.setText(f"{running} — {len(self.queue)} queued")
+
+    def _flush_log(self):
+        lines = self.sink.drain()
+        if lines:
+            self.log.append("\n".join(lines))
+
+    def _on_progress(self, done: int, total: int):
+        self.progress.setMaximum(max(total, 1))
+        self.progress.setValue(done)
+
+    def _job_done(self):
+        self._flush_log()
+        self.current = None
+        self.btn_cancel.setEnabled(False)
+        self._start_next()
+
+    def _on_finished(self, job: ImposeJob):
+        self.log.append(f"Saved: {job.out_path}")
+        self._job_done()
+        if self.current is None:
+            QMessageBox.information(self, "Done", f"Created:\n{job.out_path}")
+
+    def _on_failed(self, job: ImposeJob, message: str):
+        self.log.append(f"Failed: {job.src_path}")
+        self._job_done()
+        QMessageBox.critical(self, "Imposition failed", message)
+
+    def _on_cancelled(self, job: ImposeJob):
+        self.log.append(f"Cancelled: {job.src_path}")
+        self._job_done()
 
-        self.log.append(f"Saved: {out_path}")
-        QMessageBox.information(self, "Done", f"Created:\n{out_path}")
+    def closeEvent(self, event):
+        self.previews.close()
+        self.queue.clear()
+        if self.current is not None:
+            self.current.cancel.set()
+        self.thread.quit()
+        self.thread.wait()
+        super().closeEvent(event)
@@ -0,0 +1,79 @@
+import threading
+from dataclasses import dataclass, field
+
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+import fitz
+
+from core.signature_logic import choose_best_plan
+from core.imposition import impose_cut_stack
+from core.output import save_document
+from core.progress import ImpositionCancelled
+
+
+@dataclass
+class ImposeJob:
+    src_path: str
+    out_path: str
+    level: int
+    binding: str
+    save_profile: str
+    # Set from any thread to stop this job at the next signature boundary;
+    # one per job, so a Cancel pressed before the worker picks it up still counts
+    cancel: threading.Event = field(default_factory=threading.Event)
+
+
+class ImposeWorker(QObject):
+    """
+    Runs imposition jobs on a background QThread, one at a time. Log lines go
+    to `sink` (a BatchedSink the window drains on a timer) instead of straight
+    into a widget; everything else is reported through signals.
+    """
+
+    progress = pyqtSignal(int, int)    # signatures done, total
+    finished = pyqtSignal(object)      # job
+    failed = pyqtSignal(object, str)   # job, message
+    cancelled = pyqtSignal(object)     # job
+
+    def __init__(self, sink):
+        super().__init__()
+        self.sink = sink
+
+    @pyqtSlot(object)
+    def run(self, job: ImposeJob):
+        if job.cancel.is_set():
+            self.cancelled.emit(job)
+            return
+        try:
+            src_doc = fitz.open(job.src_path)
+        except Exception as e:
+            self.failed.emit(job, f"Could not open PDF:\n{e}")
+            return
+
+        try:
+            if len(src_doc) == 0:
+                self.failed.emit(job, "The selected PDF has no pages.")
+                return
+
+            self.sink.append(f"\n---- Imposition (Staged Pipeline): {job.src_path} ----")
+            best, _ = choose_best_plan(len(src_doc))
+            out_doc = impose_cut_stack(
+                src_doc, best, self.sink,
+                level=job.level,
+                binding=job.binding,
+                progress=self.progress.emit,
+                cancelled=job.cancel.is_set,
+            )
+            try:
+                if job.cancel.is_set():
+                    raise ImpositionCancelled("cancelled before saving")
+                save_document(out_doc, job.out_path, job.save_profile)
+            finally:
+                out_doc.close()
+        except ImpositionCancelled:
+            self.cancelled.emit(job)
+        except Exception as e:
+            self.failed.emit(job, f"An error occurred:\n{e}")
+        else:
+            self.finished.emit(job)
+        finally:
+            src_doc.close()
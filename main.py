@@ -1,8 +1,12 @@
-from PyQt6.QtWidgets import QApplication
 import sys
-from gui.main_window import App
+
 
 def main():
+    # Qt and the GUI (which imports all of the core) load only when the window
+    # is started; headless use goes through `python -m cli` instead.
+    from PyQt6.QtWidgets import QApplication
+    from gui.main_window import App
+
     app = QApplication(sys.argv)
     w = App()
     w.show()
@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from service.server import DEFAULT_MAX_BODY, DEFAULT_MAX_PENDING, DEFAULT_PORT, ImpositionService
+from utils.logger import LOGGER_NAME, setup_logging
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog='python -m service', description='Local imposition service')
+    p.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: %(default)s)')
+    p.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port (default: %(default)s)')
+    p.add_argument('--unix', metavar='PATH', help='Listen on a Unix socket instead of TCP')
+    p.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                   help='Jobs imposed at the same time (default: all cores)')
+    p.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                   help='Queued plus running jobs before new ones get 503 (default: %(default)s)')
+    p.add_argument('--max-body', type=int, default=DEFAULT_MAX_BODY // 1024 ** 2, metavar='MIB',
+                   help='Largest accepted upload in MiB (default: %(default)s)')
+    p.add_argument('--file-root', metavar='DIR',
+                   help='Let jobs read (?path=) and write (?out=) files inside DIR; off by default')
+    p.add_argument('-v', '--verbose', action='store_true', help='Debug logging')
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    setup_logging(__name__, logging.DEBUG if args.verbose else logging.INFO)
+    if not args.verbose:  # job lifecycle only, not every signature
+        logging.getLogger(LOGGER_NAME).setLevel(logging.WARNING)
+        logging.getLogger(LOGGER_NAME + '.service').setLevel(logging.INFO)
+    service = ImpositionService(workers=args.workers, max_pending=args.max_pending,
+                                max_body=args.max_body * 1024 ** 2, file_root=args.file_root)
+    try:
+        asyncio.run(service.serve_forever(host=args.host, port=args.port, unix_path=args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
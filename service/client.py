@@ -0,0 +1,127 @@
+# service/client.py
+#
+# Minimal client for service.server: one HTTP/1.1 request per connection,
+# over TCP or a Unix socket. `impose()` is the blocking convenience call.
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+from service.server import DEFAULT_PORT
+
+
+@dataclass
+class JobResult:
+    http_status: int
+    report: Dict[str, Any]
+    pdf: Optional[bytes] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.http_status == 200 and self.report.get("status") == "ok"
+
+    @property
+    def status(self) -> str:
+        return self.report.get("status") or self.report.get("error", "unknown")
+
+
+class ServiceBusy(Exception):
+    """The service's queue is full (HTTP 503); retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"imposition service busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ImpositionClient:
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, *,
+                 unix_path: Optional[str] = None, timeout: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.timeout = timeout
+
+    async def _request(self, method: str, path: str, body: bytes = b"") -> Tuple[int, Dict[str, str], bytes]:
+        if self.unix_path:
+            reader, writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n\r\n"
+            writer.write(head.encode("latin-1"))
+            writer.write(body)
+            await writer.drain()
+            return await asyncio.wait_for(self._read_response(reader), self.timeout)
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes]:
+        status = int((await reader.readline()).split()[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return status, headers, body
+
+    async def submit(self, source: Union[bytes, str], *, job_id: Optional[str] = None,
+                     out: Optional[str] = None, **options: Any) -> JobResult:
+        """
+        Impose `source` (PDF bytes, or a file name under the service's file root) with
+        impose_file()-style options (level, binding, sizes, weights,
+        save_profile, dedup, signatures, sheets, sides). Raises ServiceBusy
+        when the service turns the job away.
+        """
+        query: Dict[str, Any] = {}
+        for key, value in options.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ",".join(f"{v[0]}:{v[1]}" if isinstance(v, tuple) else str(v) for v in value)
+            elif isinstance(value, dict):
+                value = ",".join(f"{k}={v}" for k, v in value.items())
+            elif isinstance(value, bool):
+                value = int(value)
+            query[key] = value
+        if isinstance(source, str):
+            query["path"], body = source, b""
+        else:
+            body = source
+        if job_id:
+            query["id"] = job_id
+        if out:
+            query["out"] = out
+        status, headers, payload = await self._request("POST", "/jobs?" + urlencode(query), body)
+        if status == 503:
+            raise ServiceBusy(float(headers.get("retry-after", 1)))
+        if "x-job-report" in headers:
+            report = json.loads(headers["x-job-report"])
+        else:
+            report = json.loads(payload or b"{}")
+        pdf = payload if headers.get("content-type") == "application/pdf" else None
+        return JobResult(status, report, pdf)
+
+    async def status(self, job_id: str) -> Dict[str, Any]:
+        return await self._json("GET", f"/jobs/{job_id}")
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        return await self._json("DELETE", f"/jobs/{job_id}")
+
+    async def health(self) -> Dict[str, Any]:
+        return await self._json("GET", "/health")
+
+    async def _json(self, method: str, path: str) -> Dict[str, Any]:
+        status, _, body = await self._request(method, path)
+        data = json.loads(body or b"{}")
+        data.setdefault("http_status", status)
+        return data
+
+    def impose(self, source: Union[bytes, str], **kwargs: Any) -> JobResult:
+        """Blocking submit() for callers without an event loop."""
+        return asyncio.run(self.submit(source, **kwargs))
@@ -0,0 +1,451 @@
+# service/server.py
+#
+# Long-running local imposition service. Jobs arrive over HTTP/1.1 (TCP or a
+# Unix socket), wait for one of `workers` slots and run impose_file() in a
+# process pool that was started (and has imported fitz) ahead of time.
+#
+#   POST   /jobs?level=2&binding=RTL[&id=…]   body: source PDF  -> imposed PDF
+#   POST   /jobs?path=/in.pdf[&out=/out.pdf]  no body           -> PDF or JSON report
+#   GET    /jobs/<id>                                            -> JSON status
+#   DELETE /jobs/<id>                                            -> cancel
+#   GET    /health                                               -> JSON counters
+#
+# A finished PDF comes back with its report (status, plan, timings, queue
+# wait) JSON-encoded in the X-Job-Report header. Once `max_pending` jobs are
+# queued or running, new ones get 503 with Retry-After; a client that hangs
+# up cancels its job. `path` and `out` name files under the service's
+# `file_root` and are refused (403) when it has none.
+
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from argparse import ArgumentTypeError
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from cli.cli_runner import TARGET_LEVELS, impose_file, parse_weights
+from core.layout import ENGINES
+from core.output import DEFAULT_SAVE_PROFILE, SAVE_PROFILES
+from core.partial import parse_ranges, parse_sides
+from utils.logger import get_logger
+
+logger = get_logger("service")
+
+DEFAULT_PORT = 8765
+# Jobs queued or running before new ones are turned away
+DEFAULT_MAX_PENDING = 32
+# Uploads are held in memory until their job finishes
+DEFAULT_MAX_BODY = 256 * 1024 ** 2
+# How long an upload that was turned away is read and dropped, so that the
+# client sees the response instead of a connection reset
+DISCARD_SECONDS = 5.0
+# Response bodies are written in chunks, waiting for slow readers in between
+WRITE_CHUNK = 256 * 1024
+# Client-chosen job ids are echoed in the X-Job-Id header
+JOB_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed",
+            409: "Conflict", 411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Job:
+    id: str
+    options: Dict[str, Any]
+    state: str = "queued"           # queued, running, ok, error, cancelled
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    report: Optional[Dict[str, Any]] = None
+    cancel_event: Any = None        # multiprocessing.Manager().Event(), polled by the worker
+    waiter: Optional[asyncio.Future] = None  # worker slot acquisition, cancelled to drop a queued job
+
+    def status(self) -> Dict[str, Any]:
+        out = {"id": self.id, "state": self.state, "submitted": self.submitted,
+               "started": self.started, "finished": self.finished}
+        if self.report is not None:
+            out["report"] = self.report
+        return out
+
+
+# -- worker process side ------------------------------------------------------
+
+def _warm_worker() -> None:
+    """Pay MuPDF's start-up once per worker process, before the first job."""
+    import fitz
+
+    fitz.open().new_page()
+
+
+def _run_job(source, out_path: Optional[str], options: Dict[str, Any], name: str,
+             cancel_event) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    buf = io.BytesIO() if out_path is None else None
+    report = impose_file(source, out_path or buf, name=name, cancelled=cancel_event.is_set, **options)
+    return report, (buf.getvalue() if buf is not None and report["status"] == "ok" else None)
+
+
+# -- request parsing ------------------------------------------------------------
+
+def parse_job_options(query: Dict[str, str]) -> Dict[str, Any]:
+    """impose_file() keyword arguments from query parameters; RequestError(400) if invalid."""
+    try:
+        if "target" in query:
+            level = TARGET_LEVELS[query["target"].lower()]
+        else:
+            level = int(query.get("level", 1))
+        if level not in (1, 2, 3, 4):
+            raise ValueError(f"level must be 1-4, got {level}")
+        binding = query.get("binding", "LTR").upper()
+        if binding not in ("LTR", "RTL"):
+            raise ValueError(f"binding must be LTR or RTL, got {binding}")
+        options: Dict[str, Any] = {"level": level, "binding": binding}
+        profile = query.get("save_profile", DEFAULT_SAVE_PROFILE)
+        if profile not in SAVE_PROFILES:
+            raise ValueError(f"unknown save_profile {profile!r}")
+        options["save_profile"] = profile
+        engine = query.get("engine", "list")
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine!r}")
+        options["engine"] = engine
+        if "sizes" in query:
+            options["sizes"] = [int(x) for x in query["sizes"].split(",")]
+        if "weights" in query:
+            options["weights"] = parse_weights(query["weights"])
+        options["dedup"] = query.get("dedup", "0").lower() in ("1", "true", "yes")
+        selection = {}
+        for key, parse in (("signatures", parse_ranges), ("sheets", parse_ranges), ("sides", parse_sides)):
+            if key in query:
+                selection[key] = parse(query[key])
+        if selection:
+            options["selection"] = selection
+    except (KeyError, ValueError, TypeError, ArgumentTypeError) as e:
+        raise RequestError(400, f"bad job options: {e}") from None
+    return options
+
+
+async def _read_head(reader: asyncio.StreamReader):
+    """(method, path, query, headers) of the next request, None at EOF; the body is left unread."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "malformed request line") from None
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    return method.upper(), url.path, query, headers
+
+
+def _content_length(headers: Dict[str, str]) -> int:
+    """The announced body size (0 if none); RequestError(400) if it is not a non-negative integer."""
+    value = headers.get("content-length", "0")
+    try:
+        length = int(value)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise RequestError(400, f"bad Content-Length {value!r}")
+    return length
+
+
+async def _read_body(reader: asyncio.StreamReader, method: str, headers: Dict[str, str], max_body: int) -> bytes:
+    if method not in ("POST", "PUT"):
+        return b""
+    if "content-length" not in headers:
+        raise RequestError(411, "Content-Length required")
+    length = _content_length(headers)
+    if length > max_body:
+        raise RequestError(413, f"body larger than {max_body} bytes")
+    return await reader.readexactly(length) if length else b""
+
+
+async def _discard_body(reader: asyncio.StreamReader, length: int, max_body: int) -> None:
+    """Read and drop an upload that was answered without it, for at most DISCARD_SECONDS."""
+    async def drain(remaining: int) -> None:
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, WRITE_CHUNK))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+
+    try:
+        await asyncio.wait_for(drain(min(length, max_body)), DISCARD_SECONDS)
+    except (ConnectionError, asyncio.TimeoutError):
+        pass
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, body: bytes = b"",
+                   content_type: str = "application/json", headers: Optional[Dict[str, str]] = None) -> None:
+    head = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}",
+            f"Content-Type: {content_type}", f"Content-Length: {len(body)}", "Connection: close"]
+    head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    view = memoryview(body)
+    for i in range(0, len(view), WRITE_CHUNK):
+        writer.write(view[i:i + WRITE_CHUNK])
+        await writer.drain()
+    await writer.drain()
+
+
+def _json(obj) -> bytes:
+    return json.dumps(obj).encode()
+
+
+# -- service ----------------------------------------------------------------------
+
+class ImpositionService:
+    """
+    Accepts imposition jobs over HTTP and runs at most `workers` of them at a
+    time in a warm process pool; jobs beyond that wait in arrival order, up to
+    `max_pending` queued or running in total. Jobs may read and write files
+    by name (`path`, `out`) only inside `file_root`; without one, sources
+    come as request bodies and results go back in the response.
+    """
+
+    def __init__(self, *, workers: Optional[int] = None, max_pending: int = DEFAULT_MAX_PENDING,
+                 max_body: int = DEFAULT_MAX_BODY, keep_finished: int = 256,
+                 file_root: Optional[str] = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.file_root = os.path.realpath(file_root) if file_root else None
+        self.max_pending = max(1, max_pending)
+        self.max_body = max_body
+        self.keep_finished = keep_finished
+        self.jobs: Dict[str, Job] = {}
+        self.completed = 0
+        self.rejected = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.state in ("queued", "running"))
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                    unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._manager = multiprocessing.Manager()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # spawn every worker now rather than on the first jobs
+        await asyncio.gather(*(loop.run_in_executor(self._pool, time.sleep, 0) for _ in range(self.workers)))
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        where = unix_path or "%s:%d" % self._server.sockets[0].getsockname()[:2]
+        logger.info("Imposition service on %s (%d workers, max %d pending)", where, self.workers, self.max_pending)
+        return self._server
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for job in self.jobs.values():
+            if job.state in ("queued", "running"):
+                self._cancel(job)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    async def serve_forever(self, **kwargs) -> None:
+        server = await self.start(**kwargs)
+        try:
+            await server.serve_forever()
+        finally:
+            await self.close()
+
+    # -- connections --------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await _read_head(reader)
+            if head is None:
+                return
+            method, path, query, headers = head
+            if method == "POST" and path.strip("/") == "jobs" and self.pending >= self.max_pending:
+                # turn the job away before buffering its upload
+                length = _content_length(headers)
+                await self._reject_busy(writer)
+                await _discard_body(reader, length, self.max_body)
+                return
+            body = await _read_body(reader, method, headers, self.max_body)
+            await self._route(reader, writer, method, path, query, body)
+        except RequestError as e:
+            await _respond(writer, e.status, _json({"error": str(e)}))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:  # never let one request take the server down
+            logger.exception("Request failed")
+            try:
+                await _respond(writer, 500, _json({"error": f"{type(e).__name__}: {e}"}))
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _route(self, reader, writer, method: str, path: str, query: Dict[str, str], body: bytes) -> None:
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"] and method == "GET":
+            await _respond(writer, 200, _json(self.health()))
+        elif parts == ["jobs"] and method == "POST":
+            await self._submit(reader, writer, query, body)
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                raise RequestError(404, f"no job {parts[1]!r}")
+            if method == "GET":
+                await _respond(writer, 200, _json(job.status()))
+            elif method == "DELETE":
+                if job.state not in ("queued", "running"):
+                    raise RequestError(409, f"job {job.id} already {job.state}")
+                self._cancel(job)
+                await _respond(writer, 202, _json(job.status()))
+            else:
+                raise RequestError(405, f"{method} not allowed")
+        else:
+            raise RequestError(404, f"no route {method} {path}")
+
+    def health(self) -> Dict[str, Any]:
+        states = [job.state for job in list(self.jobs.values())]
+        return {"workers": self.workers, "max_pending": self.max_pending,
+                "queued": states.count("queued"), "running": states.count("running"),
+                "completed": self.completed, "rejected": self.rejected}
+
+    # -- jobs ----------------------------------------------------------------
+
+    def _local_path(self, key: str, name: str) -> str:
+        """`name` resolved inside file_root (relative names are taken from there); RequestError(403) if not."""
+        if self.file_root is None:
+            raise RequestError(403, f"?{key}= is disabled: the service has no file root")
+        path = os.path.realpath(os.path.join(self.file_root, name))
+        if os.path.commonpath([path, self.file_root]) != self.file_root:
+            raise RequestError(403, f"?{key}= must name a file inside the service's file root")
+        return path
+
+    async def _submit(self, reader, writer, query: Dict[str, str], body: bytes) -> None:
+        options = parse_job_options(query)
+        source = self._local_path("path", query["path"]) if query.get("path") else body
+        if not source:
+            raise RequestError(400, "send the source PDF as the body or name it with ?path=")
+        out_path = self._local_path("out", query["out"]) if query.get("out") else None
+        job_id = query.get("id") or uuid.uuid4().hex[:12]
+        if not JOB_ID.fullmatch(job_id):
+            raise RequestError(400, "?id= must be 1-64 letters, digits, '_' or '-'")
+        if job_id in self.jobs and self.jobs[job_id].state in ("queued", "running"):
+            raise RequestError(409, f"job {job_id} is already pending")
+        if self.pending >= self.max_pending:  # filled up while the body was read
+            await self._reject_busy(writer)
+            return
+
+        job = Job(job_id, options, cancel_event=self._manager.Event())
+        self.jobs[job_id] = job
+        hangup = asyncio.ensure_future(self._watch_hangup(reader, writer, job))
+        try:
+            report, pdf = await self._run(job, source, out_path)
+        finally:
+            hangup.cancel()
+            self._forget_old()
+
+        headers = {"X-Job-Id": job.id, "X-Job-Report": json.dumps(report)}
+        if pdf is not None:
+            await _respond(writer, 200, pdf, "application/pdf", headers)
+        else:
+            status = {"ok": 200, "cancelled": 409}.get(report["status"], 500)
+            await _respond(writer, status, _json(report), headers=headers)
+
+    async def _reject_busy(self, writer: asyncio.StreamWriter) -> None:
+        self.rejected += 1
+        await _respond(writer, 503, _json({"error": "queue full", "pending": self.pending}),
+                       headers={"Retry-After": "1"})
+
+    async def _watch_hangup(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, job: Job) -> None:
+        """
+        Cancel `job` once its client is gone: the connection was reset or the
+        transport closed. EOF alone is not enough, since a client may shut
+        down its write side after the request and still wait for the answer.
+        """
+        try:
+            while await reader.read(WRITE_CHUNK):
+                pass  # anything sent after the request is ignored
+        except ConnectionError:
+            pass
+        else:
+            if not writer.transport.is_closing():
+                return
+        if job.state in ("queued", "running"):
+            self._cancel(job)
+
+    async def _run(self, job: Job, source, out_path: Optional[str]):
+        loop = asyncio.get_running_loop()
+        name = source if isinstance(source, str) else f"job {job.id}"
+        job.waiter = asyncio.ensure_future(self._slots.acquire())
+        try:
+            try:
+                await job.waiter
+            except asyncio.CancelledError:
+                if job.state != "cancelled":
+                    raise  # the request itself is being cancelled, not just this job
+            if job.state == "cancelled":
+                # dropped while queued; a running job stops through its cancel event
+                if not job.waiter.cancelled():
+                    self._slots.release()
+                report, pdf = {"status": "cancelled", "error": "cancelled"}, None
+            else:
+                try:
+                    job.state, job.started = "running", time.time()
+                    report, pdf = await loop.run_in_executor(
+                        self._pool, _run_job, source, out_path, job.options, name, job.cancel_event)
+                finally:
+                    self._slots.release()
+        except asyncio.CancelledError:
+            job.cancel_event.set()
+            job.state, job.finished = "cancelled", time.time()
+            raise
+        job.finished = time.time()
+        report["service"] = {
+            "job": job.id,
+            "queued": round((job.started or job.finished) - job.submitted, 6),
+            "run": round(job.finished - job.started, 6) if job.started else 0.0,
+        }
+        job.state, job.report = report["status"], report
+        self.completed += 1
+        logger.info("Job %s %s in %.2fs (%.2fs queued)", job.id, job.state,
+                    job.finished - job.submitted, report["service"]["queued"])
+        return report, pdf
+
+    def _cancel(self, job: Job) -> None:
+        job.cancel_event.set()
+        if job.state == "queued":
+            job.state = "cancelled"
+            if job.waiter is not None:
+                job.waiter.cancel()
+
+    def _forget_old(self) -> None:
+        done = [j for j in self.jobs.values() if j.state not in ("queued", "running")]
+        for job in sorted(done, key=lambda j: j.finished or 0)[:max(0, len(done) - self.keep_finished)]:
+            del self.jobs[job.id]
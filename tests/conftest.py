@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks import synthetic
+
+
+@pytest.fixture
+def make_source():
+    """
+    Factory for numbered sources: make_source(pages, kind="text") is
+    benchmarks.synthetic.make_source, closed again after the test.
+    """
+    docs = []
+
+    def make(pages, kind="text"):
+        doc = synthetic.make_source(pages, kind)
+        docs.append(doc)
+        return doc
+
+    yield make
+    for doc in docs:
+        doc.close()
@@ -0,0 +1,54 @@
+import json
+import os
+
+from benchmarks.run_benchmarks import PROFILES, compare_to_baseline, run
+
+BASELINE = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "baseline.json")
+
+
+def test_tiny_run_covers_every_stage():
+    results = run([8], ["text", "image"], [1, 4], ["LTR"])
+    assert set(results["cases"]) == {"text-8-L1-LTR", "text-8-L4-LTR", "image-8-L1-LTR", "image-8-L4-LTR"}
+    for case in results["cases"].values():
+        assert {"plan", "panel_maps", "placements", "draw", "save", "save_smallest"} <= set(case["stages"])
+        assert case["output_pages"] > 0 and case["output_bytes"] > 0
+        assert 0 < case["source_rss_mb"] <= case["stages"]["draw"]["rss_peak_mb"] <= case["peak_rss_mb"]
+
+
+def test_regressions_respect_threshold_and_noise_floor():
+    def result(draw, plan):
+        return {"cases": {"c": {"stages": {"draw": {"seconds": draw}, "plan": {"seconds": plan}}}}}
+
+    baseline = result(1.0, 0.0001)
+    assert compare_to_baseline(result(1.2, 0.0009), baseline, threshold=0.25) == []
+    regressions = compare_to_baseline(result(1.3, 0.0009), baseline, threshold=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("c draw")
+
+
+def test_rss_regressions_respect_threshold_and_noise_floor():
+    def result(rss):
+        return {"cases": {"c": {"peak_rss_mb": rss, "stages": {"draw": {"seconds": 1.0}}}}}
+
+    baseline = result(100.0)
+    assert compare_to_baseline(result(124.0), baseline) == []
+    assert compare_to_baseline(result(140.0), baseline, min_rss_delta=50) == []
+    regressions = compare_to_baseline(result(140.0), baseline)
+    assert len(regressions) == 1 and regressions[0].startswith("c peak RSS")
+    assert compare_to_baseline(result(140.0), {"cases": {"c": {"stages": {}}}}) == []
+
+
+def test_committed_baseline_covers_the_quick_profile():
+    with open(BASELINE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    assert baseline["meta"]["isolated"]
+    assert len(baseline["cases"]) == len(PROFILES["quick"]) * 2 * 4 * 2
+    assert all(case["peak_rss_mb"] > 0 for case in baseline["cases"].values())
+
+
+def test_arrangement_benchmark_checks_reference():
+    from benchmarks.arrangement import run as run_arrangement
+
+    results = run_arrangement([64], [3, 4], repeat=1)
+    for case in results.values():
+        assert {"reference", "indexed", "panel_maps"} <= set(case)
+        assert case["indexed"]["py_peak_kb"] > 0
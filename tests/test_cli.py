@@ -0,0 +1,58 @@
+import json
+
+import fitz
+import pytest
+
+from cli import cli_runner
+from cli.cli_runner import choose_plan, impose_file, run_cli
+from core.imposition import impose_cut_stack
+
+
+def test_batch_directory_with_report(tmp_path):
+    for n in (12, 40):
+        src = fitz.open()
+        for i in range(n):
+            src.new_page()
+        src.save(str(tmp_path / f"doc{n}.pdf"))
+    report = tmp_path / "report.json"
+
+    rc = run_cli([str(tmp_path), "--level", "4", "--binding", "rtl", "-j", "1",
+                  "--out-dir", str(tmp_path / "out"), "--report", str(report)])
+
+    summary = json.loads(report.read_text())
+    assert rc == 0 and summary["files"] == 2 and summary["failed"] == 0
+    for res in summary["results"]:
+        assert res["status"] == "ok" and res["binding"] == "RTL"
+        assert len(fitz.open(res["output"])) == res["output_pages"] == 2 * res["sheets"]
+        assert {"open", "plan", "impose", "save", "total"} <= set(res["timings"])
+
+
+
+def test_single_input_is_rendered_by_jobs_processes(tmp_path, make_source):
+    src = make_source(400)
+    src.save(str(tmp_path / "in.pdf"))
+    serial = impose_cut_stack(src, choose_plan(len(src), 1), level=1)
+
+    for mode in ([], ["--stream"]):
+        report = tmp_path / "report.json"
+        rc = run_cli([str(tmp_path / "in.pdf"), "--level", "1", "-j", "2", *mode, "-o", str(tmp_path / "out.pdf"),
+                      "--profile", str(tmp_path / "trace.json"), "--report", str(report)])
+        res = json.loads(report.read_text())["results"][0]
+        # worker parts are merged in the parent: the parallel renderer ran
+        assert rc == 0 and "merge_part" in res["profile"]["stages"]
+        out = fitz.open(res["output"])
+        assert len(out) == len(serial) == res["output_pages"]
+        assert [out[p].get_text() for p in (0, 1, len(out) - 1)] == \
+            [serial[p].get_text() for p in (0, 1, len(out) - 1)]
+
+
+@pytest.mark.parametrize("options, status", [
+    ({"cancelled": lambda: True}, "cancelled"),
+    ({"verify": True, "selection": {"sheets": [(1, 1)]}}, "error"),
+])
+def test_source_is_closed_when_a_job_fails(make_source, monkeypatch, options, status):
+    opened = []
+    open_source = cli_runner.open_source
+    monkeypatch.setattr(cli_runner, "open_source", lambda src: opened.append(open_source(src)) or opened[-1])
+    res = impose_file(make_source(40).tobytes(), "unused.pdf", level=2, binding="LTR", **options)
+    assert res["status"] == status and opened[0].is_closed
@@ -0,0 +1,122 @@
+import os
+import random
+import tempfile
+
+import fitz
+
+from benchmarks.synthetic import make_source
+from core.dedup import build_dedup_map, dedupe_placements, fingerprint_pages
+from core.imposition import impose_cut_stack
+from core.layout import build_placement_table
+from core.signature_logic import choose_best_plan
+
+
+def _repeated_source(copies, pages=6):
+    base = make_source(pages, "image")
+    src = fitz.open()
+    for _ in range(copies):
+        src.insert_pdf(base)  # independent objects with identical content
+    return src
+
+
+def test_identical_pages_map_to_first_copy():
+    src = _repeated_source(3)
+    src.new_page().insert_text((72, 72), "different")
+    canonical, report = build_dedup_map(src)
+    assert canonical == list(range(6)) * 3 + [18]
+    assert report.duplicate_pages == 12 and report.unique_pages == 7
+    assert report.bytes_saved > 0
+    fp = fingerprint_pages(src)
+    assert fp[0] == fp[6] and fp[0] != fp[1]
+
+
+def test_dedup_output_is_equivalent_and_smaller():
+    src = _repeated_source(5)
+    plan, _ = choose_best_plan(len(src))
+    log = []
+    plain = impose_cut_stack(src, plan, level=2)
+    deduped = impose_cut_stack(src, plan, log, level=2, dedup=True)
+
+    assert [p.get_text() for p in deduped] == [p.get_text() for p in plain]
+    assert deduped[1].get_pixmap(dpi=20).samples == plain[1].get_pixmap(dpi=20).samples
+    assert len(deduped.tobytes(garbage=1)) < len(plain.tobytes(garbage=1)) / 2
+    assert any("Dedup: 24/30 duplicate pages" in line for line in log)
+
+
+def test_merged_source_is_a_temporary_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    logo = fitz.Pixmap(fitz.csRGB, 32, 32, bytes(range(256)) * 12, False)
+    src = fitz.open()
+    for i in range(8):  # distinct pages, each with its own copy of the same image
+        page = src.new_page()
+        page.insert_image(fitz.Rect(72, 72, 200, 200), pixmap=logo)
+        page.insert_text((72, 300), f"page {i + 1}")
+    plan, _ = choose_best_plan(len(src))
+    table = build_placement_table(plan.sequence, 1)
+    with dedupe_placements(src, table) as (merged, report):
+        assert report.duplicate_resources and merged is not src
+        assert os.path.dirname(merged.name) == str(tmp_path) and len(merged) == len(src)
+    assert merged.is_closed and os.listdir(tmp_path) == []
+
+    # the output stays valid once the merged copy is gone
+    out = impose_cut_stack(src, plan, level=1, dedup=True)
+    plain = impose_cut_stack(src, plan, level=1)
+    assert os.listdir(tmp_path) == []
+    assert fitz.open("pdf", out.tobytes(garbage=1))[0].get_pixmap(dpi=20).samples == \
+        plain[0].get_pixmap(dpi=20).samples
+
+
+def _raw_pages(first, second):
+    """Two pages with the same contents and the given /Resources entries."""
+    form = b"<</Type/XObject/Subtype/Form/BBox[0 0 100 100]/Length 18>>stream\n0 0 m 100 100 l S\nendstream"
+    return fitz.open("pdf", b"""%PDF-1.4
+1 0 obj <</Type/Catalog/Pages 2 0 R>> endobj
+2 0 obj <</Type/Pages/Kids[3 0 R 4 0 R]/Count 2/MediaBox[0 0 300 300]>> endobj
+3 0 obj <</Type/Page/Parent 2 0 R/Contents 7 0 R/Resources<<""" + first + b""">>>> endobj
+4 0 obj <</Type/Page/Parent 2 0 R/Contents 7 0 R/Resources<<""" + second + b""">>>> endobj
+5 1 obj """ + form + b""" endobj
+6 1 obj """ + form.replace(b"100 100 l", b"100 0 l  ") + b""" endobj
+8 2 obj """ + form + b""" endobj
+7 0 obj <</Length 6>>stream
+/X Do
+endstream endobj
+trailer <</Root 1 0 R>>
+%%EOF
+""")
+
+
+def test_references_of_any_generation_are_followed():
+    # identical forms behind references of generation 1 and 2
+    assert build_dedup_map(_raw_pages(b"/XObject<</X 5 1 R>>", b"/XObject<</X 8 2 R>>"))[0] == [0, 0]
+    # different forms
+    assert build_dedup_map(_raw_pages(b"/XObject<</X 5 1 R>>", b"/XObject<</X 6 1 R>>"))[0] == [0, 1]
+    # a string that only looks like a reference is compared as text
+    doc = _raw_pages(b"/XObject<</X 5 1 R>>/Note(5 1 R)", b"/XObject<</X 8 2 R>>/Note(8 2 R)")
+    assert build_dedup_map(doc)[0] == [0, 1]
+
+
+def _image_xrefs(doc):
+    return [x for x in range(1, doc.xref_length()) if doc.xref_get_key(x, "Subtype")[1] == "/Image"]
+
+
+def test_duplicate_image_streams_are_merged():
+    logo = fitz.Pixmap(fitz.csRGB, 96, 96, random.Random(0).randbytes(96 * 96 * 3), False)
+    src = fitz.open()
+    for i in range(8):  # per-page documents: every page brings its own image stream
+        one = fitz.open()
+        page = one.new_page()
+        page.insert_image(fitz.Rect(72, 72, 200, 200), pixmap=logo)
+        page.insert_text((72, 300), f"page {i + 1}")
+        src.insert_pdf(one)
+    assert len(_image_xrefs(src)) == 8
+    plan, _ = choose_best_plan(len(src))
+    table = build_placement_table(plan.sequence, 1)
+    with dedupe_placements(src, table) as (merged, report):
+        assert report.duplicate_resources >= 7  # the images, plus fonts and their descriptors
+        assert len(_image_xrefs(merged)) == 1
+    assert len(_image_xrefs(src)) == 8  # the caller's document is not compacted
+
+    deduped = impose_cut_stack(src, plan, level=1, dedup=True)
+    plain = impose_cut_stack(src, plan, level=1)
+    size = len(deduped.tobytes(garbage=1))
+    assert size < len(plain.tobytes(garbage=1)) - 6 * len(logo.samples)
@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.arrangement import reference_process_2d_array, reference_split_front_back
+from core.geometry import fold_segments, paginate_to_matrix, process_2d_array, split_front_back
+
+
+@pytest.mark.parametrize("level", [1, 2, 3, 4])
+def test_indexed_fold_matches_nested_list_fold(level):
+    for pages in list(range(1, 70)) + [257, 1000]:
+        matrix = paginate_to_matrix(pages, level, counter=5)
+        arranged = process_2d_array(matrix, level)
+        assert arranged == reference_process_2d_array(matrix, level)
+        assert split_front_back(arranged) == reference_split_front_back(arranged)
+
+
+def test_fold_of_one_row_describes_the_matrix():
+    assert fold_segments(8, 3) == ((2, 0), (6, 4), (3, 1), (7, 5))
+    matrix = [list("abcdefgh"), list("ijklmnop")]
+    assert process_2d_array(matrix, 3) == reference_process_2d_array(matrix, 3)
+    assert process_2d_array([], 2) == []
+    with pytest.raises(ValueError):
+        process_2d_array([[1, 2, 3, 4], [5, 6]], 2)
@@ -0,0 +1,29 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.geometry import paginate_to_matrix, process_2d_array
+from core.geometry_np import cross_check, process_2d_array_np
+from core.layout import build_placement_table, padded_signature_pages
+
+
+@pytest.mark.parametrize("level", [1, 2, 3, 4])
+def test_numpy_engine_matches_list_engine(level):
+    sequence = [32, 28, 24, 20, 16, 32]
+    padded = [padded_signature_pages(n, level) for n in sequence]
+    assert cross_check(padded, level)
+
+    for binding in ("LTR", "RTL"):
+        ref = build_placement_table(sequence, level, binding)
+        vec = build_placement_table(sequence, level, binding, engine="numpy")
+        assert list(vec) == list(ref)
+
+
+def test_process_2d_array_np_keeps_none_padding():
+    matrix = paginate_to_matrix(13, 3)
+    assert process_2d_array_np(matrix, 3) == process_2d_array(matrix, 3)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        build_placement_table([16], 2, engine="fortran")
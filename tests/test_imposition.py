@@ -1,3 +1,60 @@
+import logging
+
+from core.geometry import panels_per_side
+from core.imposition import draw_booklet_signatures_by_global_panels, impose_cut_stack
+from core.layout import BLANK, build_placement_table, padded_signature_pages
+from core.signature_logic import choose_best_plan
+
+
 # Basic smoke test placeholders - requires sample PDF to fully test
 def test_placeholder():
     assert True
+
+
+def test_placement_table_covers_every_page_once():
+    sequence = [32, 32, 32]
+    for level in (1, 2, 3, 4):
+        for binding in ("LTR", "RTL"):
+            table = build_placement_table(sequence, level, binding)
+            srcs = [s for _, _, s, _ in table if s != BLANK]
+            assert sorted(srcs) == list(range(sum(sequence)))
+            padded = sum(padded_signature_pages(n, level) for n in sequence)
+            assert len(table) == padded
+            assert table.page_count == padded // panels_per_side(level)
+
+
+def test_signature_layouts_are_shared_and_offset():
+    table = build_placement_table([32, 32], 3, "LTR")
+    first, second = table.signatures
+    assert first.layout is second.layout
+    assert [(p + 4, b, s + 32, r) for p, b, s, r in first] == list(second)
+
+
+def test_level1_booklet_sheet():
+    # 4 pages, one sheet: front carries 1 and 4, back carries 2 and 3
+    table = build_placement_table([4], 1, "LTR")
+    assert [(p, b, s) for p, b, s, _ in table] == [(0, 0, 0), (0, 1, 3), (1, 0, 1), (1, 1, 2)]
+
+
+def test_debug_payloads_only_reach_debug_sinks(make_source):
+    src = make_source(20)
+    plan, _ = choose_best_plan(len(src))
+
+    info_log, debug_log = [], []
+    impose_cut_stack(src, plan, info_log, level=3)
+    impose_cut_stack(src, plan, debug_log, level=3, log_level=logging.DEBUG)
+    assert info_log and not any(line.startswith("[DEBUG]") for line in info_log)
+    assert any("arranged" in line for line in debug_log)
+    # still accepted for existing callers
+    out = impose_cut_stack(src, plan, level=3, emit_blank_tail_signature=True)
+    assert len(out) == len(impose_cut_stack(src, plan, level=3))
+
+
+def test_parallel_render_matches_serial(make_source):
+    src = make_source(64)
+    table = build_placement_table([32, 20, 12], 2, "RTL")
+
+    serial = draw_booklet_signatures_by_global_panels(src, table)
+    parallel = draw_booklet_signatures_by_global_panels(src, table, workers=2, min_parallel_pages=0)
+    assert len(parallel) == len(serial) == table.page_count
+    assert [p.get_text() for p in parallel] == [p.get_text() for p in serial]
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+
+import fitz
+
+from cli.cli_runner import run_cli
+from core.imposition import impose_cut_stack
+from core.incremental import ImpositionCache
+from core.signature_logic import plan_signatures
+
+
+def _source(make_source, n, marks=()):
+    src = make_source(n)
+    for i in marks:
+        src[i].insert_text((72, 200), "corrected", fontsize=40)
+    return fitz.open("pdf", src.tobytes())
+
+
+def test_hit_incremental_and_full(tmp_path, make_source):
+    cache = ImpositionCache(str(tmp_path / "cache"))
+    plan = plan_signatures(96, (32,), level=2)
+    out = str(tmp_path / "out.pdf")
+
+    assert cache.impose(_source(make_source, 96), plan, out, level=2).status == "full"
+    assert cache.impose(_source(make_source, 96), plan, out, level=2).status == "hit"
+
+    changed = _source(make_source, 96, marks={4, 50})
+    res = cache.impose(changed, plan, out, level=2)
+    assert res.status == "incremental" and res.changed_pages == [5, 51]
+    assert len(res.redrawn_sides) == 2
+    expected = impose_cut_stack(changed, plan, level=2)
+    got = fitz.open(out)
+    assert [p.get_text() for p in got] == [p.get_text() for p in expected]
+
+    # a different binding is a different layout: no reuse
+    assert cache.impose(changed, plan, out, level=2, binding="RTL").status == "full"
+    # too many changes: impose in full
+    assert cache.impose(_source(make_source, 96, marks=range(96)), plan, out, level=2).status == "full"
+
+
+def test_eviction_by_size(tmp_path, make_source):
+    cache = ImpositionCache(str(tmp_path / "cache"))
+    plan = plan_signatures(32, (32,))
+    for k in range(3):
+        cache.impose(_source(make_source, 32, marks={k}), plan, str(tmp_path / "o.pdf"))
+    one = cache.size() // 3
+    cache.max_bytes = int(one * 1.5)
+    cache.evict()
+    assert len(cache._all_entries()) == 1
+    # the most recent entry is the one kept
+    assert cache.impose(_source(make_source, 32, marks={2}), plan, str(tmp_path / "o.pdf")).status == "hit"
+
+
+def test_cli_cache(tmp_path, make_source):
+    _source(make_source, 40).save(str(tmp_path / "a.pdf"))
+    args = [str(tmp_path / "a.pdf"), "--level", "3", "-j", "1", "--out-dir", str(tmp_path / "out"),
+            "--cache-dir", str(tmp_path / "cache"), "--report", str(tmp_path / "r.json")]
+    assert run_cli(args) == 0 and run_cli(args) == 0
+    res = json.loads((tmp_path / "r.json").read_text())["results"][0]
+    assert res["incremental"]["status"] == "hit"
+    assert len(fitz.open(res["output"])) == res["output_pages"]
+
+
+def test_dedup_outputs_are_cached_separately(tmp_path, make_source):
+    cache = ImpositionCache(str(tmp_path / "cache"))
+    plan = plan_signatures(64, (32,), level=2)
+    out = str(tmp_path / "out.pdf")
+    assert cache.impose(_source(make_source, 64), plan, out, level=2).status == "full"
+    # a plain entry never answers a --dedup job, and vice versa
+    assert cache.impose(_source(make_source, 64), plan, out, level=2, dedup=True).status == "full"
+    assert cache.impose(_source(make_source, 64), plan, out, level=2, dedup=True).status == "hit"
+    assert cache.impose(_source(make_source, 64), plan, out, level=2).status == "hit"
+    # redrawn sides could not share the merged objects: a changed source is imposed in full
+    assert cache.impose(_source(make_source, 64, marks={5}), plan, out, level=2, dedup=True).status == "full"
+    assert cache.impose(_source(make_source, 64, marks={6}), plan, out, level=2).status == "incremental"
+
+
+def test_concurrent_stores_of_one_entry(tmp_path, make_source):
+    cache = ImpositionCache(str(tmp_path / "cache"))
+    entry = str(tmp_path / "cache" / "layout" / "entry")
+    outputs = []
+    for k in range(4):
+        outputs.append(str(tmp_path / f"out{k}.pdf"))
+        make_source(8 * (k + 1)).save(outputs[-1])
+    barrier = threading.Barrier(len(outputs))
+    errors = []
+
+    def store(k):
+        barrier.wait()
+        try:
+            for _ in range(5):
+                cache._store(entry, outputs[k], [bytes([k])] * 8 * (k + 1), 8 * (k + 1))
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store, args=(k,)) for k in range(len(outputs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert sorted(os.listdir(os.path.dirname(entry))) == ["entry.json", "entry.pdf"]
+    manifest = json.loads(open(entry + ".json").read())
+    assert len(manifest["fingerprints"]) == manifest["pages"]
+    assert len(fitz.open(entry + ".pdf")) in (8, 16, 24, 32)
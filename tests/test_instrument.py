@@ -0,0 +1,73 @@
+import json
+
+import fitz
+
+from cli.cli_runner import run_cli
+from core.imposition import impose_cut_stack
+from core.instrument import Recorder, record_to, stage, to_chrome_trace
+from core.output import save_document
+from core.signature_logic import plan_signatures
+
+
+def test_stages_and_counters(tmp_path):
+    src = fitz.open()
+    for _ in range(30):
+        src.new_page()
+    plan = plan_signatures(len(src), (16,))
+    rec = Recorder("t", memory=True)
+    with record_to(rec):
+        out = impose_cut_stack(src, plan, level=1)
+        save_document(out, str(tmp_path / "o.pdf"))
+
+    stages = rec.stage_totals()
+    assert {"placements", "draw", "draw_signature", "save"} <= set(stages)
+    assert stages["draw_signature"]["calls"] == 2
+    assert stages["draw"]["py_peak_kb"] >= stages["draw_signature"]["py_peak_kb"]
+    assert rec.counters["show_pdf_page"] == 30
+    assert rec.counters["blank_panels"] == 2
+    assert rec.counters["output_pages"] == len(out) == 16
+
+    # nothing is recorded outside record_to
+    with stage("ignored"):
+        impose_cut_stack(src, plan, level=1)
+    assert "ignored" not in rec.stage_totals() and rec.counters["show_pdf_page"] == 30
+
+
+def test_cli_profile_writes_chrome_trace(tmp_path):
+    src = fitz.open()
+    for _ in range(20):
+        src.new_page()
+    src.save(str(tmp_path / "a.pdf"))
+    trace, report = tmp_path / "trace.json", tmp_path / "report.json"
+
+    rc = run_cli([str(tmp_path / "a.pdf"), "--level", "2", "-j", "1", "--out-dir", str(tmp_path / "out"),
+                  "--profile", str(trace), "--report", str(report)])
+
+    assert rc == 0
+    events = json.loads(trace.read_text())["traceEvents"]
+    names = {e["name"] for e in events if e["ph"] == "X"}
+    assert {"job", "open", "plan", "placements", "draw", "save"} <= names
+    assert all(e["dur"] >= 0 and e["ts"] >= 0 for e in events if e["ph"] == "X")
+    res = json.loads(report.read_text())["results"][0]
+    assert res["profile"]["counters"]["output_pages"] == res["output_pages"] and "trace" not in res
+
+
+def test_chrome_trace_of_empty_recorder():
+    assert to_chrome_trace([Recorder("x").to_dict()])["traceEvents"][0]["ph"] == "M"
+
+
+def test_rss_growth_is_per_span():
+    rec = Recorder("rss")
+    with record_to(rec):
+        with stage("grow"):
+            block = b"x" * (64 * 1024 * 1024)
+        del block
+        with stage("reuse"):
+            block = b"x" * (16 * 1024 * 1024)
+            assert len(block) == 16 * 1024 * 1024
+    grow, reuse = sorted(rec.spans, key=lambda s: s.start)
+    if grow.process_rss_peak_kb is None:  # no resource module
+        return
+    assert grow.rss_peak_growth_kb > 32 * 1024
+    # the second span stays under the first one's peak: same process peak, no growth
+    assert reuse.process_rss_peak_kb == grow.process_rss_peak_kb and reuse.rss_peak_growth_kb == 0
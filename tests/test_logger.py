@@ -0,0 +1,39 @@
+import logging
+import threading
+
+from utils.logger import LOGGER_NAME, get_logger, log_to
+
+logger = get_logger("test")
+
+
+def test_log_to_only_collects_its_own_job():
+    barrier = threading.Barrier(2)
+    sinks = {}
+
+    def job(name):
+        sink = sinks[name] = []
+        with log_to(sink):
+            barrier.wait()
+            for i in range(50):
+                logger.info("%s %d", name, i)
+            barrier.wait()
+
+    threads = [threading.Thread(target=job, args=(name,)) for name in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for name, lines in sinks.items():
+        assert len(lines) == 50 and all(line.startswith(f"[INFO] {name} ") for line in lines)
+
+
+def test_log_to_restores_the_root_level():
+    root = logging.getLogger(LOGGER_NAME)
+    before = root.level
+    outer, inner = [], []
+    with log_to(outer, logging.INFO):
+        with log_to(inner, logging.DEBUG):
+            logger.debug("detail")
+        logger.info("summary")
+    assert root.level == before
+    assert inner == ["[DEBUG] detail"] and outer == ["[INFO] summary"]
@@ -0,0 +1,63 @@
+import pytest
+
+from core.geometry import (
+    back_pairs, front_pairs, paginate_to_matrix, panel_to_sheet_side, process_2d_array, split_front_back,
+)
+from core.layout import BLANK
+from core.lookup import PlacementIndex
+
+
+def _reference_page_to_panel(sequence, level):
+    """global page -> global panel, straight from process_2d_array and the pairs."""
+    out, page_offset, panel_offset = {}, 0, 0
+    for size in sequence:
+        arranged = process_2d_array(paginate_to_matrix(size, level, counter=panel_offset + 1), level)
+        fronts, backs = split_front_back(arranged)
+        for rows, pairs in ((fronts, front_pairs(fronts, level, size)), (backs, back_pairs(backs, level, size))):
+            for panels, pages in zip(rows, pairs):
+                for panel, page in zip(panels, pages):
+                    out[page_offset + page] = panel
+        page_offset += size
+        panel_offset += size
+    return out
+
+
+@pytest.mark.parametrize("level", [1, 2, 3, 4])
+@pytest.mark.parametrize("binding", ["LTR", "RTL"])
+def test_locate_agrees_with_panel_to_sheet_side(level, binding):
+    sequence = [32, 64, 32]
+    index = PlacementIndex.from_sequence(sequence, level, binding)
+    for page, panel in _reference_page_to_panel(sequence, level).items():
+        slot = index.locate(page)
+        sheet, side, _ = panel_to_sheet_side(panel, level, binding=binding)
+        assert (slot.sheet, slot.side) == (sheet, side)
+        assert index.page_at(slot.sheet, slot.side, slot.box) == page
+
+
+def test_lookup_matches_placement_table():
+    index = PlacementIndex.from_sequence([32, 16, 32], 3, "RTL", source_pages=75)
+    for out_page, box, src, rot in index.table:
+        sheet, side = out_page // 2 + 1, ("front", "back")[out_page % 2]
+        expected = None if src == BLANK or src >= 75 else src + 1
+        assert index.page_at(sheet, side, box) == expected
+        if expected is not None:
+            slot = index.locate(expected)
+            assert (slot.output_page, slot.box, slot.rotation) == (out_page, box, rot)
+    with pytest.raises(IndexError):
+        index.locate(76)
+
+
+def test_runs_of_signatures_match_the_table():
+    sequence = [32] * 40 + [16] * 3 + [32, 8]
+    index = PlacementIndex.from_sequence(sequence, 2, source_pages=sum(sequence) - 5)
+    table = index.table
+    assert (index.signature_count, index.sheet_count) == (len(table.signatures), table.sheet_count)
+    for i, sig in enumerate(table.signatures, start=1):
+        sheets = index.signature_sheets(i)
+        assert (sheets.start - 1, len(sheets)) == (sig.page_offset // 2, sig.layout.sheets)
+    placed = {src + 1: (out_page, box, rot) for out_page, box, src, rot in table
+              if src != BLANK and src < index.source_pages}
+    for page in range(1, index.source_pages + 1, 7):
+        slot = index.locate(page)
+        assert (slot.output_page, slot.box, slot.rotation) == placed[page]
+        assert index.page_at(slot.sheet, slot.side, slot.box) == page
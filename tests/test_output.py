@@ -0,0 +1,32 @@
+import fitz
+import pytest
+
+from core.imposition import impose_cut_stack
+from core.output import SAVE_PROFILES, impose_to_file, save_document
+from core.signature_logic import choose_best_plan
+
+
+def test_streamed_output_matches_in_memory(make_source, tmp_path):
+    src = make_source(90)
+    plan, _ = choose_best_plan(len(src))
+    path = tmp_path / "out.pdf"
+
+    written = impose_to_file(src, plan, str(path), level=2, binding="RTL", chunk_sheets=3)
+    expected = impose_cut_stack(src, plan, level=2, binding="RTL")
+
+    streamed = fitz.open(str(path))
+    assert written == len(streamed) == len(expected)
+    assert [p.get_text() for p in streamed] == [p.get_text() for p in expected]
+
+
+def test_save_profiles_produce_equivalent_documents(make_source, tmp_path):
+    src = make_source(40)
+    plan, _ = choose_best_plan(len(src))
+    out = impose_cut_stack(src, plan, level=3)
+    texts = [p.get_text() for p in out]
+    for profile in SAVE_PROFILES:
+        path = tmp_path / f"{profile}.pdf"
+        save_document(out, str(path), profile)
+        assert [p.get_text() for p in fitz.open(str(path))] == texts
+    with pytest.raises(ValueError):
+        save_document(out, str(tmp_path / "x.pdf"), "tiny")
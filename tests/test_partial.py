@@ -0,0 +1,41 @@
+import fitz
+import pytest
+
+from cli.cli_runner import run_cli
+from core.imposition import impose_cut_stack
+from core.partial import impose_partial, parse_ranges, parse_sides
+from core.signature_logic import plan_signatures
+
+
+@pytest.mark.parametrize("level", [1, 2, 3, 4])
+def test_partial_pages_match_full_run(make_source, level):
+    src = make_source(160)
+    plan = plan_signatures(len(src), (32,), level=level)
+    full = impose_cut_stack(src, plan, level=level, binding="RTL")
+    sheets = len(full) // 2
+
+    out, refs = impose_partial(src, plan, level=level, binding="RTL",
+                               signatures=[2], sheets=[sheets], sides=[(1, "back")])
+    assert refs[0] == (1, "back") and refs[-1] == (sheets, "back")
+    assert len(out) == len(refs) == len(set(refs))
+    for page, (sheet, side) in zip(out, refs):
+        expected = full[2 * (sheet - 1) + (side == "back")]
+        assert page.get_pixmap(dpi=20).samples == expected.get_pixmap(dpi=20).samples
+
+
+def test_selection_parsing_and_bounds(make_source):
+    assert parse_ranges("3,7-9") == [3, 7, 8, 9]
+    assert parse_sides("37:front,38:b") == [(37, "front"), (38, "back")]
+    with pytest.raises(ValueError):
+        parse_sides("37")
+    src = make_source(16)
+    with pytest.raises(IndexError):
+        impose_partial(src, plan_signatures(16, (16,)), level=1, sheets=[5])
+
+
+def test_cli_partial(make_source, tmp_path):
+    make_source(64).save(str(tmp_path / "a.pdf"))
+    rc = run_cli([str(tmp_path / "a.pdf"), "--level", "2", "--sheets", "2", "--sides", "1:front",
+                  "-j", "1", "--out-dir", str(tmp_path)])
+    assert rc == 0
+    assert len(fitz.open(str(tmp_path / "a_A6_booklet_partial.pdf"))) == 3
@@ -0,0 +1,69 @@
+import io
+import sys
+
+import fitz
+import pytest
+
+from cli.cli_runner import impose_file, run_cli
+from core.imposition import impose_cut_stack
+from core.output import impose_to_file, save_document
+from core.pdfio import open_source
+from core.signature_logic import choose_best_plan
+
+
+class _Pipe(io.RawIOBase):
+    """Unseekable sink, like stdout piped to another process."""
+
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+    def tell(self):
+        raise io.UnsupportedOperation("tell")
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview, io.BytesIO, io.BufferedReader])
+def test_open_source_from_memory(make_source, wrap):
+    data = make_source(5).tobytes()
+    src = io.BufferedReader(io.BytesIO(data)) if wrap is io.BufferedReader else wrap(data)
+    assert len(open_source(src)) == 5
+
+
+def test_open_source_rejects_empty_input():
+    with pytest.raises(ValueError):
+        open_source(b"")
+
+
+def test_save_to_streams(make_source):
+    out = impose_cut_stack(open_source(make_source(16).tobytes()), choose_best_plan(16)[0], level=1)
+    buf, pipe = io.BytesIO(), _Pipe()
+    save_document(out, buf)
+    save_document(out, pipe)
+    assert len(fitz.open("pdf", buf.getvalue())) == len(fitz.open("pdf", bytes(pipe.data))) == len(out)
+    with pytest.raises(TypeError):
+        impose_to_file(open_source(make_source(16).tobytes()), choose_best_plan(16)[0], io.BytesIO())
+
+
+def test_impose_file_bytes_to_stream(make_source):
+    buf = io.BytesIO()
+    res = impose_file(make_source(32).tobytes(), buf, level=2, binding="LTR", name="job-7")
+    assert res["status"] == "ok" and res["source"] == "job-7"
+    assert res["output_bytes"] == len(buf.getvalue())
+    assert len(fitz.open("pdf", buf.getvalue())) == res["output_pages"]
+
+
+def test_cli_stdin_to_stdout(make_source, monkeypatch, tmp_path):
+    stdout = io.BytesIO()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(make_source(20).tobytes())))
+    monkeypatch.setattr(sys, "stdout", io.TextIOWrapper(stdout))
+    assert run_cli(["-", "--level", "2", "-j", "1"]) == 0
+    assert len(fitz.open("pdf", stdout.getvalue())) == 6
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,117 @@
+import fitz
+import pytest
+
+from core.geometry import a4_rect_portrait, grid_boxes
+from core.imposition import impose_cut_stack
+from core.instrument import Recorder, record_to
+from core import prescan
+from core.prescan import PagePlacer, SourceScan
+from core.signature_logic import plan_signatures
+
+
+def _mixed_source(n):
+    """Pages of four sizes, some rotated, some with a crop box."""
+    src = fitz.open()
+    sizes = [fitz.paper_size("a4"), fitz.paper_size("letter"), fitz.paper_size("a4-l"), (300, 500)]
+    for i in range(n):
+        w, h = sizes[i % 4]
+        page = src.new_page(width=w, height=h)
+        page.insert_text((30, 60), f"P{i + 1}", fontsize=30)
+        page.draw_rect(fitz.Rect(10, 10, w - 10, h - 10), color=(1, 0, 0), width=3)
+        if i % 5 == 0:
+            page.set_rotation(90 * (i // 5 % 4))
+        if i % 7 == 0:
+            page.set_cropbox(fitz.Rect(20, 30, w - 40, h - 10))
+    return fitz.open("pdf", src.tobytes())
+
+
+def test_size_classes_follow_page_boxes():
+    src = _mixed_source(40)
+    scan = SourceScan(src).scan_all()
+    for pno, page in enumerate(src):
+        cls = scan.classes[scan.class_of(pno)]
+        assert cls.rotation == page.rotation
+        assert fitz.Rect(cls.mediabox) == page.mediabox
+        assert fitz.Rect(cls.cropbox).width == page.cropbox.width  # page.cropbox is y-flipped
+        assert cls.size == (page.rect.width, page.rect.height)
+    assert sum(scan.counts().values()) == len(src)
+    assert len(scan.classes) < len(src)
+    assert "595x842pt x" in scan.summary()
+
+
+def test_uniform_source_is_one_class():
+    src = fitz.open()
+    for _ in range(12):
+        src.new_page()
+    scan = SourceScan(src).scan_all()
+    assert len(scan.classes) == 1
+    assert scan.summary() == "595x842pt x12"
+
+
+def test_references_with_any_generation():
+    raw = b"""%PDF-1.4
+1 0 obj <</Type/Catalog/Pages 2 0 R>> endobj
+2 0 obj <</Type/Pages/Kids[3 0 R]/Count 1/MediaBox 4 2 R>> endobj
+3 0 obj <</Type/Page/Parent 2 0 R/Rotate 5 1 R>> endobj
+4 2 obj [0 0 300 500] endobj
+5 1 obj 90 endobj
+trailer <</Root 1 0 R>>
+%%EOF
+"""
+    src = fitz.open("pdf", raw)
+    scan = SourceScan(src)
+    cls = scan.classes[scan.class_of(0)]
+    assert cls.mediabox == (0, 0, 300, 500) and cls.rotation == 90 == src[0].rotation
+
+
+def test_fast_path_needs_a_known_version(monkeypatch):
+    assert prescan.fast_path_supported()  # the installed PyMuPDF is in range
+    monkeypatch.setattr(prescan, "FAST_PATH_VERSIONS", ((0, 0, 0), (1, 0, 0)))
+    assert not prescan.fast_path_supported.__wrapped__()
+
+
+@pytest.mark.parametrize("supported", [True, False])
+def test_placer_matches_show_pdf_page(monkeypatch, supported):
+    monkeypatch.setattr(prescan, "fast_path_supported", lambda: supported)
+    src = _mixed_source(24)
+    boxes = grid_boxes(a4_rect_portrait(), 2, 2)
+    rect = a4_rect_portrait()
+    fast, slow = fitz.open(), fitz.open()
+    placer = PagePlacer(src, boxes)
+    assert placer._fast == supported
+    for pno in range(len(src)):
+        box, rot = pno % 4, 180 * (pno % 2)
+        if box == 0:
+            fast.new_page(width=rect.width, height=rect.height)
+            slow.new_page(width=rect.width, height=rect.height)
+        placer.place(fast[-1], box, pno, rot)
+        slow[-1].show_pdf_page(boxes[box], src, pno, rotate=rot)
+    for a, b in zip(fast, slow):
+        assert a.get_pixmap(dpi=30).samples == b.get_pixmap(dpi=30).samples
+
+
+def test_placer_keeps_existing_xobjects():
+    src = _mixed_source(4)
+    boxes = grid_boxes(a4_rect_portrait(), 2, 2)
+    rect = a4_rect_portrait()
+    fast, slow = fitz.open(), fitz.open()
+    for doc in (fast, slow):
+        doc.new_page(width=rect.width, height=rect.height).show_pdf_page(boxes[0], src, 0)
+    placer = PagePlacer(src, boxes)
+    for pno in range(1, 4):
+        placer.place(fast[0], pno, pno)
+        slow[0].show_pdf_page(boxes[pno], src, pno)
+    # page-level names only; each form also holds its own 'fullpage'
+    names = [x[1] for x in fast.get_page_xobjects(0) if x[2] == 0]
+    assert sorted(names) == ["fzFrm0", "fzFrm1", "fzFrm2", "fzFrm3"]
+    assert fast[0].get_pixmap(dpi=30).samples == slow[0].get_pixmap(dpi=30).samples
+
+
+def test_plan_records_prescan():
+    src = _mixed_source(32)
+    rec = Recorder()
+    with record_to(rec):
+        out = impose_cut_stack(src, plan_signatures(len(src), (16,), level=2), level=2)
+    assert len(out) > 0
+    assert "prescan" in rec.stage_totals()
+    assert rec.counters["size_classes"] == len(SourceScan(src).scan_all().classes)
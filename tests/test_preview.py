@@ -0,0 +1,90 @@
+from core.imposition import impose_cut_stack
+from core.preview import PixmapCache, PreviewProcess, SheetPreviewer
+from core.signature_logic import choose_best_plan, plan_signatures
+
+
+def test_preview_matches_imposed_sheet(make_source):
+    src = make_source(48)
+    plan = plan_signatures(len(src), (16,))
+    out = impose_cut_stack(src, plan, level=2, binding="RTL")
+    pv = SheetPreviewer(src, plan, 2, "RTL")
+    try:
+        assert pv.sheet_count == len(out) // 2
+        for sheet in (1, 2, pv.sheet_count):
+            for i, side in enumerate(("front", "back")):
+                expected = out[2 * (sheet - 1) + i].get_pixmap(dpi=30).samples
+                assert pv.submit(sheet, side, dpi=30).result().samples == expected
+    finally:
+        pv.close()
+
+
+def test_cache_is_lru_and_bounded_by_bytes(make_source):
+    src = make_source(16)
+    plan = plan_signatures(len(src), (16,))
+    side_bytes = len(SheetPreviewer(src, plan, 1).render(1, dpi=20).samples)
+    cache = PixmapCache(max_bytes=3 * side_bytes)
+    pv = SheetPreviewer(src, plan, 1, cache=cache)
+
+    first = pv.render(1, "front", dpi=20)
+    assert pv.render(1, "front", dpi=20) is first and cache.hits == 1
+    pv.render(1, "back", dpi=20)
+    pv.render(2, "front", dpi=20)
+    pv.render(1, "front", dpi=20)  # refresh: sheet 1 back is now the oldest
+    pv.render(2, "back", dpi=20)
+    assert len(cache) == 3 and cache.nbytes <= cache.max_bytes
+    assert pv.key(1, "back", 20) not in cache and pv.key(1, "front", 20) in cache
+    pv.close()
+
+
+def test_preview_process_renders_like_in_process(make_source, tmp_path):
+    src = make_source(40)
+    src.save(str(tmp_path / "in.pdf"))
+    plan, _ = choose_best_plan(len(src))
+    local = SheetPreviewer(src, plan, 2, "RTL")
+    previews = PreviewProcess()
+    try:
+        assert previews.load(str(tmp_path / "in.pdf"), 2, "RTL").result(timeout=60) == \
+            (local.sheet_count, plan.expression)
+        previews.prefetch(1, dpi=20)
+        side = previews.render(2, "back", dpi=20).result(timeout=60)
+        expected = local.render(2, "back", dpi=20)
+        assert (side.width, side.height, side.stride) == (expected.width, expected.height, expected.stride)
+        assert side.samples == expected.samples
+
+        # the file edited in place, same page count: reopening must not serve old pixmaps
+        edited = make_source(len(src), "image")
+        edited.save(str(tmp_path / "in.pdf"))
+        previews.load(str(tmp_path / "in.pdf"), 2, "RTL", reopen=True).result(timeout=60)
+        side = previews.render(2, "back", dpi=20).result(timeout=60)
+        fresh = SheetPreviewer(edited, plan, 2, "RTL")
+        try:
+            assert side.samples == fresh.render(2, "back", dpi=20).samples != expected.samples
+        finally:
+            fresh.close()
+    finally:
+        previews.close()
+        local.close()
+
+
+def test_preview_process_serves_only_the_newest_render(make_source, tmp_path):
+    src = make_source(80)
+    src.save(str(tmp_path / "in.pdf"))
+    previews = PreviewProcess()
+    try:
+        n, _ = previews.load(str(tmp_path / "in.pdf"), 1).result(timeout=60)
+        renders, prefetches = [], []
+        for sheet in range(1, n + 1):  # scrubbing through the sheets
+            renders.append(previews.render(sheet, dpi=20))
+            prefetches.append(previews.prefetch(sheet, dpi=20))
+        # no second prefetch is queued while one is pending for the same render
+        assert previews.prefetch(n, dpi=20) is prefetches[-1]
+
+        side = renders[-1].result(timeout=60)
+        assert (side.width, side.height) == (166, 234)
+        # at most the render already running when scrubbing began was served
+        assert sum(not f.cancelled() for f in renders[:-1]) <= 1
+        assert all(f.cancelled() for f in renders[2:-1])
+        # stale prefetches were dropped, or stopped before the newest render ran
+        assert all(f.done() for f in prefetches[:-1])
+    finally:
+        previews.close()
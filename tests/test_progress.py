@@ -0,0 +1,48 @@
+import threading
+
+import fitz
+import pytest
+
+from core.imposition import impose_cut_stack
+from core.output import impose_to_file
+from core.progress import ImpositionCancelled
+from core.signature_logic import plan_signatures
+from utils.logger import BatchedSink
+
+
+def test_progress_reports_every_signature(make_source):
+    src = make_source(64)
+    plan = plan_signatures(len(src), (16,))
+    seen = []
+    impose_cut_stack(src, plan, level=1, progress=lambda done, total: seen.append((done, total)))
+    assert seen == [(i, 4) for i in range(1, 5)]
+
+
+def test_cancel_stops_between_signatures(make_source, tmp_path):
+    src = make_source(64)
+    plan = plan_signatures(len(src), (16,))
+    seen = []
+    with pytest.raises(ImpositionCancelled):
+        impose_cut_stack(src, plan, level=1, progress=lambda done, total: seen.append(done),
+                         cancelled=lambda: len(seen) >= 2)
+    assert seen == [1, 2]
+
+    # streaming keeps what was flushed before the cancel as a valid file
+    path = tmp_path / "partial.pdf"
+    seen.clear()
+    with pytest.raises(ImpositionCancelled):
+        impose_to_file(src, plan, str(path), level=1, chunk_sheets=4,
+                       progress=lambda done, total: seen.append(done), cancelled=lambda: len(seen) >= 3)
+    assert len(fitz.open(str(path))) == 3 * 8  # 3 signatures of 4 sheets flushed
+
+
+def test_batched_sink_collects_across_threads():
+    sink = BatchedSink(max_lines=150)
+    threads = [threading.Thread(target=lambda: [sink.append("x") for _ in range(50)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lines = sink.drain()
+    assert lines[:150] == ["x"] * 150 and lines[-1].startswith("… 50 more")
+    assert sink.drain() == []
@@ -0,0 +1,132 @@
+import filecmp
+import io
+import json
+import os
+import random
+
+import fitz
+import pytest
+
+from cli.cli_runner import run_cli
+from core.imposition import impose_cut_stack
+from core.raster import RasterSpec, impose_to_raster, write_side
+from core.signature_logic import plan_signatures
+
+
+def _page():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 100), "band seams", fontsize=60)
+    page.draw_circle((300, 400), 150, color=(1, 0, 0), fill=(0, 0, 1))
+    return doc, page
+
+
+def _max_diff(a, b):
+    return max((abs(x - y) for x, y in zip(a, b) if x != y), default=0)
+
+
+@pytest.mark.parametrize("fmt, color", [("png", "rgb"), ("png", "gray"), ("tiff", "rgb"), ("tiff", "cmyk")])
+def test_encoded_side_matches_a_full_render(fmt, color):
+    doc, page = _page()
+    spec = RasterSpec(fmt, 96, color, band_bytes=1 << 30)
+    f = io.BytesIO()
+    assert write_side(page, f, spec) == (794, 1123)
+    img = fitz.Pixmap(f.getvalue())
+    full = page.get_pixmap(dpi=96, colorspace=spec.colorspace, alpha=False)
+    assert (img.width, img.height, img.n, img.xres) == (full.width, full.height, full.n, 96)
+    assert img.samples == full.samples  # one band: byte-identical
+
+    # many small bands: same image up to anti-aliasing at the band edges
+    banded = io.BytesIO()
+    write_side(page, banded, RasterSpec(fmt, 96, color, band_bytes=50_000))
+    assert _max_diff(fitz.Pixmap(banded.getvalue()).samples, full.samples) <= 32
+
+
+def _rows(pix):
+    return [pix.samples[r * pix.stride:(r + 1) * pix.stride] for r in range(pix.height)]
+
+
+@pytest.mark.parametrize("fmt", ["png", "tiff"])
+def test_bands_break_above_images_that_fit(fmt):
+    doc = fitz.open()
+    page = doc.new_page()
+    logo = fitz.Pixmap(fitz.csRGB, 64, 64, random.Random(0).randbytes(64 * 64 * 3), False)
+    for y in range(40, 800, 90):
+        page.insert_image(fitz.Rect(72, y, 400, y + 60), pixmap=logo)
+    for dpi in (96, 300):
+        full = page.get_pixmap(dpi=dpi, alpha=False)
+        banded = io.BytesIO()
+        write_side(page, banded, RasterSpec(fmt, dpi, "rgb", band_bytes=full.stride * 100 * dpi // 72))
+        assert fitz.Pixmap(banded.getvalue()).samples == full.samples
+
+
+@pytest.mark.parametrize("fmt", ["png", "tiff"])
+def test_bands_stay_within_band_bytes_on_image_pages(fmt, make_source, monkeypatch):
+    page = make_source(1, "image")[0]
+    spec = RasterSpec(fmt, 150, "rgb", band_bytes=200_000)
+    bands = []
+    get_pixmap = fitz.DisplayList.get_pixmap
+
+    def recording(self, *args, **kwargs):
+        pix = get_pixmap(self, *args, **kwargs)
+        bands.append(len(pix.samples_mv))
+        return pix
+
+    monkeypatch.setattr(fitz.DisplayList, "get_pixmap", recording)
+    banded = io.BytesIO()
+    write_side(page, banded, spec)
+    monkeypatch.undo()
+    assert len(bands) > 1 and max(bands) <= spec.band_bytes
+
+    # split images: sample edges move by at most one device row
+    full = _rows(page.get_pixmap(dpi=150, alpha=False))
+    got = _rows(fitz.Pixmap(banded.getvalue()))
+    assert len(got) == len(full)
+    assert all(row in full[max(0, r - 1):r + 2] for r, row in enumerate(got))
+
+
+def test_band_size_bounds_the_rows_rendered_at_once():
+    spec = RasterSpec("tiff", 600, "rgb")
+    assert spec.band_rows(4959) * 4959 * 3 <= spec.band_bytes
+    assert RasterSpec("png", 600, band_bytes=1).band_rows(4959) == 1
+
+
+def test_invalid_specs():
+    with pytest.raises(ValueError, match="CMYK"):
+        RasterSpec("png", 300, "cmyk")
+    with pytest.raises(ValueError):
+        RasterSpec("jpeg")
+    with pytest.raises(ValueError):
+        RasterSpec("png", 0)
+
+
+def test_impose_to_raster_serial_and_pool(tmp_path, make_source):
+    src = make_source(40)
+    plan = plan_signatures(40, (16,), level=2)
+    spec = RasterSpec("png", 40, "gray")
+    serial = impose_to_raster(src, plan, str(tmp_path / "serial"), level=2, binding="RTL", spec=spec)
+    pooled = impose_to_raster(src, plan, str(tmp_path / "pool"), level=2, binding="RTL", spec=spec, workers=2)
+
+    names = [os.path.basename(p) for p in serial]
+    assert names[:3] == ["sheet-0001-front.png", "sheet-0001-back.png", "sheet-0002-front.png"]
+    assert names == [os.path.basename(p) for p in pooled]
+    assert all(filecmp.cmp(a, b, shallow=False) for a, b in zip(serial, pooled))
+
+    pdf = impose_cut_stack(src, plan, level=2, binding="RTL")
+    assert len(serial) == len(pdf)
+    for path, page in zip(serial, pdf):
+        full = page.get_pixmap(dpi=40, colorspace=fitz.csGRAY, alpha=False)
+        assert _max_diff(fitz.Pixmap(path).samples, full.samples) <= 32
+
+
+def test_cli_raster(tmp_path):
+    src = fitz.open()
+    for _ in range(9):
+        src.new_page()
+    src.save(str(tmp_path / "in.pdf"))
+    report = tmp_path / "report.json"
+    rc = run_cli([str(tmp_path / "in.pdf"), "--level", "1", "--raster", "tiff", "--dpi", "30",
+                  "--out-dir", str(tmp_path / "out"), "--report", str(report)])
+    res = json.loads(report.read_text())["results"][0]
+    assert rc == 0 and res["raster"]["format"] == "tiff" and res["output_pages"] == len(res["raster"]["files"])
+    assert sorted(os.listdir(res["output"])) == sorted(res["raster"]["files"])
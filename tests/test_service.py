@@ -0,0 +1,156 @@
+import asyncio
+import socket
+import threading
+import time
+
+import fitz
+import pytest
+
+from core.imposition import impose_cut_stack
+from core.signature_logic import choose_best_plan
+from service.client import ImpositionClient, ServiceBusy
+from service.server import ImpositionService, Job, RequestError
+
+
+@pytest.fixture
+def service(tmp_path):
+    sock = str(tmp_path / "impose.sock")
+    (tmp_path / "files").mkdir()
+    svc = ImpositionService(workers=1, max_pending=1, file_root=str(tmp_path / "files"))
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(svc.start(unix_path=sock))
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(60)
+    yield svc, ImpositionClient(unix_path=sock, timeout=120)
+    asyncio.run_coroutine_threadsafe(svc.close(), loop).result(60)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+
+def test_job_round_trip(make_source, service):
+    _, client = service
+    data = make_source(40).tobytes()
+    res = client.impose(data, level=2, binding="RTL")
+    assert res.ok and res.report["source_pages"] == 40
+    assert res.report["service"]["run"] > 0
+    expected = impose_cut_stack(fitz.open("pdf", data), choose_best_plan(40)[0], level=2, binding="RTL")
+    assert len(fitz.open("pdf", res.pdf)) == len(expected)
+
+    bad = client.impose(data, level=9)
+    assert bad.http_status == 400 and not bad.ok
+    assert asyncio.run(client.health())["completed"] == 1
+
+
+def test_backpressure_and_cancel(make_source, service):
+    svc, client = service
+    big = make_source(3000).tobytes()
+    results = {}
+    job = threading.Thread(target=lambda: results.update(first=client.impose(big, level=4, job_id="big")))
+    job.start()
+    deadline = time.time() + 60
+    while svc.health()["running"] == 0:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    with pytest.raises(ServiceBusy):
+        client.impose(make_source(4).tobytes(), level=1)
+    # turned away on the headers alone: the announced upload is never read
+    with socket.socket(socket.AF_UNIX) as conn:
+        conn.settimeout(30)
+        conn.connect(client.unix_path)
+        conn.sendall(b"POST /jobs?level=1 HTTP/1.1\r\nContent-Length: 100000000\r\n\r\n")
+        assert conn.recv(65536).startswith(b"HTTP/1.1 503 ")
+    assert asyncio.run(client.cancel("big"))["http_status"] == 202
+    job.join(60)
+    assert results["first"].status == "cancelled" and results["first"].pdf is None
+    assert asyncio.run(client.status("big"))["state"] == "cancelled"
+    assert svc.health()["rejected"] == 2
+
+
+def test_files_stay_inside_the_file_root(make_source, service, tmp_path):
+    svc, client = service
+    (tmp_path / "files" / "in.pdf").write_bytes(make_source(8).tobytes())
+    (tmp_path / "secret.pdf").write_bytes(make_source(8).tobytes())
+    res = client.impose("in.pdf", level=1, out="out.pdf")
+    assert res.ok and res.pdf is None and (tmp_path / "files" / "out.pdf").exists()
+
+    for source, out in (("../secret.pdf", None), (str(tmp_path / "secret.pdf"), None), ("in.pdf", "../out.pdf")):
+        res = client.impose(source, level=1, out=out)
+        assert res.http_status == 403 and not res.ok
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_job_ids_are_validated(make_source, service):
+    svc, client = service
+    data = make_source(4).tobytes()
+    with socket.socket(socket.AF_UNIX) as conn:
+        conn.settimeout(30)
+        conn.connect(client.unix_path)
+        conn.sendall(f"POST /jobs?level=1&id=x%0d%0aSet-Cookie:%20a=b HTTP/1.1\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        response = conn.recv(65536)
+    assert response.startswith(b"HTTP/1.1 400 ") and b"Set-Cookie" not in response.split(b"\r\n\r\n")[0]
+    assert client.impose(data, level=1, job_id="x" * 65).http_status == 400
+    assert client.impose(data, level=1, job_id="ok_id-1").ok
+    assert svc.health()["completed"] == 1
+
+
+def test_content_length_is_validated(service):
+    _, client = service
+    for length in (b"abc", b"-5", b"0x10"):
+        with socket.socket(socket.AF_UNIX) as conn:
+            conn.settimeout(30)
+            conn.connect(client.unix_path)
+            conn.sendall(b"POST /jobs?level=1 HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+            assert conn.recv(65536).startswith(b"HTTP/1.1 400 ")
+
+    with pytest.raises(RequestError) as e:
+        ImpositionService()._local_path("path", "in.pdf")
+    assert e.value.status == 403
+
+
+def test_queued_job_cancellation():
+    async def scenario():
+        svc = ImpositionService()
+        svc._slots = asyncio.Semaphore(0)  # every job stays queued
+        dropped = Job("dropped", {}, cancel_event=threading.Event())
+        task = asyncio.ensure_future(svc._run(dropped, b"", None))
+        await asyncio.sleep(0)
+        svc._cancel(dropped)
+        report, pdf = await task
+        assert report["status"] == "cancelled" and pdf is None
+
+        # cancelling the request itself propagates instead of becoming a report
+        aborted = Job("aborted", {}, cancel_event=threading.Event())
+        task = asyncio.ensure_future(svc._run(aborted, b"", None))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert aborted.state == "cancelled" and aborted.cancel_event.is_set()
+        assert svc._slots._value == 0
+
+    asyncio.run(scenario())
+
+
+def test_half_closed_client_gets_its_result(make_source, service):
+    svc, client = service
+    data = make_source(16).tobytes()
+    with socket.socket(socket.AF_UNIX) as conn:
+        conn.settimeout(120)
+        conn.connect(client.unix_path)
+        conn.sendall(f"POST /jobs?level=1 HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+        conn.shutdown(socket.SHUT_WR)  # done sending, still reading
+        response = b""
+        while chunk := conn.recv(65536):
+            response += chunk
+    assert response.startswith(b"HTTP/1.1 200 ") and b"Content-Type: application/pdf" in response
+    assert svc.health()["completed"] == 1
@@ -0,0 +1,104 @@
+import json
+import os
+
+import fitz
+import pytest
+
+from cli.cli_runner import run_cli
+from core.imposition import impose_cut_stack
+from core.layout import build_placement_table
+from core.progress import ImpositionCancelled
+from core.shards import MANIFEST_NAME, impose_to_shards, plan_shards
+from core.signature_logic import plan_signatures
+
+
+def _contents(doc, pages):
+    return [doc[p].get_text("text") for p in pages]
+
+
+def test_plan_shards_ranges():
+    plan = plan_signatures(70, (16,), level=2)
+    table = build_placement_table(plan.sequence, 2)
+    per_sig = plan_shards(table, "out", source_pages=70)
+    assert [s.signature_range for s in per_sig] == [(i, i) for i in range(1, len(table.signatures) + 1)]
+    assert per_sig[0].sheets == (1, table.signatures[0].layout.sheets)
+    assert per_sig[-1].sheets[1] == table.sheet_count and per_sig[-1].source_pages[1] == 70
+    assert per_sig[0].path == os.path.join("out", "shard-0001.pdf")
+
+    blocks = plan_shards(table, "out", shard_size=5, source_pages=70)
+    assert len(blocks) < len(per_sig)
+    # consecutive, whole signatures, every sheet and source page exactly once
+    assert blocks[0].sheets[0] == 1 and blocks[0].source_pages[0] == 1
+    for a, b in zip(blocks, blocks[1:]):
+        assert b.sheets[0] == a.sheets[1] + 1 and b.source_pages[0] == a.source_pages[1] + 1
+        assert b.signature_range[0] == a.signature_range[1] + 1
+    for bad in (0, -1, "sheet"):
+        with pytest.raises(ValueError, match="at least 1 sheet"):
+            plan_shards(table, "out", shard_size=bad)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_shards_hold_the_single_file_output(make_source, tmp_path, workers):
+    src = make_source(70)
+    plan = plan_signatures(70, (16,), level=2)
+    full = impose_cut_stack(src, plan, level=2, binding="RTL")
+    shards = impose_to_shards(src, plan, str(tmp_path), level=2, binding="RTL", shard_size=4,
+                              workers=workers)
+
+    assert sorted(os.listdir(tmp_path)) == [MANIFEST_NAME] + [os.path.basename(s.path) for s in shards]
+    for shard in shards:
+        with fitz.open(shard.path) as doc:
+            first, last = shard.sheets
+            assert len(doc) == shard.pages == (last - first + 1) * 2
+            assert _contents(doc, range(len(doc))) == _contents(full, range(2 * first - 2, 2 * last))
+    assert sum(s.pages for s in shards) == len(full)
+
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    assert manifest["complete"] and manifest["source_pages"] == 70 and manifest["sheets"] == len(full) // 2
+    assert [m["file"] for m in manifest["shards"]] == [os.path.basename(s.path) for s in shards]
+    assert [m["source_pages"] for m in manifest["shards"]] == [list(s.source_pages) for s in shards]
+    assert all(m["status"] == "done" and m["bytes"] > 0 for m in manifest["shards"])
+
+
+def test_shards_are_published_as_they_finish(make_source, tmp_path):
+    src = make_source(40)
+    plan = plan_signatures(40, (16, 12), level=1)
+    seen = []
+
+    def on_shard(shard):
+        manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+        seen.append((shard.index, os.path.exists(shard.path),
+                     [m["status"] for m in manifest["shards"]], sorted(os.listdir(tmp_path))))
+
+    shards = impose_to_shards(src, plan, str(tmp_path), level=1, on_shard=on_shard)
+    assert len(shards) > 2
+    index, exists, status, files = seen[0]
+    # the first file is complete and listed while the rest of the job is still to come
+    assert index == 1 and exists and status[0] == "done" and set(status[1:]) == {"pending"}
+    assert not any(name.endswith(".part") for name in files)
+    assert [i for i, *_ in seen] == [s.index for s in shards]
+
+
+def test_cancel_keeps_finished_shards(make_source, tmp_path):
+    src = make_source(40)
+    plan = plan_signatures(40, (16, 12), level=1)
+    done = []
+    with pytest.raises(ImpositionCancelled):
+        impose_to_shards(src, plan, str(tmp_path), level=1, on_shard=done.append, cancelled=lambda: len(done) >= 1)
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    assert not manifest["complete"] and [m["status"] for m in manifest["shards"]][:2] == ["done", "pending"]
+    assert sorted(os.listdir(tmp_path)) == [MANIFEST_NAME, "shard-0001.pdf"]
+
+
+def test_cli_shards(make_source, tmp_path):
+    make_source(30).save(str(tmp_path / "in.pdf"))
+    report = tmp_path / "report.json"
+    rc = run_cli([str(tmp_path / "in.pdf"), "--level", "1", "--shards", "signature",
+                  "--out-dir", str(tmp_path / "out"), "--report", str(report)])
+    res = json.loads(report.read_text())["results"][0]
+    assert rc == 0 and res["output_pages"] == 2 * res["sheets"]
+    assert sorted(os.listdir(res["output"])) == [MANIFEST_NAME] + res["shards"]["files"]
+    assert json.loads(open(res["shards"]["manifest"]).read())["complete"]
+
+    with pytest.raises(SystemExit):
+        run_cli([str(tmp_path / "in.pdf"), "--shards", "0"])
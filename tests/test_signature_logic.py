@@ -1,5 +1,92 @@
-from core.signature_logic import compute_plan_for_pair
+import sys
+import threading
+from collections import OrderedDict
+
+import pytest
+
+from core import signature_logic
+from core.signature_logic import PlanWeights, compute_plan_for_pair, pages_per_sheet, plan_signatures
+
 
 def test_compute_plan():
     p = compute_plan_for_pair(100, 32, 28)
     assert p.total_pages % 4 == 0
+
+
+def _brute_force(n, sizes, weights, per_sheet):
+    best = None
+    def rec(i, counts):
+        nonlocal best
+        if i == len(sizes):
+            total = sum(c * s for c, s in zip(counts, sizes))
+            if total >= n:
+                cost = (weights.blank * (total - n) + weights.sheet * total // per_sheet
+                        + weights.signature * sum(counts))
+                best = cost if best is None else min(best, cost)
+            return
+        for c in range(n // sizes[i] + 2):
+            rec(i + 1, counts + [c])
+    rec(0, [])
+    return best
+
+
+@pytest.mark.parametrize("level", [1, 2, 3, 4])
+def test_plan_signatures_sizes_are_whole_sheets(level):
+    plan = plan_signatures(1733, level=level)
+    assert all(s % pages_per_sheet(level) == 0 for s in plan.sequence)
+    assert sum(plan.sequence) == plan.total_pages == 1733 + plan.blanks
+
+
+def test_plan_signatures_is_optimal():
+    weights = PlanWeights(blank=1.0, sheet=0.25, signature=2.0)
+    for n in (1, 7, 33, 61, 100, 129):
+        plan = plan_signatures(n, (32, 24, 16, 12), level=1, weights=weights)
+        cost = (weights.blank * plan.blanks + weights.sheet * plan.total_pages // 4
+                + weights.signature * len(plan.sequence))
+        assert cost == _brute_force(n, [32, 24, 16, 12], weights, 4)
+
+
+def test_plan_signatures_rejects_partial_sheets():
+    with pytest.raises(ValueError, match=r"\[28\] are not whole sheets at level 3"):
+        plan_signatures(100, (32, 28), level=3)
+    assert set(plan_signatures(100, (32, 16), level=3).sequence) <= {32, 16}
+
+
+def test_dp_tables_are_bounded(monkeypatch):
+    monkeypatch.setattr(signature_logic, "_DP_TABLES", OrderedDict())
+    for size in range(4, 4 * (signature_logic._DP_MAX_TABLES + 10), 4):
+        plan_signatures(50, (size,), level=1)
+    assert len(signature_logic._DP_TABLES) == signature_logic._DP_MAX_TABLES
+
+
+def test_dp_tables_are_thread_safe(monkeypatch):
+    monkeypatch.setattr(signature_logic, "_DP_TABLES", OrderedDict())
+    monkeypatch.setattr(signature_logic, "_DP_MAX_TABLES", 2)
+    size_sets = [(32, 28), (32, 16), (28, 20)]
+    expected = {sizes: plan_signatures(20000, sizes).sequence for sizes in size_sets}
+    errors, results = [], []
+
+    def plan(sizes, barrier):
+        barrier.wait()
+        try:
+            results.append(plan_signatures(20000, sizes).sequence == expected[sizes])
+        except Exception as exc:
+            errors.append(exc)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(5):
+            signature_logic._DP_TABLES.clear()
+            barrier = threading.Barrier(2 * len(size_sets))
+            threads = [threading.Thread(target=plan, args=(sizes, barrier))
+                       for sizes in size_sets * 2]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors
+    assert len(results) == 30 and all(results)
+    assert len(signature_logic._DP_TABLES) <= 2
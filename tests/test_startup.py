@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+import sys
+
+import fitz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Importing the headless entry point (interpreter start-up not included);
+# about 0.1 s here, the rest is headroom for slow CI machines.
+STARTUP_BUDGET_S = 0.35
+HEAVY = ("PyQt6", "pymupdf", "numpy", "multiprocessing", "concurrent.futures.process")
+
+
+def _python(code, *args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, *args, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    return out.stdout
+
+
+_LOADED = """
+import json, sys
+from core.lazy import is_loaded
+print(json.dumps([m for m in {heavy!r} if is_loaded(m)]))
+"""
+
+
+def test_headless_entry_imports_nothing_heavy():
+    code = "import cli.__main__\n" + _LOADED.format(heavy=HEAVY)
+    assert json.loads(_python(code)) == []
+
+
+def test_core_api_plans_and_verifies_without_pymupdf():
+    code = """
+from core.signature_logic import choose_best_plan
+from core.layout import build_placement_table
+from core.lookup import PlacementIndex
+from core.verify import verify_table
+plan, _ = choose_best_plan(500)
+assert verify_table(build_placement_table(plan.sequence, 3), 500).ok
+assert PlacementIndex.from_plan(plan, 3, source_pages=500).locate(1).sheet == 1
+""" + _LOADED.format(heavy=HEAVY)
+    assert json.loads(_python(code)) == []
+
+
+def test_planning_imports_without_pymupdf_installed():
+    code = """
+import sys
+sys.modules["fitz"] = sys.modules["pymupdf"] = None  # as if PyMuPDF were not installed
+from core import geometry
+from core.signature_logic import choose_best_plan
+from core.layout import build_placement_table
+from core.lookup import PlacementIndex
+from core.verify import verify_table
+plan, _ = choose_best_plan(500)
+assert verify_table(build_placement_table(plan.sequence, 3), 500).ok
+assert PlacementIndex.from_plan(plan, 3, source_pages=500).locate(1).sheet == 1
+try:
+    geometry.fitz.Rect
+except ModuleNotFoundError as exc:
+    assert exc.name == "fitz"
+else:
+    raise AssertionError("fitz should be missing")
+"""
+    _python(code)
+
+
+def test_startup_budget():
+    code = """
+import time
+t = time.perf_counter()
+import cli.cli_runner
+print(time.perf_counter() - t)
+"""
+    best = min(float(_python(code)) for _ in range(3))
+    assert best < STARTUP_BUDGET_S, f"headless start-up took {best:.3f}s (budget {STARTUP_BUDGET_S}s)"
+
+
+def test_lazy_module_loads_on_first_use():
+    code = """
+import sys
+from core.lazy import is_loaded, lazy_import
+colorsys = lazy_import("colorsys")
+assert "colorsys" in sys.modules and not is_loaded("colorsys")
+assert colorsys.rgb_to_hsv(1, 0, 0)[0] == 0 and is_loaded("colorsys")
+assert lazy_import("colorsys") is colorsys
+"""
+    _python(code)
+
+
+def test_headless_entry_imposes(tmp_path, make_source):
+    make_source(20).save(str(tmp_path / "in.pdf"))
+    out = subprocess.run([sys.executable, "-m", "cli", str(tmp_path / "in.pdf"), "--level", "2",
+                          "-o", str(tmp_path / "out.pdf")],
+                         cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    assert "Saved" in out.stderr and fitz.open(str(tmp_path / "out.pdf")).page_count > 0
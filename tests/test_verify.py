@@ -0,0 +1,149 @@
+import io
+import json
+import time
+from array import array
+
+import fitz
+import pytest
+
+from cli.cli_runner import impose_file, run_cli
+from core.imposition import impose_cut_stack
+from core.layout import BLANK, SignatureLayout, SignaturePlacement, build_placement_table, signature_layout
+from core.output import SAVE_PROFILES, save_document
+from core.signature_logic import choose_best_plan, plan_signatures, round_to_sheets
+from core.verify import VerificationError, check_table, layout_errors, verify_output, verify_table
+
+LEVELS = (1, 2, 3, 4)
+BINDINGS = ("LTR", "RTL")
+
+
+@pytest.mark.parametrize("level", LEVELS)
+@pytest.mark.parametrize("binding", BINDINGS)
+def test_every_signature_size_holds_the_invariants(level, binding):
+    # one signature of every size, i.e. every amount of padding per level
+    for pages in range(1, 150):
+        assert layout_errors(signature_layout(pages, level, binding), level, binding) == [], pages
+
+
+@pytest.mark.parametrize("level", LEVELS)
+@pytest.mark.parametrize("binding", BINDINGS)
+def test_plans_hold_the_invariants_for_every_page_count(level, binding):
+    for n in range(1, 400):
+        for plan in (choose_best_plan(n)[0], plan_signatures(n, round_to_sheets((32, 28, 24, 20, 16, 12), level), level=level)):
+            report = verify_table(build_placement_table(plan.sequence, level, binding), n)
+            assert report.ok, (n, plan.expression, report.errors)
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_numpy_engine_holds_the_invariants(level):
+    pytest.importorskip("numpy")
+    for binding in BINDINGS:
+        for pages in range(1, 80):
+            check_table(build_placement_table([pages, 32], level, binding, engine="numpy"))
+
+
+def _corrupt(lay, name, edit):
+    fields = {f: array(getattr(lay, f).typecode, getattr(lay, f)) for f in ("page", "box", "src", "rot")}
+    edit(fields[name])
+    return SignatureLayout(lay.orig_pages, lay.padded_pages, lay.sheets, **fields)
+
+
+def _swap(i, j):
+    def edit(a):
+        a[i], a[j] = a[j], a[i]
+    return edit
+
+
+@pytest.mark.parametrize("name, edit, message", [
+    ("src", _swap(2, 6), "on the wrong side"),     # a front panel and a back panel
+    ("src", _swap(2, 10), "local pages"),          # two fronts: splits their spreads
+    ("rot", lambda a: a.__setitem__(0, (a[0] + 90) % 360), "rotated"),
+    ("box", lambda a: a.__setitem__(1, a[0]), "used twice"),
+    ("src", lambda a: a.__setitem__(a.index(BLANK), 21), "outside the signature"),
+])
+def test_corrupted_layouts_are_reported(name, edit, message):
+    bad = _corrupt(signature_layout(20, 2, "LTR"), name, edit)
+    errors = layout_errors(bad, 2, "LTR")
+    assert any(message in e for e in errors), errors
+
+
+def test_dropped_and_repeated_pages_are_reported():
+    lay = signature_layout(20, 2, "LTR")
+    first_real = next(j for j, s in enumerate(lay.src) if s != BLANK)
+    bad = _corrupt(lay, "src", lambda a: a.__setitem__(first_real, (a[first_real] + 1) % 20))
+    table = build_placement_table([20, 16], 2)
+    table.signatures[0] = SignaturePlacement(bad, 0, 0)
+    report = verify_table(table, 36)
+    assert not report.ok and any("placed twice" in e for e in report.errors)
+    assert any("never placed" in e for e in report.errors)
+    with pytest.raises(VerificationError, match="failed verification"):
+        report.raise_for_errors()
+
+
+def test_table_level_checks():
+    table = build_placement_table([16, 16], 1)
+    assert verify_table(table, 40).errors == ["plan covers 32 of 40 source pages"]
+    table.signatures[1] = SignaturePlacement(table.signatures[1].layout, 6, 16)
+    assert "expected 8 / 16" in verify_table(table).errors[0]
+
+
+def test_ten_thousand_pages_in_milliseconds():
+    plan, _ = choose_best_plan(10000)
+    table = build_placement_table(plan.sequence, 3, "RTL")
+    verify_table(table, 10000)
+    t = time.perf_counter()
+    report = verify_table(table, 10000)
+    assert report.ok and time.perf_counter() - t < 0.05
+
+
+@pytest.mark.parametrize("level", LEVELS)
+@pytest.mark.parametrize("binding", BINDINGS)
+def test_read_back_matches_the_table(make_source, level, binding):
+    src = make_source(37)
+    plan = plan_signatures(37, round_to_sheets((20, 16, 12), level), level=level)
+    out = impose_cut_stack(src, plan, level=level, binding=binding)
+    table = build_placement_table(plan.sequence, level, binding)
+    report = verify_output(out, src, table)
+    assert report.ok, report.errors
+
+    # the same output checked against the other reading direction must fail
+    other = build_placement_table(plan.sequence, level, "RTL" if binding == "LTR" else "LTR")
+    assert not verify_output(out, src, other).ok
+
+
+def test_read_back_of_parallel_output(make_source):
+    src = make_source(120)
+    plan = plan_signatures(120, (16,), level=2)
+    out = impose_cut_stack(src, plan, level=2, workers=2)
+    assert verify_output(out, src, build_placement_table(plan.sequence, 2)).ok
+
+
+@pytest.mark.parametrize("profile", sorted(SAVE_PROFILES))
+def test_read_back_of_every_save_profile(make_source, profile):
+    src = make_source(40, "image")
+    plan = plan_signatures(40, (16,), level=2)
+    buf = io.BytesIO()
+    save_document(impose_cut_stack(src, plan, level=2), buf, profile)
+    with fitz.open("pdf", buf.getvalue()) as saved:
+        report = verify_output(saved, src, build_placement_table(plan.sequence, 2))
+    assert report.ok, report.errors
+
+
+@pytest.mark.parametrize("mode", [[], ["--stream"], ["--cache-dir", "cache"]])
+def test_cli_verify(make_source, tmp_path, mode):
+    make_source(45).save(str(tmp_path / "in.pdf"))
+    report = tmp_path / "report.json"
+    mode = [str(tmp_path / m) if m == "cache" else m for m in mode]
+    rc = run_cli([str(tmp_path / "in.pdf"), "--level", "3", "--verify", *mode, "--save-profile", "smallest",
+                  "-o", str(tmp_path / "out.pdf"), "--report", str(report)])
+    res = json.loads(report.read_text())["results"][0]
+    assert rc == 0 and res["verify"]["ok"] and res["verify"]["panels"] == 64
+    assert "verify" in res["timings"]
+
+
+def test_verify_checks_what_a_stream_receives(make_source):
+    buf = io.BytesIO()
+    res = impose_file(make_source(45).tobytes(), buf, level=3, binding="LTR", verify=True,
+                      save_profile="smallest")
+    assert res["status"] == "ok" and res["verify"]["ok"] and res["verify"]["panels"] == 64
+    assert res["output_bytes"] == len(buf.getvalue()) and len(fitz.open("pdf", buf.getvalue())) > 0
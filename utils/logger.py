@@ -1,5 +1,124 @@
 import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Tuple
 
-def setup_logging(name=__name__):
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+# Root of the application's logger hierarchy (core.* modules log below it)
+LOGGER_NAME = "pdfengine"
+SINK_FORMAT = "[%(levelname)s] %(message)s"
+
+# Sinks installed by log_to in the current thread / asyncio task. Each
+# handler only takes records logged from a context where it is active, so
+# concurrent jobs (GUI worker, preview, service) never see each other's lines.
+_active_sinks: ContextVar[Tuple[int, ...]] = ContextVar("pdfengine_active_sinks", default=())
+# Levels requested by the log_to calls running anywhere, and the root level before the first
+_levels_lock = threading.Lock()
+_levels: List[int] = []
+_base_level = logging.NOTSET
+
+
+def setup_logging(name=__name__, level=logging.INFO):
+    logging.basicConfig(level=level, format='%(asctime)s %(levelname)s %(message)s')
+    logging.getLogger(LOGGER_NAME).setLevel(level)
     return logging.getLogger(name)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger below the application root, e.g. get_logger("imposition")."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+class SinkHandler(logging.Handler):
+    """Forward formatted records to anything with append(): a list, a QTextEdit…"""
+
+    def __init__(self, sink, level=logging.INFO):
+        super().__init__(level)
+        self.sink = sink
+        self.setFormatter(logging.Formatter(SINK_FORMAT))
+        self.addFilter(lambda record: id(self) in _active_sinks.get())
+
+    def emit(self, record):
+        try:
+            self.sink.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class BatchedSink:
+    """
+    Thread-safe append() target that buffers lines until drain(). Lets a
+    worker thread log freely while the UI repaints once per timer tick.
+    """
+
+    def __init__(self, max_lines: int = 10000):
+        self.max_lines = max_lines
+        self._lines: List[str] = []
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            if len(self._lines) < self.max_lines:
+                self._lines.append(line)
+            else:
+                self._dropped += 1
+
+    def drain(self) -> List[str]:
+        """Lines since the last drain (plus a note if some were dropped)."""
+        with self._lock:
+            lines, self._lines = self._lines, []
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            lines.append(f"… {dropped} more log line(s) dropped")
+        return lines
+
+
+@contextmanager
+def log_to(sink, level=logging.INFO):
+    """
+    Temporarily route application logs at `level` and above to `sink`, for
+    records logged from the calling thread (or asyncio task) only.
+    DEBUG payloads are only formatted when `level` (or another handler) asks for them.
+    """
+    if sink is None:
+        yield
+        return
+    root = logging.getLogger(LOGGER_NAME)
+    handler = SinkHandler(sink, level)
+    token = _active_sinks.set(_active_sinks.get() + (id(handler),))
+    _push_level(root, level)
+    root.addHandler(handler)
+    try:
+        yield handler
+    finally:
+        root.removeHandler(handler)
+        _pop_level(root, level)
+        _active_sinks.reset(token)
+
+
+def _push_level(root: logging.Logger, level: int) -> None:
+    global _base_level
+    with _levels_lock:
+        if not _levels:
+            _base_level = root.level
+        _levels.append(level)
+        _apply_levels(root)
+
+
+def _pop_level(root: logging.Logger, level: int) -> None:
+    with _levels_lock:
+        _levels.remove(level)
+        if _levels:
+            _apply_levels(root)
+        else:
+            root.setLevel(_base_level)
+
+
+def _apply_levels(root: logging.Logger) -> None:
+    # The root must pass the most verbose level any running log_to asked for
+    wanted = min(_levels)
+    if _base_level == logging.NOTSET or _base_level > wanted:
+        root.setLevel(wanted)
+    else:
+        root.setLevel(_base_level)